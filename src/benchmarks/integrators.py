@@ -0,0 +1,79 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import time
+from pathlib import Path
+
+from benchmarks.run import git_commit
+from core.config_load import config
+from core.integrators import INTEGRATORS
+from core.objects import BodySystem
+from core.physics import kinetic_energy, potential_energy
+
+constants = config.load_constants()['physics']
+G = constants['gravitational_constant']
+AU = constants['AU']
+SUN_MASS = constants['sun_mass']
+
+DEFAULT_OUTPUT = Path(__file__).parent / "results" / "integrators.json"
+ECCENTRICITY = 0.5
+ORBITS = 5
+STEPS_PER_ORBIT = [50, 100, 200, 400, 800, 1600]
+
+def kepler_system(integrator):
+    """A star and a planet on an eccentric orbit, starting at perihelion"""
+    semi_major = AU
+    perihelion = semi_major * (1 - ECCENTRICITY)
+    speed = math.sqrt(G * SUN_MASS * (1 + ECCENTRICITY) / perihelion)
+    planet_mass = 3e-6 * SUN_MASS
+    with contextlib.redirect_stdout(io.StringIO()):
+        system = BodySystem(integrator=integrator)
+        # Zero total momentum so the system stays put
+        system.add(0, 0, (255, 255, 0), SUN_MASS, 1, 0, -speed * planet_mass / SUN_MASS)
+        system.add(perihelion, 0, (0, 255, 255), planet_mass, 1, 0, speed)
+    period = 2 * math.pi * math.sqrt(semi_major**3 / (G * (SUN_MASS + planet_mass)))
+    return system, period
+
+def energy(system):
+    return kinetic_energy(system.vel, system.mass) + potential_energy(system.pos, system.mass)
+
+def run_case(integrator, steps_per_orbit):
+    """Integrate ORBITS orbits and return the max energy error and wall time"""
+    system, period = kepler_system(integrator)
+    time_step = period / steps_per_orbit
+    initial = energy(system)
+    worst = 0.0
+    elapsed = 0.0
+    for _ in range(ORBITS * steps_per_orbit):
+        start = time.perf_counter()
+        system.integrator.step(system, time_step)
+        elapsed += time.perf_counter() - start
+        worst = max(worst, abs((energy(system) - initial) / initial))
+    return {"integrator": integrator, "steps_per_orbit": steps_per_orbit,
+            "time_step": time_step, "max_energy_error": worst, "wall_ms": elapsed * 1000}
+
+def main(argv=None):
+    """Measure energy error against wall-clock time for every integrator"""
+    parser = argparse.ArgumentParser(description="Compare integrators on an eccentric Kepler orbit")
+    parser.add_argument('--output', default=str(DEFAULT_OUTPUT), help="Path of the JSON results file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in INTEGRATORS:
+        for steps_per_orbit in STEPS_PER_ORBIT:
+            record = run_case(name, steps_per_orbit)
+            results.append(record)
+            print(f"{name:>16} {steps_per_orbit:>5} steps/orbit: max energy error "
+                  f"{record['max_energy_error']:.2e}, {record['wall_ms']:.1f} ms")
+
+    report = {"commit": git_commit(), "eccentricity": ECCENTRICITY, "orbits": ORBITS, "results": results}
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.run import git_commit
+from core.kernels import random_bodies
+from core.parallel import ParallelForceBackend
+from core.physics import direct_accelerations
+
+DEFAULT_OUTPUT = Path(__file__).parent / "results" / "parallel.json"
+
+def best_ms(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return min(samples)
+
+def main(argv=None):
+    """Measure parallel force scaling efficiency against the single-process direct sum"""
+    parser = argparse.ArgumentParser(description="Benchmark the parallel force backend")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 10000])
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help="Worker counts to try (default: powers of two up to the core count)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=str(DEFAULT_OUTPUT), help="Path of the JSON results file")
+    args = parser.parse_args(argv)
+
+    cores = os.cpu_count()
+    worker_counts = args.workers or sorted({2**k for k in range(cores.bit_length())} | {cores})
+
+    results = []
+    for n_bodies in args.sizes:
+        pos, mass, _ = random_bodies(n_bodies)
+        reference = direct_accelerations(pos, mass)
+        serial_ms = best_ms(lambda: direct_accelerations(pos, mass), args.repeat)
+        one_worker_ms = None
+        for workers in worker_counts:
+            backend = ParallelForceBackend(workers, capacity=n_bodies)
+            try:
+                acc = backend.accelerations(pos, mass)
+                elapsed_ms = best_ms(lambda: backend.accelerations(pos, mass), args.repeat)
+            finally:
+                backend.close()
+            if one_worker_ms is None:
+                one_worker_ms = elapsed_ms * workers  # Normalise if 1 worker was skipped
+            record = {
+                "bodies": n_bodies,
+                "workers": workers,
+                "serial_ms": serial_ms,
+                "parallel_ms": elapsed_ms,
+                "speedup": serial_ms / elapsed_ms,
+                "efficiency": one_worker_ms / (workers * elapsed_ms),
+                "max_abs_difference": float(np.abs(acc - reference).max()),
+            }
+            results.append(record)
+            print(f"{n_bodies:>7} bodies, {workers:>3} workers: {elapsed_ms:.1f} ms "
+                  f"(serial {serial_ms:.1f} ms), speedup {record['speedup']:.2f}, "
+                  f"efficiency {record['efficiency']:.0%}")
+
+    report = {"commit": git_commit(), "cores": cores, "results": results}
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
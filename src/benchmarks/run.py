@@ -0,0 +1,147 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # Render offscreen, no window
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pygame
+
+from benchmarks.scenarios import BENCHMARK_SIZES, write_scenario
+from core.config_load import config
+from core.physics import (get_force_engine, find_collisions, kinetic_energy,
+                          potential_energy, total_momentum)
+from core.history import HistoryRing
+from core.simulation import Simulation
+
+DIRECT_MAX_BODIES = 20000  # Beyond this the direct engine's O(N²) pass takes seconds per step
+ENERGY_MAX_BODIES = 20000  # The potential energy is an O(N²) sum
+DEFAULT_OUTPUT = Path(__file__).parent / "results" / "latest.json"
+
+def time_ms(function, repeat):
+    """Median wall-clock time of `function()` over `repeat` calls, in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def system_invariants(system, with_energy):
+    """Total energy (or None) and momentum vector of a body system"""
+    energy = None
+    if with_energy:
+        energy = kinetic_energy(system.vel, system.mass) + potential_energy(system.pos, system.mass)
+    return energy, total_momentum(system.vel, system.mass)
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmark_size(n_bodies, engine, repeat, drift_steps, seed, renderer, scenario_dir):
+    """Run every timed phase for one scenario size and return a result record"""
+    if engine == 'direct' and n_bodies > DIRECT_MAX_BODIES:
+        engine = 'barnes_hut'
+    scenario = write_scenario(Path(scenario_dir) / f"bench_{n_bodies}.npz", n_bodies, seed)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation = Simulation(scenario, trails=True)
+    system = simulation.system
+    system.force_engine = engine
+    with_energy = n_bodies <= ENERGY_MAX_BODIES
+
+    # Physics drift over a short run (this also fills the orbit trails)
+    energy_before, momentum_before = system_invariants(system, with_energy)
+    momentum_scale = float(np.sum(system.mass * np.linalg.norm(system.vel, axis=1)))
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(drift_steps):
+            simulation.step()
+    energy_after, momentum_after = system_invariants(system, with_energy)
+
+    # Timed phases, all on the same final snapshot
+    force_engine = get_force_engine(engine)
+    history = HistoryRing(keyframe_interval=1)
+    pos, mass = system.pos.copy(), system.mass.copy()
+    def render_bulk():
+        renderer.render_mode = 'bulk'
+        renderer.draw_bodies(system.bodies, system.ids, system.pos, system.mass, system.color)
+        renderer.render_mode = 'auto'
+    record = {
+        "bodies": n_bodies,
+        "engine": engine,
+        "force_ms": time_ms(lambda: force_engine(pos, mass), repeat),
+        "collisions_ms": time_ms(lambda: find_collisions(pos, system.radius, system.steps_collision), repeat),
+        "history_ms": time_ms(lambda: history.capture(system, simulation.time_manager), repeat),
+        "render_ms": time_ms(lambda: [renderer.draw_body(body) for body in system.bodies], repeat),
+        "render_bulk_ms": time_ms(render_bulk, repeat),
+        "collision_pairs": len(find_collisions(pos, system.radius, system.steps_collision)),
+        "drift_steps": drift_steps,
+        "energy_drift": (abs((energy_after - energy_before) / energy_before) if with_energy else None),
+        "momentum_drift": float(np.linalg.norm(momentum_after - momentum_before)) / momentum_scale,
+    }
+    return record
+
+def main(argv=None):
+    """Run the benchmark suite headless and write the results as JSON"""
+    parser = argparse.ArgumentParser(description="Benchmark the physics and rendering hot paths")
+    parser.add_argument('--sizes', type=int, nargs='+', default=BENCHMARK_SIZES,
+                        help="Scenario sizes (number of bodies)")
+    parser.add_argument('--engine', default=config.load_constants()['simulation']['force_engine'],
+                        help="Force engine to benchmark")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed repetitions per phase (median is kept)")
+    parser.add_argument('--drift-steps', type=int, default=10,
+                        help="Steps simulated to measure energy and momentum drift")
+    parser.add_argument('--seed', type=int, default=0, help="Scenario generator seed")
+    parser.add_argument('--output', default=str(DEFAULT_OUTPUT), help="Path of the JSON results file")
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    display_settings = config.load_display_settings()
+    surface = pygame.Surface((display_settings['window']['width'], display_settings['window']['height']))
+    font = pygame.font.SysFont(display_settings['font']['name'], display_settings['font']['size'])
+    from graphics.renderer import Renderer
+    renderer = Renderer(surface, font)
+
+    results = []
+    with tempfile.TemporaryDirectory() as scenario_dir:
+        for n_bodies in args.sizes:
+            record = benchmark_size(n_bodies, args.engine, args.repeat, args.drift_steps,
+                                    args.seed, renderer, scenario_dir)
+            results.append(record)
+            energy_drift = record['energy_drift']
+            energy_text = f"{energy_drift:.2e}" if energy_drift is not None else "n/a"
+            print(f"{n_bodies:>7} bodies [{record['engine']}]: force {record['force_ms']:.2f} ms, "
+                  f"collisions {record['collisions_ms']:.2f} ms, history {record['history_ms']:.2f} ms, "
+                  f"render {record['render_ms']:.2f} ms (bulk {record['render_bulk_ms']:.2f} ms), "
+                  f"energy drift {energy_text}, "
+                  f"momentum drift {record['momentum_drift']:.2e}")
+    pygame.quit()
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
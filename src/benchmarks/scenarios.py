@@ -0,0 +1,50 @@
+import json
+import math
+import random
+from pathlib import Path
+from core.config_load import config
+from core.scenario import compile_bodies, save_compiled
+
+constants = config.load_constants()['physics']
+G = constants['gravitational_constant']
+AU = constants['AU']
+SUN_MASS = constants['sun_mass']
+
+BENCHMARK_SIZES = [10, 100, 1000, 10000, 100000]
+PLANET_COLORS = ['orange', 'mercury_red', 'cyan', 'neptune_blue', 'bronze', 'lime_green', 'uranus_blue']
+
+def generate_scenario(n_bodies, seed=0):
+    """Build a bodies.json-style scenario: a central star and n_bodies - 1 bodies on circular orbits"""
+    rng = random.Random(seed)
+    bodies = [{
+        "name": "Central Star",
+        "position": {"x": 0, "y": 0},
+        "color": "yellow",
+        "mass_multiplier": 1.0,
+        "mass_unit": "sun_mass",
+        "radius": 30,
+        "velocity": {"x": 0, "y": 0}
+    }]
+    for i in range(1, n_bodies):
+        distance = rng.uniform(0.3, 3.0) * AU
+        angle = rng.uniform(0, 2 * math.pi)
+        speed = math.sqrt(G * SUN_MASS / distance)
+        bodies.append({
+            "name": f"Body {i}",
+            "position": {"x": distance * math.cos(angle), "y": distance * math.sin(angle)},
+            "color": rng.choice(PLANET_COLORS),
+            "mass_multiplier": 10 ** rng.uniform(-9, -6),
+            "mass_unit": "sun_mass",
+            "radius": 1,
+            "velocity": {"x": -speed * math.sin(angle), "y": speed * math.cos(angle)}
+        })
+    return {"initial_bodies": bodies}
+
+def write_scenario(path, n_bodies, seed=0):
+    """Generate a scenario and write it to `path`, compiled if it ends in .npz, else as JSON"""
+    if Path(path).suffix == '.npz':
+        save_compiled(path, compile_bodies(generate_scenario(n_bodies, seed)))
+        return path
+    with open(path, 'w') as f:
+        json.dump(generate_scenario(n_bodies, seed), f)
+    return path
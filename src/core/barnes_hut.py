@@ -0,0 +1,151 @@
+import numpy as np
+from core.config_load import config
+from core.profiler import profiler
+from core.spatial_hash import expand_ranges
+
+# Load constants
+constants = config.load_constants()['physics']
+simulation_constants = config.load_constants()['simulation']
+
+G = constants['gravitational_constant']
+THETA = simulation_constants['barnes_hut_theta']
+MAX_DEPTH = 32  # Coincident bodies end up sharing a leaf at this depth
+
+
+class QuadTree:
+    """Barnes-Hut quadtree stored as flat node arrays
+
+    The tree is built breadth-first: every level is grouped with NumPy so
+    no Python code runs per body. Children of a node are contiguous
+    (child_start, child_count); bodies of a leaf are the slice
+    order[leaf_start:leaf_start + leaf_count].
+    """
+
+    def __init__(self, pos, mass, max_depth=MAX_DEPTH):
+        n = len(pos)
+        low, high = pos.min(axis=0), pos.max(axis=0)
+        half = max((high - low).max() / 2, 1.0) * (1 + 1e-9)
+
+        centers, halves, masses, coms = [], [], [], []
+        child_starts, child_counts, leaf_starts, leaf_counts = [], [], [], []
+        order = []
+        order_size = 0
+
+        level_center = ((low + high) / 2)[np.newaxis, :]
+        level_first = 0
+        members = np.arange(n)  # bodies still being split
+        local = np.zeros(n, dtype=np.int64)  # their node, relative to the level
+
+        for depth in range(max_depth + 1):
+            m = len(level_center)
+            count = np.bincount(local, minlength=m)
+            node_mass = np.bincount(local, weights=mass[members], minlength=m)
+            weighted = np.stack([np.bincount(local, weights=mass[members] * pos[members, k], minlength=m)
+                                 for k in range(2)], axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                node_com = np.where(node_mass[:, np.newaxis] > 0,
+                                    weighted / node_mass[:, np.newaxis], level_center)
+
+            # Cells holding a single body (or at max depth) become leaves
+            is_leaf = (count == 1) | (depth == max_depth)
+            in_leaf = is_leaf[local]
+            leaf_members = members[in_leaf]
+            leaf_local = local[in_leaf]
+            sort = np.argsort(leaf_local, kind='stable')
+            order.append(leaf_members[sort])
+            leaf_count = np.where(is_leaf, count, 0)
+            leaf_start = order_size + np.cumsum(leaf_count) - leaf_count
+            order_size += len(leaf_members)
+
+            # Split the remaining cells into quadrants
+            members = members[~in_leaf]
+            parent = local[~in_leaf]
+            quadrant = ((pos[members, 0] >= level_center[parent, 0]).astype(np.int64)
+                        + 2 * (pos[members, 1] >= level_center[parent, 1]))
+            keys, local = np.unique(parent * 4 + quadrant, return_inverse=True)
+            child_parent, child_quadrant = keys // 4, keys % 4
+            next_first = level_first + m
+            child_count = np.bincount(child_parent, minlength=m)
+            child_start = next_first + np.cumsum(child_count) - child_count
+
+            centers.append(level_center)
+            halves.append(np.full(m, half))
+            masses.append(node_mass)
+            coms.append(node_com)
+            child_starts.append(child_start)
+            child_counts.append(child_count)
+            leaf_starts.append(leaf_start)
+            leaf_counts.append(leaf_count)
+
+            if len(members) == 0:
+                break
+            signs = np.stack([child_quadrant % 2, child_quadrant // 2], axis=1) * 2 - 1
+            half /= 2
+            level_center = level_center[child_parent] + signs * half
+            level_first = next_first
+
+        self.center = np.concatenate(centers)
+        self.half = np.concatenate(halves)
+        self.mass = np.concatenate(masses)
+        self.com = np.concatenate(coms)
+        self.child_start = np.concatenate(child_starts)
+        self.child_count = np.concatenate(child_counts)
+        self.leaf_start = np.concatenate(leaf_starts)
+        self.leaf_count = np.concatenate(leaf_counts)
+        self.order = np.concatenate(order)
+
+    def __len__(self):
+        return len(self.mass)
+
+    def accelerations(self, pos, mass, theta=THETA):
+        """Walk the tree for every body at once and return (N, 2) accelerations"""
+        n = len(pos)
+        ax = np.zeros(n)
+        ay = np.zeros(n)
+
+        def accumulate(targets, delta, source_mass):
+            profiler.count('interactions', len(targets))
+            distance_sq = np.einsum('ij,ij->i', delta, delta)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                weight = G * source_mass / (distance_sq * np.sqrt(distance_sq))
+            weight[~np.isfinite(weight)] = 0.0
+            ax[:] += np.bincount(targets, weights=weight * delta[:, 0], minlength=n)
+            ay[:] += np.bincount(targets, weights=weight * delta[:, 1], minlength=n)
+
+        # Frontier of (body, node) interactions still to resolve
+        targets = np.arange(n)
+        nodes = np.zeros(n, dtype=np.int64)
+        while len(targets):
+            delta = self.com[nodes] - pos[targets]
+            distance_sq = np.einsum('ij,ij->i', delta, delta)
+            size = 2 * self.half[nodes]
+            inside = np.all(np.abs(pos[targets] - self.center[nodes]) <= self.half[nodes, np.newaxis], axis=1)
+            accept = (size * size < theta * theta * distance_sq) & ~inside
+            leaf = self.leaf_count[nodes] > 0
+
+            # Far enough away: treat the whole cell as a point mass
+            accumulate(targets[accept], delta[accept], self.mass[nodes[accept]])
+
+            # Nearby leaves: sum over their bodies directly
+            near = ~accept & leaf
+            counts = self.leaf_count[nodes[near]]
+            pair_targets = np.repeat(targets[near], counts)
+            sources = self.order[expand_ranges(self.leaf_start[nodes[near]], counts)]
+            keep = pair_targets != sources
+            pair_targets, sources = pair_targets[keep], sources[keep]
+            accumulate(pair_targets, pos[sources] - pos[pair_targets], mass[sources])
+
+            # Everything else: open the cell
+            opened = ~accept & ~leaf
+            counts = self.child_count[nodes[opened]]
+            nodes = expand_ranges(self.child_start[nodes[opened]], counts)
+            targets = np.repeat(targets[opened], counts)
+
+        return np.stack([ax, ay], axis=1)
+
+
+def barnes_hut_accelerations(pos, mass, theta=THETA):
+    """Approximate gravitational accelerations with a freshly built quadtree"""
+    if len(pos) < 2:
+        return np.zeros_like(pos)
+    return QuadTree(pos, mass).accelerations(pos, mass, theta)
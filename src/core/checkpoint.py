@@ -0,0 +1,169 @@
+import os
+from pathlib import Path
+import numpy as np
+from core.config_load import config
+
+# Load constants
+simulation_constants = config.load_constants()['simulation']
+
+CHECKPOINT_INTERVAL = simulation_constants['checkpoint_interval']
+FORMAT_VERSION = 2
+
+
+def save_checkpoint(simulation, path):
+    """Write the full simulation state to `path` atomically
+
+    The state goes to a temporary file in the same directory which is
+    then renamed over `path`, so a crash never leaves a partial checkpoint.
+    """
+    system, time_manager = simulation.system, simulation.time_manager
+    controller = time_manager.controller_state()
+    queue = system.new_bodies
+    state = {
+        'version': FORMAT_VERSION,
+        'ids': system.ids, 'pos': system.pos, 'vel': system.vel, 'acc': system.acc,
+        'mass': system.mass, 'radius': system.radius, 'color': system.color,
+        'steps_collision': system.steps_collision, 'next_id': system._next_id,
+        'simulation_time': time_manager.simulation_time,
+        'frame_count': time_manager.frame_count,
+        'current_time_step': time_manager.current_time_step,
+        'has_previous_acc': controller is not None,
+        'previous_acc': np.zeros((0, 2)) if controller is None else controller[0],
+        'previous_ids': np.zeros(0, dtype=np.int64) if controller is None else controller[1],
+        'previous_time': np.nan if controller is None else controller[2],
+        'collision_count': simulation.collision_count,
+        'reuse_acc': system.accelerations_valid(),
+        # Bodies created by the last collisions, not merged yet
+        'queue_pos': queue.pos, 'queue_vel': queue.vel, 'queue_mass': queue.mass,
+        'queue_radius': queue.radius, 'queue_color': queue.color,
+        'queue_steps_collision': queue.steps_collision,
+    }
+
+    path = Path(path)
+    temporary = path.with_name(path.name + '.tmp')
+    with open(temporary, 'wb') as f:
+        np.savez(f, **state)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def checkpoint_info(path):
+    """(frame_count, simulation_time) of a checkpoint, without loading the bodies"""
+    with np.load(path) as data:
+        return int(data['frame_count']), float(data['simulation_time'])
+
+
+def load_checkpoint(simulation, path):
+    """Restore a state written by save_checkpoint; stepping on is bit-for-bit identical"""
+    system, time_manager = simulation.system, simulation.time_manager
+    with np.load(path) as data:
+        if int(data['version']) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {int(data['version'])} in {path}")
+        system.restore(data['ids'], data['pos'], data['vel'], data['mass'], data['radius'],
+                       data['color'], data['steps_collision'], int(data['next_id']))
+        system.acc[:] = data['acc']
+        if bool(data['reuse_acc']):
+            system.remember_accelerations()
+        if system.trails is not None:
+            system.trails.clear()
+
+        time_manager.restore(float(data['simulation_time']), int(data['frame_count']))
+        time_manager.current_time_step = float(data['current_time_step'])
+        if bool(data['has_previous_acc']):
+            time_manager.restore_controller((data['previous_acc'], data['previous_ids'],
+                                             float(data['previous_time'])))
+        simulation.collision_count = int(data['collision_count'])
+
+        pending = system.new_bodies
+        pending.clear()
+        if len(data['queue_mass']):
+            pending.extend(data['queue_pos'], data['queue_vel'], data['queue_mass'],
+                           data['queue_radius'], data['queue_color'])
+            pending.steps_collision[:] = data['queue_steps_collision']
+
+
+def find_checkpoint(path):
+    """`path` itself if it is a checkpoint file, else the latest checkpoint in that directory"""
+    path = Path(path)
+    if path.is_dir():
+        return Timeline(path).latest()
+    return path
+
+
+class Timeline:
+    """Periodic checkpoints of one run in a directory, and seeking across them
+
+    A checkpoint is written every `interval` frames. Seeking loads the
+    latest checkpoint at or before the target and fast-forwards headless,
+    so any point of the run can be reached by re-simulating at most
+    `interval` frames.
+    """
+
+    def __init__(self, directory, interval=CHECKPOINT_INTERVAL):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.interval = max(1, interval)
+        self._checkpoints = {}  # frame_count -> simulation time
+        for path in self.directory.glob('checkpoint_*.npz'):
+            frame_count, simulation_time = checkpoint_info(path)
+            self._checkpoints[frame_count] = simulation_time
+
+    def __len__(self):
+        return len(self._checkpoints)
+
+    def path(self, frame_count):
+        return self.directory / f'checkpoint_{frame_count:010d}.npz'
+
+    def latest(self):
+        """Path of the newest checkpoint, or None"""
+        if not self._checkpoints:
+            return None
+        return self.path(max(self._checkpoints))
+
+    def save(self, simulation):
+        frame_count = simulation.time_manager.frame_count
+        save_checkpoint(simulation, self.path(frame_count))
+        self._checkpoints[frame_count] = simulation.time_manager.simulation_time
+
+    def update(self, simulation):
+        """Checkpoint the current state if this frame is due"""
+        frame_count = simulation.time_manager.frame_count
+        if frame_count % self.interval == 0 and frame_count not in self._checkpoints:
+            self.save(simulation)
+
+    def _fast_forward(self, simulation, done, history=None):
+        while not done():
+            if history is not None:
+                history.capture(simulation.system, simulation.time_manager)
+            simulation.step()
+
+    def _load_before(self, simulation, key, history=None):
+        """Load the latest checkpoint whose key(frame_count, time) is satisfied"""
+        candidates = [frame for frame, time in self._checkpoints.items() if key(frame, time)]
+        if not candidates:
+            return False
+        load_checkpoint(simulation, self.path(max(candidates)))
+        if history is not None:
+            history.clear()
+        return True
+
+    def seek_frame(self, simulation, frame_count, history=None):
+        """Jump to `frame_count`; False if no checkpoint precedes it
+
+        With a `history`, the frames simulated on the way are captured so
+        rewinding on from there is immediate.
+        """
+        if not self._load_before(simulation, lambda frame, time: frame <= frame_count, history):
+            return False
+        time_manager = simulation.time_manager
+        self._fast_forward(simulation, lambda: time_manager.frame_count >= frame_count, history)
+        return True
+
+    def seek_time(self, simulation, simulation_time, history=None):
+        """Jump to the first frame at or after `simulation_time` (seconds)"""
+        if not self._load_before(simulation, lambda frame, time: time <= simulation_time, history):
+            return False
+        time_manager = simulation.time_manager
+        self._fast_forward(simulation, lambda: time_manager.simulation_time >= simulation_time, history)
+        return True
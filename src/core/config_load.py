@@ -2,55 +2,157 @@ import json
 import os
 from pathlib import Path
 
+# Keys each config file must define, by section, with the kind of value they hold.
+# A tuple lists the values a key may take; a kind in place of a section is a top-level key.
+REQUIRED = {
+    'constants.json': {
+        'physics': {'gravitational_constant': 'positive', 'absorption_coefficient': 'number',
+                    'collision_threshold': 'number', 'mass_ratio_threshold': 'positive',
+                    'black_hole_mass': 'number', 'sun_mass': 'positive', 'AU': 'positive',
+                    'collision_cooldown_steps': 'number'},
+        'simulation': {'time_step_per_frame': 'positive',
+                       'time_step_mode': ('fixed', 'adaptive', 'block'),
+                       'time_step_accuracy': 'positive', 'max_time_step_level': 'number',
+                       'integrator': ('euler', 'leapfrog', 'velocity_verlet', 'yoshida4'),
+                       'force_engine': ('direct', 'barnes_hut', 'particle_mesh', 'parallel'),
+                       'kernel_backend': ('auto', 'numba', 'numpy', 'python'),
+                       'barnes_hut_theta': 'positive', 'pm_grid_size': 'positive',
+                       'pm_padding': 'number', 'pm_short_range': 'flag', 'parallel_workers': 'number',
+                       'history_budget_mb': 'positive', 'history_keyframe_interval': 'positive',
+                       'trajectory_chunk_frames': 'positive', 'checkpoint_interval': 'positive',
+                       'orbit_sample_interval': 'positive', 'steps_per_second': 'positive',
+                       'max_substeps': 'positive', 'physics_budget_ms': 'positive',
+                       'interpolate': 'flag', 'physics_thread': 'flag', 'target_fps': 'positive'},
+        'events': {'file': 'optional text', 'level': ('debug', 'info', 'warning'),
+                   'categories': 'section', 'buffer_records': 'positive', 'echo': 'flag'},
+        'stream': {'host': 'text', 'port': 'number', 'position_quantum_m': 'positive',
+                   'velocity_quantum': 'positive', 'max_queue_frames': 'positive',
+                   'compression_level': 'number'},
+    },
+    'display.json': {
+        'window': {'width': 'positive', 'height': 'positive', 'title': 'text'},
+        'font': {'name': 'text', 'size': 'positive'},
+        'labels': {'mode': ('all', 'largest', 'selected', 'none'), 'largest_count': 'number',
+                   'refresh_hz': 'positive'},
+        'text_cache_size': 'positive',
+        'render': {'mode': ('auto', 'detailed', 'bulk'), 'detail_max_bodies': 'number',
+                   'frame_budget_ms': 'positive', 'bulk_detail_bodies': 'number', 'density': 'flag'},
+        'view': {'zoom_step': 'positive', 'min_zoom': 'positive', 'max_zoom': 'positive',
+                 'cull_margin_px': 'number', 'edge_sectors': 'positive'},
+    },
+}
+
 class ConfigLoader:
+    """Reads the JSON files in config/, each one only once
+
+    Every load_* method returns the same parsed (and validated) object on
+    later calls, so modules can read their constants at import without
+    re-reading the files. reload() drops the cache.
+    """
+
     def __init__(self):
         # Get the project root directory (2 levels up from this file)
         self.project_root = Path(__file__).parent.parent.parent
         self.config_dir = self.project_root / "config"
-    
-    def load_constants(self):
-        """Load physics constants from JSON file"""
-        config_path = self.config_dir / "constants.json"
+        self._cache = {}
+
+    def _load(self, name, check=None):
+        """Parse and validate config/<name>, memoized"""
+        if name not in self._cache:
+            config_path = self.config_dir / name
+            data = self._read_json(config_path)
+            validate(data, REQUIRED.get(name, {}), config_path)
+            if check is not None:
+                check(data, config_path)
+            self._cache[name] = data
+        return self._cache[name]
+
+    @staticmethod
+    def _read_json(config_path):
         try:
             with open(config_path, 'r') as f:
                 return json.load(f)
-            return data['physics']
         except FileNotFoundError:
             raise FileNotFoundError(f"Configuration file not found: {config_path}")
         except json.JSONDecodeError as e:
             raise ValueError(f"Invalid JSON in {config_path}: {e}")
-    
+
+    def reload(self):
+        """Forget every loaded file, so the next load reads it again"""
+        self._cache.clear()
+
+    def load_constants(self):
+        """Load physics constants from JSON file"""
+        return self._load("constants.json")
+
     def load_colors(self):
         """Load color definitions from JSON file"""
-        config_path = self.config_dir / "colors.json"
-        try:
-            with open(config_path, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Configuration file not found: {config_path}")
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid JSON in {config_path}: {e}")
-    
+        return self._load("colors.json", validate_colors)
+
     def load_display_settings(self):
         """Load display settings from JSON file"""
-        config_path = self.config_dir / "display.json"
-        try:
-            with open(config_path, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Configuration file not found: {config_path}")
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid JSON in {config_path}: {e}")
-    def load_bodies(self):
-        """Load initial bodies configuration from JSON file"""
-        config_path = self.config_dir / "bodies.json"
-        try:
-            with open(config_path, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Configuration file not found: {config_path}")
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid JSON in {config_path}: {e}")
-        
+        return self._load("display.json")
+
+    def load_bodies(self, scenario=None):
+        """Load initial bodies configuration from JSON file
+
+        `scenario` is a file name inside the config directory or a path;
+        defaults to bodies.json. Scenarios are not cached.
+        """
+        return self._read_json(self.resolve_path(scenario or "bodies.json"))
+
+    def resolve_path(self, name):
+        """Return `name` as given if it exists, otherwise inside the config directory"""
+        path = Path(name)
+        if path.exists():
+            return path
+        return self.config_dir / name
+
+def _is_kind(value, kind):
+    """Whether `value` is of `kind`: one of the names used in REQUIRED, or a tuple of allowed values"""
+    if isinstance(kind, tuple):
+        return value in kind
+    if kind == 'flag':
+        return isinstance(value, bool)
+    if kind == 'text':
+        return isinstance(value, str)
+    if kind == 'optional text':
+        return value is None or isinstance(value, str)
+    if kind == 'section':
+        return isinstance(value, dict)
+    number = isinstance(value, (int, float)) and not isinstance(value, bool)
+    return number and (kind == 'number' or value > 0)
+
+
+def validate(data, required, path):
+    """Raise ValueError naming the first key of `required` missing from `data` or of the wrong kind"""
+    for section, keys in required.items():
+        if not isinstance(keys, dict):
+            if section not in data:
+                raise ValueError(f"Missing key {section} in {path}")
+            if not _is_kind(data[section], keys):
+                raise ValueError(f"{section} in {path} must be {_describe(keys)}, not {data[section]!r}")
+            continue
+        if not isinstance(data.get(section), dict):
+            raise ValueError(f"Missing section {section!r} in {path}")
+        for key, kind in keys.items():
+            if key not in data[section]:
+                raise ValueError(f"Missing key {section}.{key} in {path}")
+            value = data[section][key]
+            if not _is_kind(value, kind):
+                raise ValueError(f"{section}.{key} in {path} must be {_describe(kind)}, not {value!r}")
+
+
+def _describe(kind):
+    if isinstance(kind, tuple):
+        return 'one of ' + ', '.join(map(repr, kind))
+    return f"a {kind} value"
+
+def validate_colors(colors, path):
+    for name, value in colors.items():
+        if (not isinstance(value, list) or len(value) != 3
+                or not all(isinstance(c, int) and 0 <= c <= 255 for c in value)):
+            raise ValueError(f"Color {name!r} in {path} must be three integers 0-255")
+
 # Create a global instance for easy access
-config = ConfigLoader()
\ No newline at end of file
+config = ConfigLoader()
@@ -0,0 +1,210 @@
+import argparse
+import copy
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from pathlib import Path
+import numpy as np
+from core.config_load import config
+
+LARGEST_MASSES = 10  # Final masses recorded per member, largest first
+THREAD_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'NUMBA_NUM_THREADS')
+
+
+def _assign(data, path, value):
+    """Set the value at a dotted `path` ("physics.AU", "initial_bodies.2.radius") of nested JSON"""
+    keys = path.split('.')
+    for key in keys[:-1]:
+        data = data[int(key)] if isinstance(data, list) else data[key]
+    last = int(keys[-1]) if isinstance(data, list) else keys[-1]
+    if isinstance(data, dict) and last not in data:
+        raise KeyError(path)
+    data[last] = value
+
+
+def expand(spec):
+    """The members of a sweep spec, in a fixed order
+
+    Every combination of the "parameters" lists (dotted paths starting
+    with "constants." or "bodies."), each run "repeats" times. The key
+    identifies a member by everything that affects its result, so a
+    resumed sweep only skips members that ran with the same settings.
+    """
+    parameters = spec.get('parameters', {})
+    for path, values in parameters.items():
+        if path.split('.')[0] not in ('constants', 'bodies') or not isinstance(values, list) or not values:
+            raise ValueError(f"Sweep parameter {path!r} needs a 'constants.' or 'bodies.' path and a list of values")
+    engines = parameters.get('constants.simulation.force_engine',
+                             [config.load_constants()['simulation']['force_engine']])
+    if 'parallel' in engines:
+        raise ValueError("The 'parallel' force engine starts its own process pool; use another engine in a sweep")
+    members = []
+    combinations = itertools.product(*parameters.values())
+    for values, repeat in itertools.product(list(combinations), range(spec.get('repeats', 1))):
+        member = {
+            'scenario': spec.get('scenario', 'bodies.json'),
+            'steps': spec['steps'],
+            'parameters': dict(zip(parameters, values)),
+            'repeat': repeat,
+            'velocity_jitter': spec.get('velocity_jitter', 0.0),
+            'seed': spec.get('seed', 0),
+        }
+        member['key'] = hashlib.sha1(json.dumps(member, sort_keys=True).encode()).hexdigest()[:16]
+        member['member'] = len(members)
+        members.append(member)
+    return members
+
+
+def _summary(simulation, initial_energy, wall_time):
+    """Compact end-of-run metrics of one member"""
+    from core.physics import G, kinetic_energy, potential_energy
+    system = simulation.system
+    pos, vel, mass = system.pos, system.vel, system.mass
+    energy = kinetic_energy(vel, mass) + potential_energy(pos, mass)
+
+    # Ejected: moving faster than the escape speed from the rest of the mass, seen from the center of mass
+    total = mass.sum()
+    offset = pos - (mass[:, np.newaxis] * pos).sum(axis=0) / total
+    relative_vel = vel - (mass[:, np.newaxis] * vel).sum(axis=0) / total
+    speed_sq = np.einsum('ij,ij->i', relative_vel, relative_vel)
+    with np.errstate(divide='ignore'):
+        escape_sq = 2 * G * (total - mass) / np.sqrt(np.einsum('ij,ij->i', offset, offset))
+    return {
+        'status': 'ok',
+        'steps': simulation.time_manager.frame_count,
+        'simulated_days': simulation.time_manager.simulation_time / 86400,
+        'bodies': len(system),
+        'total_mass': float(total),
+        'largest_masses': np.sort(mass)[::-1][:LARGEST_MASSES].tolist(),
+        'collisions': simulation.collision_count,
+        'ejected': int((speed_sq > escape_sq).sum()),
+        'energy_drift': (energy - initial_energy) / abs(initial_energy) if initial_energy else 0.0,
+        'wall_time': wall_time,
+    }
+
+
+def run_member(member):
+    """Run one member headless and return its result record
+
+    Meant for a fresh process: the overrides are applied to the loaded
+    config before the physics modules are imported, since those read
+    their constants at import. Errors are returned as a failed record.
+    """
+    record = {'key': member['key'], 'member': member['member'], 'parameters': member['parameters'],
+              'repeat': member['repeat']}
+    try:
+        constants = config.load_constants()
+        bodies = None
+        for path, value in member['parameters'].items():
+            section, path = path.split('.', 1)
+            if section == 'constants':
+                _assign(constants, path, value)
+            else:
+                if bodies is None:
+                    if Path(member['scenario']).suffix == '.npz':
+                        raise ValueError("'bodies.' parameters need a JSON scenario, not a compiled one")
+                    bodies = copy.deepcopy(config.load_bodies(member['scenario']))
+                _assign(bodies, path, value)
+
+        from core.objects import BodySystem
+        from core.physics import kinetic_energy, potential_energy
+        from core.scenario import compile_bodies, load_scenario
+        from core.simulation import Simulation
+        columns = compile_bodies(bodies) if bodies is not None else load_scenario(member['scenario'])
+        if member['velocity_jitter']:
+            # Same jitter for the same repeat in every combination, so combinations compare like for like
+            rng = np.random.default_rng([member['seed'], member['repeat']])
+            columns['vel'] = columns['vel'] * (1 + member['velocity_jitter'] * rng.normal(0, 1, columns['vel'].shape))
+        system = BodySystem(capacity=len(columns['mass']))
+        system.extend(columns['pos'], columns['vel'], columns['mass'], columns['radius'], columns['color'])
+        simulation = Simulation(system=system)
+
+        record['bodies_initial'] = len(system)
+        initial_energy = kinetic_energy(system.vel, system.mass) + potential_energy(system.pos, system.mass)
+        start = time.perf_counter()
+        for _ in range(member['steps']):
+            simulation.step()
+        record.update(_summary(simulation, initial_energy, time.perf_counter() - start))
+    except Exception as e:
+        record.update({'status': 'failed', 'error': f'{type(e).__name__}: {e}',
+                       'traceback': traceback.format_exc(limit=5)})
+    return record
+
+
+def read_results(path):
+    """Latest record of each member key in a results file (missing file: none)"""
+    results = {}
+    if not Path(path).exists():
+        return results
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A line cut short by an interrupted run
+            results[record['key']] = record
+    return results
+
+
+def run_sweep(spec, results_path, workers=0, log=print):
+    """Run every member of `spec` without an 'ok' record in `results_path`, appending records as they finish
+
+    Each member runs in its own spawned worker process (one task per
+    process, so config overrides never leak between members). Worker
+    count defaults to the core count and never exceeds the pending
+    members; NumPy's (and Numba's) thread pools are limited to one thread per worker.
+    Returns the number of members that failed.
+    """
+    members = expand(spec)
+    done = {key for key, record in read_results(results_path).items() if record.get('status') == 'ok'}
+    pending = [member for member in members if member['key'] not in done]
+    log(f'{len(members)} members, {len(members) - len(pending)} already done, {len(pending)} to run')
+    if not pending:
+        return 0
+
+    workers = min(workers or os.cpu_count(), len(pending))
+    for name in THREAD_VARIABLES:
+        os.environ[name] = '1'  # Inherited by the workers before they import NumPy
+    failed = 0
+    context = multiprocessing.get_context('spawn')
+    with open(results_path, 'a') as results, context.Pool(workers, maxtasksperchild=1) as pool:
+        for finished, record in enumerate(pool.imap_unordered(run_member, pending), 1):
+            results.write(json.dumps(record) + '\n')
+            results.flush()
+            if record['status'] == 'ok':
+                log(f"[{finished}/{len(pending)}] member {record['member']}: {record['bodies']} bodies, "
+                    f"{record['collisions']} collisions, drift {record['energy_drift']:.2e}, "
+                    f"{record['wall_time']:.1f} s")
+            else:
+                failed += 1
+                log(f"[{finished}/{len(pending)}] member {record['member']} failed: {record['error']}")
+    return failed
+
+
+def main(argv=None):
+    """Run a parameter sweep over a process pool"""
+    parser = argparse.ArgumentParser(description="Run an ensemble of headless simulations from a sweep spec")
+    parser.add_argument('spec', help="Sweep spec (JSON), a name inside config/ or a path")
+    parser.add_argument('--results', metavar='FILE', default=None,
+                        help="JSON lines results file, appended to and used to resume (default: SPEC.results.jsonl)")
+    parser.add_argument('--workers', type=int, default=0, help="Worker processes (default: one per core)")
+    parser.add_argument('--dry-run', action='store_true', help="List the members without running them")
+    args = parser.parse_args(argv)
+
+    spec_path = config.resolve_path(args.spec)
+    with open(spec_path) as f:
+        spec = json.load(f)
+    if args.dry_run:
+        for member in expand(spec):
+            print(f"{member['member']} {member['key']} repeat {member['repeat']} {member['parameters']}")
+        return
+    results_path = args.results or spec_path.with_suffix('.results.jsonl')
+    failed = run_sweep(spec, results_path, args.workers)
+    print(f'Results in {results_path}' + (f'; {failed} failed, run again to retry them' if failed else ''))
+
+if __name__ == "__main__":
+    main()
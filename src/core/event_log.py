@@ -0,0 +1,210 @@
+import argparse
+import queue
+import threading
+import numpy as np
+from core.config_load import config
+
+# Load constants
+event_constants = config.load_constants()['events']
+
+LEVELS = ('debug', 'info', 'warning')
+# Category -> level its records are emitted at
+CATEGORIES = {
+    'collision': 'info',
+    'merger': 'info',
+    'absorption': 'info',
+    'body_created': 'debug',
+    'body_removed': 'debug',
+    'position': 'debug',
+}
+EVENT_FILE = event_constants['file']
+EVENT_LEVEL = event_constants['level']
+CATEGORY_SETTINGS = event_constants['categories']  # Per category: level threshold and sample rate
+BUFFER_RECORDS = event_constants['buffer_records']
+ECHO = event_constants['echo']
+MAGIC = b'GRAVEVT1'
+VERSION = 1
+
+# File layout: HEADER, then EVENT records until the end of the file
+HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('record_size', '<u4')])
+EVENT = np.dtype([('frame', '<i8'), ('time', '<f8'), ('category', 'u1'), ('level', 'u1'),
+                  ('body', '<i8'), ('other', '<i8'), ('x', '<f8'), ('y', '<f8'),
+                  ('mass', '<f8'), ('value', '<f8')], align=True)
+CATEGORY_CODES = {name: code for code, name in enumerate(CATEGORIES)}
+
+
+class EventLog:
+    """Typed simulation events, buffered in memory and written by a background thread
+
+    Physics code calls emit() with a category and a few numeric fields.
+    A category is recorded only if its level passes the category's
+    threshold (or the global `level`) and then only one record in
+    1/sample is kept. With no file and no echo, or for a filtered
+    category, emit() returns after one dict lookup. Kept records go into
+    a preallocated structured array; each full buffer is handed to the
+    writer thread, so the simulation never waits on the disk.
+
+    Records are stamped with `frame` and `time`, which Simulation.step
+    keeps current.
+    """
+
+    def __init__(self, level=EVENT_LEVEL, categories=CATEGORY_SETTINGS, buffer_records=BUFFER_RECORDS,
+                 echo=ECHO):
+        self.level = level
+        self.categories = categories
+        self.buffer_records = max(1, buffer_records)
+        self.echo = echo
+        self.frame = 0
+        self.time = 0.0
+        self.counts = dict.fromkeys(CATEGORIES, 0)  # Records kept per category
+        self._buffer = np.empty(self.buffer_records, dtype=EVENT)
+        self._used = 0
+        self._file = None
+        self._queue = None
+        self._thread = None
+        self._error = None
+        self._strides = {}
+        self._seen = {}
+        self._configure()
+
+    def _configure(self):
+        """Work out which categories are recorded, and their sampling strides"""
+        self._strides = {}
+        self._seen = dict.fromkeys(CATEGORIES, 0)
+        if self._file is None and not self.echo:
+            return
+        for name, level in CATEGORIES.items():
+            settings = self.categories.get(name, {})
+            threshold = settings.get('level', self.level)
+            sample = settings.get('sample', 1.0)
+            if LEVELS.index(level) >= LEVELS.index(threshold) and sample > 0:
+                self._strides[name] = max(1, round(1 / sample))
+
+    def set_level(self, level, category=None):
+        """Change the global level threshold, or one category's"""
+        if category is None:
+            self.level = level
+        else:
+            self.categories = {**self.categories, category: {**self.categories.get(category, {}),
+                                                              'level': level}}
+        self._configure()
+
+    def wants(self, category):
+        """Whether records of `category` are kept at all (to skip building costly fields)"""
+        return category in self._strides
+
+    def emit(self, category, body=-1, other=-1, x=0.0, y=0.0, mass=0.0, value=0.0):
+        """Record one event; the meaning of the numeric fields depends on the category"""
+        stride = self._strides.get(category)
+        if stride is None:
+            return
+        seen = self._seen[category]
+        self._seen[category] = seen + 1
+        if seen % stride:
+            return
+        self.counts[category] += 1
+        record = (self.frame, self.time, CATEGORY_CODES[category], LEVELS.index(CATEGORIES[category]),
+                  body, other, x, y, mass, value)
+        if self.echo:
+            print(format_event(np.array(record, dtype=EVENT)))
+        if self._file is None:
+            return
+        self._buffer[self._used] = record
+        self._used += 1
+        if self._used == self.buffer_records:
+            self.flush()
+
+    # Writing
+
+    def open(self, path):
+        """Write the kept records to `path` from now on"""
+        self.close()
+        self._file = open(path, 'wb')
+        header = np.zeros((), dtype=HEADER)
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['record_size'] = EVENT.itemsize
+        self._file.write(header.tobytes())
+        self._error = None
+        self._queue = queue.Queue()  # Unbounded, so emit() never waits on the disk
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+        self._configure()
+
+    def _write_loop(self):
+        """Background thread: write buffers in order until told to stop"""
+        while True:
+            records = self._queue.get()
+            if records is None:
+                return
+            try:
+                self._file.write(records.tobytes())
+            except OSError as e:
+                self._error = e
+
+    def flush(self):
+        """Hand the buffered records to the writer thread"""
+        if self._file is None or not self._used:
+            return
+        self._queue.put(self._buffer[:self._used])
+        self._buffer = np.empty(self.buffer_records, dtype=EVENT)
+        self._used = 0
+
+    def close(self):
+        """Write everything still buffered and close the file"""
+        if self._file is None:
+            return
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        self._file = None
+        self._configure()
+        if self._error is not None:
+            raise self._error
+
+
+# Create a global instance for easy access
+event_log = EventLog()
+
+
+def read_events(path):
+    """All records of an event file as a structured array (see EVENT)"""
+    with open(path, 'rb') as f:
+        header = np.frombuffer(f.read(HEADER.itemsize), dtype=HEADER)[0]
+        if header['magic'] != MAGIC or header['record_size'] != EVENT.itemsize:
+            raise ValueError(f"Not an event log: {path}")
+        data = f.read()
+    usable = len(data) - len(data) % EVENT.itemsize  # A crash may leave a partial record
+    return np.frombuffer(data[:usable], dtype=EVENT)
+
+
+def format_event(record):
+    """One line of text for an EVENT record"""
+    category = list(CATEGORIES)[int(record['category'])]
+    text = f"frame {int(record['frame'])} t={float(record['time']) / 86400:.2f}d {category}"
+    if record['body'] >= 0:
+        text += f" body {int(record['body'])}"
+    if record['other'] >= 0:
+        text += f" other {int(record['other'])}"
+    return (text + f" pos=({float(record['x']):.4g}, {float(record['y']):.4g}) "
+            f"mass={float(record['mass']):.4g} value={float(record['value']):.4g}")
+
+
+def main(argv=None):
+    """Print the records of an event file"""
+    parser = argparse.ArgumentParser(description="Print a simulation event log")
+    parser.add_argument('path', help="Event file written with --event-log")
+    parser.add_argument('--category', choices=list(CATEGORIES), action='append',
+                        help="Only print these categories (repeatable)")
+    args = parser.parse_args(argv)
+
+    records = read_events(args.path)
+    if args.category:
+        records = records[np.isin(records['category'], [CATEGORY_CODES[c] for c in args.category])]
+    for record in records:
+        print(format_event(record))
+    print(f'{len(records)} events')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+import numpy as np
+from core.config_load import config
+from core.physics import kinetic_energy, potential_energy
+
+# Load constants
+constants = config.load_constants()['physics']
+
+G = constants['gravitational_constant']
+AU = constants['AU']
+SUN_MASS = constants['sun_mass']
+VIRIAL_SAMPLE = 4000  # Bodies used to estimate the potential energy of larger populations
+
+
+def _columns(pos, vel, mass, radius, color, name):
+    return {'pos': pos, 'vel': vel, 'mass': mass, 'radius': radius, 'color': color,
+            'name': np.full(len(mass), name)}
+
+
+def _concatenate(*parts):
+    """Join column dicts, in order"""
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def _central_body(mass, radius, color):
+    return _columns(np.zeros((1, 2)), np.zeros((1, 2)), np.array([mass], dtype=float),
+                    np.array([radius], dtype=float), np.array([color], dtype=np.uint8), 'Central Body')
+
+
+def _random_directions(rng, n):
+    angle = rng.uniform(0, 2 * np.pi, n)
+    return np.stack([np.cos(angle), np.sin(angle)], axis=1)
+
+
+def _enclosed_mass(radius, mass):
+    """Mass inside each body's radius (bodies at smaller radius, spherical approximation)"""
+    order = np.argsort(radius, kind='stable')
+    enclosed = np.empty_like(mass)
+    enclosed[order] = np.cumsum(mass[order]) - mass[order]
+    return enclosed
+
+
+def _remove_drift(pos, vel, mass):
+    """Move the center of mass to the origin, at rest"""
+    total = mass.sum()
+    pos -= (mass[:, np.newaxis] * pos).sum(axis=0) / total
+    vel -= (mass[:, np.newaxis] * vel).sum(axis=0) / total
+
+
+def _potential_energy(pos, mass, rng, sample=VIRIAL_SAMPLE):
+    """Potential energy, estimated from a random subset above `sample` bodies"""
+    if len(mass) <= sample:
+        return potential_energy(pos, mass)
+    subset = rng.choice(len(mass), sample, replace=False)
+    # Scale by the ratio of pair mass products, all pairs vs. sampled pairs
+    pairs = mass.sum()**2 - (mass**2).sum()
+    sampled_pairs = mass[subset].sum()**2 - (mass[subset]**2).sum()
+    return potential_energy(pos[subset], mass[subset]) * pairs / sampled_pairs
+
+
+def virialize(pos, vel, mass, ratio, rng):
+    """Scale velocities in place so that kinetic / |potential| energy equals `ratio`
+
+    0.5 is virial equilibrium; 0 leaves every body at rest (cold collapse).
+    """
+    kinetic = kinetic_energy(vel, mass)
+    if ratio <= 0 or kinetic == 0:
+        vel[:] = 0
+        return
+    vel *= np.sqrt(ratio * abs(_potential_energy(pos, mass, rng)) / kinetic)
+
+
+def exponential_disk(rng, count, scale_length, total_mass, central_mass=0.0, max_radius=None,
+                     dispersion=0.0, radius=1, color=(255, 255, 255), central_radius=30,
+                     central_color=(255, 255, 0)):
+    """Disk with surface density ∝ exp(-R / scale_length), on circular orbits
+
+    Radii follow R·exp(-R/Rd) (the radial distribution of an exponential
+    disk), truncated at `max_radius` (default 10 scale lengths). Each body
+    moves at the circular speed set by the central mass plus the disk mass
+    inside its radius, with optional Gaussian `dispersion` as a fraction
+    of that speed.
+    """
+    max_radius = 10 * scale_length if max_radius is None else max_radius
+    r = rng.gamma(2.0, scale_length, count)
+    while (r > max_radius).any():
+        outside = r > max_radius
+        r[outside] = rng.gamma(2.0, scale_length, int(outside.sum()))
+    direction = _random_directions(rng, count)
+    pos = r[:, np.newaxis] * direction
+    mass = np.full(count, total_mass / count)
+
+    speed = np.sqrt(G * (central_mass + _enclosed_mass(r, mass)) / r)
+    tangent = np.stack([-direction[:, 1], direction[:, 0]], axis=1)
+    vel = speed[:, np.newaxis] * tangent
+    if dispersion > 0:
+        vel += rng.normal(0, 1, (count, 2)) * (dispersion * speed)[:, np.newaxis]
+
+    disk = _columns(pos, vel, mass, np.full(count, radius, dtype=float),
+                    np.tile(np.array(color, dtype=np.uint8), (count, 1)), 'Disk')
+    if central_mass > 0:
+        disk = _concatenate(_central_body(central_mass, central_radius, central_color), disk)
+    _remove_drift(disk['pos'], disk['vel'], disk['mass'])
+    return disk
+
+
+def plummer_sphere(rng, count, scale_radius, total_mass, virial_ratio=0.5, radius=1,
+                   color=(255, 255, 255)):
+    """Plummer model (cumulative mass M·r³/(r²+a²)^{3/2}) seen in the simulation plane
+
+    Radii invert the Plummer cumulative mass profile and speeds come from
+    its distribution function (von Neumann rejection, Aarseth et al. 1974),
+    both with random directions in the plane. As the model is flattened
+    into 2D, the velocities are then rescaled to `virial_ratio`.
+    """
+    x = rng.uniform(1e-6, 1 - 1e-6, count)
+    r = scale_radius / np.sqrt(x**(-2 / 3) - 1)
+    pos = r[:, np.newaxis] * _random_directions(rng, count)
+
+    # Speed as a fraction q of the escape speed, q² (1 - q²)^{7/2} distributed
+    q = np.zeros(count)
+    todo = np.arange(count)
+    while len(todo):
+        candidate = rng.uniform(0, 1, len(todo))
+        accept = rng.uniform(0, 0.1, len(todo)) < candidate**2 * (1 - candidate**2)**3.5
+        q[todo[accept]] = candidate[accept]
+        todo = todo[~accept]
+    escape = np.sqrt(2 * G * total_mass / scale_radius) * (1 + (r / scale_radius)**2)**-0.25
+    vel = (q * escape)[:, np.newaxis] * _random_directions(rng, count)
+
+    mass = np.full(count, total_mass / count)
+    _remove_drift(pos, vel, mass)
+    virialize(pos, vel, mass, virial_ratio, rng)
+    return _columns(pos, vel, mass, np.full(count, radius, dtype=float),
+                    np.tile(np.array(color, dtype=np.uint8), (count, 1)), 'Plummer')
+
+
+def kepler_belt(rng, count, central_mass, inner, outer, total_mass=0.0, max_eccentricity=0.0,
+                radius=1, color=(255, 255, 255), central_radius=30, central_color=(255, 255, 0)):
+    """Belt of bodies on Kepler orbits around a central mass
+
+    Semi-major axes are spread evenly over the annulus area between
+    `inner` and `outer`; eccentricities are uniform up to
+    `max_eccentricity`, with random orientation and orbital phase. Each
+    body's position and velocity follow from its orbital elements.
+    """
+    a = np.sqrt(rng.uniform(inner**2, outer**2, count))
+    e = rng.uniform(0, max_eccentricity, count)
+    periapsis = rng.uniform(0, 2 * np.pi, count)
+    anomaly = rng.uniform(0, 2 * np.pi, count)  # True anomaly
+
+    # Position and velocity in the orbital plane (r, θ components), then rotated
+    p = a * (1 - e**2)
+    r = p / (1 + e * np.cos(anomaly))
+    h = np.sqrt(G * central_mass / p)
+    radial_speed = h * e * np.sin(anomaly)
+    tangential_speed = h * (1 + e * np.cos(anomaly))
+    angle = periapsis + anomaly
+    direction = np.stack([np.cos(angle), np.sin(angle)], axis=1)
+    tangent = np.stack([-direction[:, 1], direction[:, 0]], axis=1)
+    pos = r[:, np.newaxis] * direction
+    vel = radial_speed[:, np.newaxis] * direction + tangential_speed[:, np.newaxis] * tangent
+
+    belt = _columns(pos, vel, np.full(count, total_mass / count), np.full(count, radius, dtype=float),
+                    np.tile(np.array(color, dtype=np.uint8), (count, 1)), 'Belt')
+    belt = _concatenate(_central_body(central_mass, central_radius, central_color), belt)
+    _remove_drift(belt['pos'], belt['vel'], belt['mass'])
+    return belt
+
+
+def uniform_field(rng, count, field_radius, total_mass, virial_ratio=0.5, radius=1,
+                  color=(255, 255, 255)):
+    """Bodies spread uniformly over a disk, with random directions scaled to `virial_ratio`
+
+    With virial_ratio 0 every body starts at rest (cold collapse).
+    """
+    r = field_radius * np.sqrt(rng.uniform(0, 1, count))
+    pos = r[:, np.newaxis] * _random_directions(rng, count)
+    vel = rng.normal(0, 1, (count, 2))
+    mass = np.full(count, total_mass / count)
+    _remove_drift(pos, vel, mass)
+    virialize(pos, vel, mass, virial_ratio, rng)
+    return _columns(pos, vel, mass, np.full(count, radius, dtype=float),
+                    np.tile(np.array(color, dtype=np.uint8), (count, 1)), 'Field')
+
+
+# Scenario config: generator type -> (function, {config key: (argument, unit)})
+GENERATORS = {
+    'exponential_disk': (exponential_disk, {
+        'scale_length_au': ('scale_length', AU), 'total_mass_sun': ('total_mass', SUN_MASS),
+        'central_mass_sun': ('central_mass', SUN_MASS), 'max_radius_au': ('max_radius', AU),
+        'dispersion': ('dispersion', 1)}),
+    'plummer': (plummer_sphere, {
+        'scale_radius_au': ('scale_radius', AU), 'total_mass_sun': ('total_mass', SUN_MASS),
+        'virial_ratio': ('virial_ratio', 1)}),
+    'kepler_belt': (kepler_belt, {
+        'central_mass_sun': ('central_mass', SUN_MASS), 'inner_au': ('inner', AU),
+        'outer_au': ('outer', AU), 'total_mass_sun': ('total_mass', SUN_MASS),
+        'max_eccentricity': ('max_eccentricity', 1)}),
+    'uniform': (uniform_field, {
+        'radius_au': ('field_radius', AU), 'total_mass_sun': ('total_mass', SUN_MASS),
+        'virial_ratio': ('virial_ratio', 1)}),
+}
+
+
+def generate(spec, colors):
+    """Columns for one entry of a scenario's "generators" list
+
+    `spec` names the generator in "type" and gives "count", an optional
+    "seed", lengths in AU, masses in solar masses, an optional pixel
+    "radius", a "color" (one name or a list to pick from at random), and
+    an optional "offset_au" / "velocity" ({"x", "y"}, m/s) for the whole
+    group. `colors` maps color names to RGB.
+    """
+    kind = spec.get('type')
+    if kind not in GENERATORS:
+        raise ValueError(f"Unknown generator {kind!r}; expected one of {', '.join(GENERATORS)}")
+    function, parameters = GENERATORS[kind]
+    if not isinstance(spec.get('count'), int) or spec['count'] < 1:
+        raise ValueError(f"Generator {kind!r} needs a positive integer 'count'")
+    unknown = set(spec) - set(parameters) - {'type', 'count', 'seed', 'radius', 'color',
+                                             'central_radius', 'central_color', 'offset_au', 'velocity'}
+    if unknown:
+        raise ValueError(f"Unknown keys for generator {kind!r}: {', '.join(sorted(unknown))}")
+
+    rng = np.random.default_rng(spec.get('seed', 0))
+    arguments = {argument: spec[key] * unit for key, (argument, unit) in parameters.items() if key in spec}
+    for key in ('radius', 'central_radius'):
+        if key in spec:
+            arguments[key] = spec[key]
+    if 'central_color' in spec:
+        arguments['central_color'] = colors[spec['central_color']]
+    color = spec.get('color', 'white')
+    names = [color] if isinstance(color, str) else list(color)
+    for name in names + ([spec['central_color']] if 'central_color' in spec else []):
+        if name not in colors:
+            raise ValueError(f"Unknown color: {name}")
+    try:
+        columns = function(rng, spec['count'], **arguments)
+    except TypeError as e:
+        raise ValueError(f"Generator {kind!r}: {e}") from None
+
+    # Colors picked at random from the list (the central body keeps its own)
+    palette = np.array([colors[name] for name in names], dtype=np.uint8)
+    generated = columns['name'] != 'Central Body'
+    columns['color'][generated] = palette[rng.integers(len(palette), size=int(generated.sum()))]
+
+    if 'offset_au' in spec:
+        columns['pos'] += np.array([spec['offset_au']['x'], spec['offset_au']['y']]) * AU
+    if 'velocity' in spec:
+        columns['vel'] += np.array([spec['velocity']['x'], spec['velocity']['y']])
+    return columns
@@ -0,0 +1,194 @@
+import collections
+import numpy as np
+from core.config_load import config
+
+# Load constants
+simulation_constants = config.load_constants()['simulation']
+
+HISTORY_BUDGET_MB = simulation_constants['history_budget_mb']
+KEYFRAME_INTERVAL = simulation_constants['history_keyframe_interval']
+
+# Per-body columns stored every frame (only the fields that change each step)
+ID, X, Y, X_VEL, Y_VEL, STEPS = range(6)
+FIELDS = 6
+
+# Frame record kept in the index: where its rows live and when it was taken
+Frame = collections.namedtuple('Frame', 'offset count frame_count simulation_time next_id events controller')
+
+# Body events between two stored frames. `before`/`after` are
+# (mass, radius, color) tuples, or None when the body did not exist.
+Event = collections.namedtuple('Event', 'body_id before after')
+
+
+class HistoryRing:
+    """Rewind history in one preallocated array with a budget in megabytes
+
+    Each stored frame takes count * FIELDS float64 slots (id, position,
+    velocity, collision cooldown) in a circular buffer; the oldest frames
+    are overwritten when it is full. Mass, radius and color only change
+    when bodies collide, appear or disappear, so they are recorded as
+    events instead, which keeps rewind correct across collisions.
+
+    With keyframe_interval = k > 1 only every k-th frame is stored and
+    rewind re-integrates forward from the nearest stored frame, so the same
+    budget reaches k times further back. Each frame also keeps the time
+    step controller's memory (accelerations of the previous frame, in the
+    adaptive and block modes, outside the budget), so the re-integrated
+    steps are the ones originally taken.
+    """
+
+    def __init__(self, budget_mb=HISTORY_BUDGET_MB, keyframe_interval=KEYFRAME_INTERVAL):
+        self.capacity = int(budget_mb * 1024 * 1024) // 8
+        self.keyframe_interval = max(1, keyframe_interval)
+        self._data = np.empty(self.capacity)
+        self._frames = collections.deque()
+        self._head = 0  # Next write offset
+        self._static = {}  # body id -> (mass, radius, color) as of the newest frame
+        self._last_ids = np.zeros(0, dtype=np.int64)
+        self._last_mass = np.zeros(0)
+        self._last_radius = np.zeros(0)
+        self._last_color = np.zeros((0, 3), dtype=np.uint8)
+
+    def __len__(self):
+        """Number of frames that can be rewound"""
+        if not self._frames:
+            return 0
+        return self._frames[-1].frame_count - self._frames[0].frame_count + 1
+
+    def clear(self):
+        self._frames.clear()
+        self._head = 0
+        self._static.clear()
+        self._remember(np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0),
+                       np.zeros((0, 3), dtype=np.uint8))
+
+    def _remember(self, ids, mass, radius, color):
+        self._last_ids, self._last_mass = ids.copy(), mass.copy()
+        self._last_radius, self._last_color = radius.copy(), color.copy()
+
+    def _diff(self, system):
+        """Events turning the newest stored frame's bodies into the system's"""
+        ids = system.ids
+        if np.array_equal(ids, self._last_ids):
+            changed = np.flatnonzero((system.mass != self._last_mass)
+                                     | (system.radius != self._last_radius)
+                                     | np.any(system.color != self._last_color, axis=1))
+            removed = added = np.zeros(0, dtype=np.int64)
+        else:
+            common, now, before = np.intersect1d(ids, self._last_ids, return_indices=True)
+            changed = now[(system.mass[now] != self._last_mass[before])
+                          | (system.radius[now] != self._last_radius[before])
+                          | np.any(system.color[now] != self._last_color[before], axis=1)]
+            added = np.flatnonzero(~np.isin(ids, self._last_ids))
+            removed = np.setdiff1d(self._last_ids, ids)
+
+        events = []
+        for i in np.concatenate([changed, added]).tolist():
+            body_id = int(ids[i])
+            after = (float(system.mass[i]), float(system.radius[i]), tuple(system.color[i].tolist()))
+            events.append(Event(body_id, self._static.get(body_id), after))
+            self._static[body_id] = after
+        for body_id in removed.tolist():
+            events.append(Event(body_id, self._static.pop(body_id), None))
+        return events
+
+    def _evict_for(self, offset, size):
+        """Drop the oldest frames until [offset, offset + size) is free"""
+        while self._frames:
+            oldest = self._frames[0]
+            start, stop = oldest.offset, oldest.offset + oldest.count * FIELDS
+            if offset == 0 and self._head != 0 and start >= self._head:
+                pass  # Wrapping: frames past the old head are older still
+            elif stop <= offset or start >= offset + size:
+                break
+            self._frames.popleft()
+
+    def capture(self, system, time_manager):
+        """Store the current state (before the step) if this frame is a keyframe"""
+        if time_manager.frame_count % self.keyframe_interval:
+            return
+        n = len(system)
+        size = n * FIELDS
+        if size > self.capacity:
+            self.clear()  # A single frame does not fit the budget
+            return
+        events = self._diff(system)
+
+        offset = self._head if self._head + size <= self.capacity else 0
+        self._evict_for(offset, size)
+        rows = self._data[offset:offset + size].reshape(n, FIELDS)
+        rows[:, ID] = system.ids
+        rows[:, X:Y + 1] = system.pos
+        rows[:, X_VEL:Y_VEL + 1] = system.vel
+        rows[:, STEPS] = system.steps_collision
+        self._head = offset + size
+        self._frames.append(Frame(offset, n, time_manager.frame_count, time_manager.simulation_time,
+                                  system._next_id, events, time_manager.controller_state()))
+        self._remember(system.ids, system.mass, system.radius, system.color)
+
+    def _rows(self, frame):
+        return self._data[frame.offset:frame.offset + frame.count * FIELDS].reshape(frame.count, FIELDS)
+
+    def _static_columns(self, ids):
+        """Mass, radius and color arrays of `ids` as of the newest frame"""
+        static = [self._static[body_id] for body_id in ids.tolist()]
+        mass = np.array([s[0] for s in static], dtype=float)
+        radius = np.array([s[1] for s in static], dtype=float)
+        color = np.array([s[2] for s in static], dtype=np.uint8).reshape(-1, 3)
+        return mass, radius, color
+
+    def _restore(self, system, frame, time_manager):
+        """Load a stored frame back into the system and the clock"""
+        rows = self._rows(frame)
+        ids = rows[:, ID].astype(np.int64)
+        mass, radius, color = self._static_columns(ids)
+
+        frames_back = time_manager.frame_count - frame.frame_count
+        system.restore(ids, rows[:, X:Y + 1], rows[:, X_VEL:Y_VEL + 1], mass, radius, color,
+                       rows[:, STEPS], frame.next_id)
+        system.new_bodies.clear()  # Debris of the undone steps
+        if system.trails is not None:
+            system.trails.rewind(frames_back)
+        time_manager.restore(frame.simulation_time, frame.frame_count)
+        time_manager.restore_controller(frame.controller)
+        return ids, mass, radius, color
+
+    def _pop(self):
+        """Drop the newest frame and undo its events"""
+        frame = self._frames.pop()
+        self._head = frame.offset
+        for event in reversed(frame.events):
+            if event.before is None:
+                self._static.pop(event.body_id, None)
+            else:
+                self._static[event.body_id] = event.before
+        return frame
+
+    def rewind(self, simulation):
+        """Step the simulation back one frame; False when history is exhausted"""
+        system, time_manager = simulation.system, simulation.time_manager
+        target = time_manager.frame_count - 1
+        while self._frames and self._frames[-1].frame_count > target:
+            self._pop()
+        if not self._frames:
+            return False
+
+        frame = self._frames[-1]
+        if frame.frame_count == target:
+            # The target frame itself is stored: load it and hand it back
+            # to the free space, it is captured again when the run resumes
+            self._restore(system, frame, time_manager)
+            self._pop()
+            if self._frames:
+                ids = self._rows(self._frames[-1])[:, ID].astype(np.int64)
+                self._remember(ids, *self._static_columns(ids))
+            else:
+                self.clear()
+            return True
+
+        # Re-integrate forward from the nearest earlier keyframe
+        ids, mass, radius, color = self._restore(system, frame, time_manager)
+        self._remember(ids, mass, radius, color)
+        for _ in range(target - frame.frame_count):
+            simulation.step()
+        return True
@@ -0,0 +1,98 @@
+import numpy as np
+
+class SemiImplicitEuler:
+    """First-order kick-drift (symplectic Euler), the original update rule"""
+
+    name = 'euler'
+    order = 1
+
+    def step(self, system, time_step):
+        # Update velocity: v = v + a * dt, then position: x = x + v * dt
+        system.acc[:] = system.start_accelerations()
+        system.vel[:] += system.acc * time_step
+        system.pos[:] += system.vel * time_step
+
+class Leapfrog:
+    """Second-order drift-kick-drift leapfrog, one force evaluation per step"""
+
+    name = 'leapfrog'
+    order = 2
+
+    def step(self, system, time_step):
+        system.pos[:] += system.vel * (time_step / 2)
+        system.acc[:] = system.accelerations(system.pos)
+        system.vel[:] += system.acc * time_step
+        system.pos[:] += system.vel * (time_step / 2)
+
+class VelocityVerlet:
+    """Second-order kick-drift-kick velocity Verlet
+
+    The acceleration at the end of a step is reused at the start of the
+    next one (BodySystem.start_accelerations), so a step costs one force
+    evaluation as long as positions and masses were not changed in
+    between (collisions, rewind, ...).
+    """
+
+    name = 'velocity_verlet'
+    order = 2
+
+    def step(self, system, time_step):
+        system.vel[:] += system.start_accelerations() * (time_step / 2)
+        system.pos[:] += system.vel * time_step
+        system.acc[:] = system.accelerations(system.pos)
+        system.vel[:] += system.acc * (time_step / 2)
+        system.remember_accelerations()
+
+class Yoshida4:
+    """Fourth-order Yoshida composition of three leapfrog steps (three force evaluations)"""
+
+    name = 'yoshida4'
+    order = 4
+
+    _w1 = 1 / (2 - 2 ** (1 / 3))
+    _w0 = -2 ** (1 / 3) / (2 - 2 ** (1 / 3))
+    DRIFTS = (_w1 / 2, (_w0 + _w1) / 2, (_w0 + _w1) / 2, _w1 / 2)
+    KICKS = (_w1, _w0, _w1)
+
+    def step(self, system, time_step):
+        for drift, kick in zip(self.DRIFTS, self.KICKS):
+            system.pos[:] += system.vel * (drift * time_step)
+            system.acc[:] = system.accelerations(system.pos)
+            system.vel[:] += system.acc * (kick * time_step)
+        system.pos[:] += system.vel * (self.DRIFTS[-1] * time_step)
+
+def block_step(system, time_step, levels):
+    """Hierarchical (block) kick-drift-kick step over power-of-two substeps
+
+    Body i advances with its own step time_step / 2**levels[i]. Every
+    body drifts on the finest tick; a body is only kicked, and its
+    acceleration only evaluated, at the boundaries of its own step, with
+    the other bodies at their drifted positions. All bodies are back in
+    sync at the end of time_step, where every acceleration has just been
+    evaluated; those stay in system.acc as the next step's start.
+    """
+    levels = np.asarray(levels, dtype=np.int64)
+    finest = int(levels.max(initial=0))
+    ticks = 2 ** finest
+    tick = time_step / ticks
+    stride = 2 ** (finest - levels)  # Ticks per step of each body
+    own_step = time_step / 2.0 ** levels
+
+    acc = system.start_accelerations()
+    for t in range(ticks):
+        starting = np.flatnonzero(t % stride == 0)
+        system.vel[starting] += acc[starting] * (own_step[starting, np.newaxis] / 2)
+        system.pos[:] += system.vel * tick
+        ending = np.flatnonzero((t + 1) % stride == 0)
+        acc[ending] = system.accelerations(system.pos, ending)
+        system.vel[ending] += acc[ending] * (own_step[ending, np.newaxis] / 2)
+    system.acc[:] = acc
+    system.remember_accelerations()
+
+INTEGRATORS = {cls.name: cls for cls in (SemiImplicitEuler, Leapfrog, VelocityVerlet, Yoshida4)}
+
+def get_integrator(name):
+    """Return a new integrator instance registered as `name`"""
+    if name not in INTEGRATORS:
+        raise ValueError(f"Unknown integrator: {name}")
+    return INTEGRATORS[name]()
@@ -0,0 +1,225 @@
+import argparse
+import math
+import sys
+import time
+import warnings
+import numpy as np
+from core.config_load import config
+from core.spatial_hash import overlapping_pairs
+
+# Load constants
+constants = config.load_constants()['physics']
+simulation_constants = config.load_constants()['simulation']
+
+G = constants['gravitational_constant']
+KERNEL_BACKEND = simulation_constants['kernel_backend']
+TILE = 1024  # Rows and columns per block of the NumPy all-pairs pass (16 MB per (TILE, TILE, 2) temporary)
+
+
+class KernelBackend:
+    """The all-pairs acceleration and collision-candidate kernels of one backend
+
+    accelerations(pos, mass, targets=None) returns the exact gravitational
+    accelerations of all bodies (or of the `targets` index array), pulled
+    by every body. overlapping_pairs(pos, reach) returns index arrays
+    (first, second), first < second, of bodies with
+    |p_i - p_j| <= reach_i + reach_j.
+    """
+
+    def __init__(self, name, accelerations, overlapping_pairs):
+        self.name = name
+        self.accelerations = accelerations
+        self.overlapping_pairs = overlapping_pairs
+
+
+# Pure Python: the reference the other backends are checked against
+
+def python_accelerations(pos, mass, targets=None):
+    """Direct sum, one pair at a time"""
+    points = pos.tolist()
+    masses = mass.tolist()
+    rows = range(len(points)) if targets is None else [int(i) for i in targets]
+    acc = []
+    for i in rows:
+        x, y = points[i]
+        ax = ay = 0.0
+        for (other_x, other_y), other_mass in zip(points, masses):
+            dx = other_x - x
+            dy = other_y - y
+            distance_sq = dx * dx + dy * dy
+            if distance_sq > 0:
+                weight = other_mass / (distance_sq * math.sqrt(distance_sq))
+                ax += weight * dx
+                ay += weight * dy
+        acc.append((G * ax, G * ay))
+    return np.array(acc, dtype=float).reshape(-1, 2)
+
+
+def python_overlapping_pairs(pos, reach):
+    """Every pair checked in turn"""
+    points = pos.tolist()
+    reach = reach.tolist()
+    first, second = [], []
+    for i in range(len(points)):
+        for j in range(i + 1, len(points)):
+            if math.hypot(points[j][0] - points[i][0], points[j][1] - points[i][1]) <= reach[i] + reach[j]:
+                first.append(i)
+                second.append(j)
+    return np.array(first, dtype=np.int64), np.array(second, dtype=np.int64)
+
+
+# NumPy: the all-pairs pass in TILE x TILE blocks, so memory stays bounded for any N
+
+def numpy_accelerations(pos, mass, targets=None):
+    """Direct sum over blocks of body pairs; up to TILE bodies it is a single block"""
+    rows = pos if targets is None else pos[targets]
+    acc = np.zeros((len(rows), 2))
+    for start in range(0, len(rows), TILE):
+        for column in range(0, len(pos), TILE):
+            # delta[i, j] points from body i to body j
+            delta = pos[np.newaxis, column:column + TILE, :] - rows[start:start + TILE, np.newaxis, :]
+            distance_sq = np.einsum('ijk,ijk->ij', delta, delta)
+            # a_i = G * sum_j m_j * delta_ij / |delta_ij|^3
+            with np.errstate(divide='ignore', invalid='ignore'):
+                weight = mass[np.newaxis, column:column + TILE] / (distance_sq * np.sqrt(distance_sq))
+            weight[~np.isfinite(weight)] = 0.0
+            acc[start:start + TILE] += np.einsum('ij,ijk->ik', weight, delta)
+    return G * acc
+
+
+# Numba: compiled loops, rows spread over all cores; only built when Numba is installed
+
+def _numba_kernels():
+    """Compile the Numba kernels; raises ImportError without Numba"""
+    import numba
+
+    @numba.njit(parallel=True, cache=True)
+    def accelerations_kernel(pos, mass, rows, g):
+        acc = np.zeros((len(rows), 2))
+        for r in numba.prange(len(rows)):
+            i = rows[r]
+            ax = 0.0
+            ay = 0.0
+            for j in range(len(pos)):
+                dx = pos[j, 0] - pos[i, 0]
+                dy = pos[j, 1] - pos[i, 1]
+                distance_sq = dx * dx + dy * dy
+                if distance_sq > 0:
+                    weight = mass[j] / (distance_sq * math.sqrt(distance_sq))
+                    ax += weight * dx
+                    ay += weight * dy
+            acc[r, 0] = g * ax
+            acc[r, 1] = g * ay
+        return acc
+
+    def accelerations(pos, mass, targets=None):
+        rows = np.arange(len(pos)) if targets is None else np.asarray(targets, dtype=np.int64)
+        return accelerations_kernel(np.ascontiguousarray(pos, dtype=np.float64),
+                                    np.ascontiguousarray(mass, dtype=np.float64), rows, G)
+
+    # Compile now, so a broken install falls back at selection instead of mid-run
+    accelerations(np.zeros((2, 2)), np.ones(2))
+    # Collision candidates already come from a linear-time spatial hash
+    return KernelBackend('numba', accelerations, overlapping_pairs)
+
+
+BACKENDS = {
+    'python': KernelBackend('python', python_accelerations, python_overlapping_pairs),
+    'numpy': KernelBackend('numpy', numpy_accelerations, overlapping_pairs),
+}
+BACKEND_NAMES = ('auto', 'numba', 'numpy', 'python')
+
+
+def load_backend(name):
+    """Return the KernelBackend registered as `name`
+
+    "auto" picks Numba when it is installed and NumPy otherwise; asking
+    for Numba without it (or with a Numba that fails to compile) warns
+    and falls back to NumPy.
+    """
+    if name not in BACKEND_NAMES:
+        raise ValueError(f"Unknown kernel backend: {name}; expected one of {', '.join(BACKEND_NAMES)}")
+    if name in ('auto', 'numba') and 'numba' not in BACKENDS:
+        try:
+            BACKENDS['numba'] = _numba_kernels()
+        except Exception as e:
+            if name == 'numba':
+                warnings.warn(f"Numba kernels unavailable ({e}); using the numpy backend")
+            name = 'numpy'
+    if name == 'auto':
+        name = 'numba' if 'numba' in BACKENDS else 'numpy'
+    return BACKENDS[name]
+
+
+_backend = None
+
+
+def get_backend():
+    """Return the configured kernel backend, loading it on first use"""
+    global _backend
+    if _backend is None:
+        _backend = load_backend(KERNEL_BACKEND)
+    return _backend
+
+
+def random_bodies(n_bodies, seed=0):
+    """Bodies spread over a few AU with masses over six orders of magnitude"""
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform(-3e11, 3e11, (n_bodies, 2))
+    mass = 10 ** rng.uniform(21, 27, n_bodies)
+    reach = rng.uniform(1e9, 2e10, n_bodies)
+    return pos, mass, reach
+
+
+def check_agreement(n_bodies=500, seed=0, names=None):
+    """Compare every available backend with the pure-Python reference
+
+    Returns one (backend, max relative acceleration error, same collision
+    pairs, milliseconds) tuple per backend. The acceleration error of a
+    body is relative to the size of its reference acceleration.
+    """
+    pos, mass, reach = random_bodies(n_bodies, seed)
+    pos[1] = pos[0]  # Coincident bodies must exert no force on each other
+    targets = np.arange(0, n_bodies, 3)
+    reference = python_accelerations(pos, mass)
+    reference_pairs = set(zip(*(a.tolist() for a in python_overlapping_pairs(pos, reach))))
+    scale = np.linalg.norm(reference, axis=1)
+
+    results = []
+    for name in names or ('numpy', 'numba'):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            backend = load_backend(name)
+        if backend.name != name:
+            continue  # Not available here
+        start = time.perf_counter()
+        acc = backend.accelerations(pos, mass)
+        elapsed = (time.perf_counter() - start) * 1000
+        error = max(np.max(np.linalg.norm(acc - reference, axis=1) / scale),
+                    np.max(np.linalg.norm(backend.accelerations(pos, mass, targets) - reference[targets], axis=1)
+                           / scale[targets]))
+        pairs = set(zip(*(a.tolist() for a in backend.overlapping_pairs(pos, reach))))
+        results.append((name, float(error), pairs == reference_pairs, elapsed))
+    return results
+
+
+def main(argv=None):
+    """Check that the kernel backends agree with the pure-Python reference"""
+    parser = argparse.ArgumentParser(description="Compare the force and collision kernel backends")
+    parser.add_argument('--bodies', type=int, nargs='+', default=[10, 500, 3000])
+    parser.add_argument('--tolerance', type=float, default=1e-9,
+                        help="Largest relative acceleration error accepted")
+    args = parser.parse_args(argv)
+
+    print(f'Configured backend: {KERNEL_BACKEND} -> {get_backend().name}')
+    failed = False
+    for n_bodies in args.bodies:
+        for name, error, same_pairs, elapsed in check_agreement(n_bodies):
+            ok = error <= args.tolerance and same_pairs
+            failed |= not ok
+            print(f"{n_bodies:>6} bodies  {name:<6} max error {error:.2e}  "
+                  f"pairs {'same' if same_pairs else 'DIFFERENT'}  {elapsed:8.1f} ms  {'ok' if ok else 'FAIL'}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,487 @@
 import math
+import numpy as np
 from core.config_load import config
+from core.event_log import event_log
+from core.profiler import profiler
+from core.trails import OrbitTrails
 
 # Load configurations
 constants = config.load_constants()['physics']
 simulation_constants = config.load_constants()['simulation']
-colors = config.load_colors()
-display_settings = config.load_display_settings()
 
 # Constants from JSON
 G = constants['gravitational_constant']
 ABSORPTION_COEFF = constants['absorption_coefficient']
 TIME_STEP = simulation_constants['time_step_per_frame']
+FORCE_ENGINE = simulation_constants['force_engine']
+INTEGRATOR = simulation_constants['integrator']
 FPS = simulation_constants['target_fps']
 AU = constants['AU']
 SCALE = 200/AU
-FACTOR = FPS/20
-MAX_ORBIT = math.sqrt(1/TIME_STEP) * 60**3 * FACTOR
+EXACT_ENGINES = ('direct', 'parallel')  # Engines summing over every pair
 
-# Display settings
-WINDOW_WIDTH = display_settings['window']['width']
-WINDOW_HEIGHT = display_settings['window']['height']
+class BodySystem:
+    """Struct-of-arrays store holding the state of every body in the simulation"""
+
+    ARRAYS = ('_ids', '_pos', '_vel', '_acc', '_mass', '_radius', '_color',
+              '_exists', '_steps_collision')
+
+    def __init__(self, capacity=16, force_engine=FORCE_ENGINE, integrator=INTEGRATOR, trails=False):
+        from core.integrators import get_integrator
+        self.count = 0
+        self.trails = OrbitTrails(capacity) if trails else None  # Only kept for a display
+        self.bodies = []  # Body views, index-aligned with the arrays
+        self.force_engine = force_engine
+        self.integrator = get_integrator(integrator)
+        self.excluded_pairs = []  # Colliding pairs that exert no force this step
+        self._acc_pos = None  # Positions and masses `acc` was evaluated at, while it is reusable
+        self._acc_mass = None
+        self._new_bodies = None
+        self._next_id = 0
+        self._capacity = 0
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._pos = np.zeros((0, 2))
+        self._vel = np.zeros((0, 2))
+        self._acc = np.zeros((0, 2))
+        self._mass = np.zeros(0)
+        self._radius = np.zeros(0)
+        self._color = np.zeros((0, 3), dtype=np.uint8)
+        self._exists = np.zeros(0, dtype=bool)
+        self._steps_collision = np.zeros(0, dtype=np.int64)
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        """Reallocate the arrays so they can hold at least `capacity` bodies"""
+        if capacity <= self._capacity:
+            return
+        capacity = max(capacity, 2 * self._capacity)
+        for name in self.ARRAYS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        self._capacity = capacity
+        if self.trails is not None:
+            self.trails.grow(capacity)
+
+    # Live views over the occupied part of the arrays
+    @property
+    def ids(self):
+        """Stable per-body identifiers, unique within this system"""
+        return self._ids[:self.count]
+
+    @property
+    def pos(self):
+        return self._pos[:self.count]
+
+    @property
+    def vel(self):
+        return self._vel[:self.count]
+
+    @property
+    def acc(self):
+        return self._acc[:self.count]
+
+    @property
+    def mass(self):
+        return self._mass[:self.count]
+
+    @property
+    def radius(self):
+        return self._radius[:self.count]
+
+    @property
+    def color(self):
+        return self._color[:self.count]
+
+    @property
+    def exists(self):
+        return self._exists[:self.count]
+
+    @property
+    def steps_collision(self):
+        return self._steps_collision[:self.count]
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def new_bodies(self):
+        """Buffer system of bodies created by collisions, merged in by merge_new_bodies()"""
+        if self._new_bodies is None:
+            self._new_bodies = BodySystem(capacity=4, force_engine=self.force_engine, trails=False)
+        return self._new_bodies
+
+    def merge_new_bodies(self):
+        """Move every buffered new body into this system and return their views"""
+        pending = self._new_bodies
+        if pending is None or not len(pending):
+            return []
+        views = self.extend(pending.pos, pending.vel, pending.mass, pending.radius, pending.color)
+        self.steps_collision[-len(views):] = pending.steps_collision
+        pending.clear()
+        return views
+
+    def clear(self):
+        """Remove every body (ids keep counting up)"""
+        self.bodies = []
+        self.count = 0
+        self.excluded_pairs = []
+        if self.trails is not None:
+            self.trails.clear()
+
+    def _append_row(self, x, y, color, mass, radius, x_vel, y_vel):
+        """Write a new body into the arrays and return its index"""
+        self._grow(self.count + 1)
+        i = self.count
+        self._ids[i] = self._next_id
+        self._next_id += 1
+        self._pos[i] = (x, y)
+        self._vel[i] = (x_vel, y_vel)
+        self._acc[i] = 0
+        self._mass[i] = mass
+        self._radius[i] = radius
+        self._color[i] = color
+        self._exists[i] = True
+        self._steps_collision[i] = 0
+        if self.trails is not None:
+            self.trails.reset_row(i)
+        self.count += 1
+        return i
+
+    def add(self, x, y, color, mass, radius, x_vel, y_vel):
+        """Create a body inside this system and return its view"""
+        body = Body(x, y, color, mass, radius, x_vel, y_vel, system=self)
+        event_log.emit('body_created', body.id, -1, x, y, mass, radius)
+        return body
+
+    def extend(self, pos, vel, mass, radius, color):
+        """Append many bodies at once from column arrays and return their views"""
+        n = len(mass)
+        self._grow(self.count + n)
+        rows = slice(self.count, self.count + n)
+        self._ids[rows] = np.arange(self._next_id, self._next_id + n)
+        self._next_id += n
+        self._pos[rows] = pos
+        self._vel[rows] = vel
+        self._acc[rows] = 0
+        self._mass[rows] = mass
+        self._radius[rows] = radius
+        self._color[rows] = color
+        self._exists[rows] = True
+        self._steps_collision[rows] = 0
+        if self.trails is not None:
+            self.trails.counts[rows] = 0
+        views = [Body._view(self, i) for i in range(self.count, self.count + n)]
+        self.count += n
+        self.bodies.extend(views)
+        if event_log.wants('body_created'):
+            for body in views:
+                event_log.emit('body_created', body.id, -1, body.x, body.y, body.mass, body.radius)
+        return views
+
+    def add_body(self, body):
+        """Move a body created elsewhere (e.g. debris) into this system"""
+        if body._system is self:
+            return body
+        source, j = body._system, body._index
+        i = self._append_row(source._pos[j, 0], source._pos[j, 1], source._color[j],
+                             source._mass[j], source._radius[j],
+                             source._vel[j, 0], source._vel[j, 1])
+        self._acc[i] = source._acc[j]
+        self._exists[i] = source._exists[j]
+        self._steps_collision[i] = source._steps_collision[j]
+        body._system, body._index = self, i
+        self.bodies.append(body)
+        return body
+
+    def step(self, time_step, levels=None):
+        """Advance every body by one time step, returning the number of collisions
+
+        With `levels` (one int per body), bodies take power-of-two substeps
+        of time_step / 2**level instead of the configured integrator.
+        """
+        from core.integrators import block_step
+
+        # Collisions are found on the start-of-step snapshot (those pairs exert
+        # no force on each other) and resolved in one batch after integration
+        with profiler.phase('collisions'):
+            self.excluded_pairs = self.find_collisions()
+        if levels is None:
+            self.integrator.step(self, time_step)
+        else:
+            block_step(self, time_step, levels)
+        with profiler.phase('collisions'):
+            handled = self.resolve_collisions(self.excluded_pairs)
+        self.excluded_pairs = []
+        profiler.count('collisions', handled)
+
+        # Update orbit trails
+        if self.trails is not None:
+            with profiler.phase('trails'):
+                self.trails.sample(self.pos)
+
+        return handled
+
+    def accelerations(self, pos, targets=None):
+        """Gravitational accelerations of all bodies (or of `targets`) at positions `pos`
+
+        Uses the configured force engine; pairs in excluded_pairs (bodies
+        colliding this step) exert no force on each other: the pair's
+        force, as the engine computes it, is taken off again.
+        """
+        with profiler.phase('forces'):
+            return self._accelerations(pos, targets)
+
+    def accelerations_valid(self):
+        """True when `acc` still holds the accelerations of the current positions and masses"""
+        return (self._acc_pos is not None and len(self._acc_pos) == self.count
+                and np.array_equal(self._acc_pos, self.pos) and np.array_equal(self._acc_mass, self.mass))
+
+    def remember_accelerations(self):
+        """Mark `acc` as the accelerations of the current positions and masses, with every pair counted"""
+        if self.excluded_pairs:
+            self.forget_accelerations()  # Those leave out the colliding pairs
+        else:
+            self._acc_pos = self.pos.copy()
+            self._acc_mass = self.mass.copy()
+
+    def forget_accelerations(self):
+        self._acc_pos = None
+        self._acc_mass = None
+
+    def start_accelerations(self):
+        """Accelerations at the current positions, reusing `acc` when it still holds them
+
+        A fresh evaluation is kept in `acc` for the next caller, unless
+        colliding pairs are excluded this step.
+        """
+        if not self.excluded_pairs and self.accelerations_valid():
+            return self.acc.copy()
+        acc = self.accelerations(self.pos)
+        self.acc[:] = acc
+        self.remember_accelerations()
+        return acc
+
+    def _accelerations(self, pos, targets):
+        from core.physics import get_force_engine, get_pair_acceleration, direct_accelerations
+        if self.force_engine in EXACT_ENGINES:
+            # Approximate engines count the interactions they actually evaluate
+            profiler.count('interactions', (len(pos) if targets is None else len(targets)) * (len(pos) - 1))
+        if targets is None:
+            acc = get_force_engine(self.force_engine)(pos, self.mass)
+            rows = {i: i for pair in self.excluded_pairs for i in pair}
+        else:
+            if self.force_engine == 'direct':
+                acc = direct_accelerations(pos, self.mass, targets)
+            else:
+                acc = get_force_engine(self.force_engine)(pos, self.mass)[targets]
+            rows = {int(i): row for row, i in enumerate(targets)}
+        pair_acceleration = get_pair_acceleration(self.force_engine)
+        for i, j in self.excluded_pairs:
+            if i in rows:
+                acc[rows[i]] -= pair_acceleration(pos, self.mass, i, j)
+            if j in rows:
+                acc[rows[j]] -= pair_acceleration(pos, self.mass, j, i)
+        return acc
+
+    def find_collisions(self):
+        """Collision events of this step, as (row, row) pairs, on the current snapshot
+
+        Each body takes part in at most one collision per step. Candidate
+        pairs are taken in order of their body ids (lower id first), not of
+        their rows, so the outcome does not depend on where bodies sit in
+        the arrays; a pair sharing a body with an earlier one waits for the
+        next step.
+        """
+        from core.physics import find_collisions
+        candidates = find_collisions(self.pos, self.radius, self.steps_collision)
+        self.steps_collision[:] += 1
+        if not candidates:
+            return []
+
+        first, second = np.array(candidates).T
+        ids = self.ids
+        swap = ids[first] > ids[second]
+        first, second = np.where(swap, second, first), np.where(swap, first, second)
+        order = np.lexsort((ids[second], ids[first]))
+        pairs = []
+        taken = set()
+        for i, j in zip(first[order].tolist(), second[order].tolist()):
+            if i not in taken and j not in taken:
+                taken.update((i, j))
+                pairs.append((i, j))
+        return pairs
+
+    def resolve_collisions(self, pairs):
+        """Resolve a batch of collision events; returns how many were resolved
+
+        The pairs share no body, so each resolution only touches its own
+        two bodies and the batch gives the same result in any order.
+        Debris and mergers go to new_bodies.
+        """
+        from core.physics import handle_collision
+        for i, j in pairs:
+            handle_collision(self.bodies[i], self.bodies[j], 0, self.new_bodies)
+            self.steps_collision[[i, j]] = 0
+        return len(pairs)
+
+    def remove_dead(self):
+        """Drop every body flagged as no longer existing and return their views
+
+        Rows of removed bodies are refilled with the last live rows (swap
+        with last), so the cost grows with the number of removals, not
+        with the number of bodies. Row order is not preserved.
+        """
+        dead = np.flatnonzero(~self.exists)
+        if not len(dead):
+            return []
+        removed = [self.bodies[i] for i in dead.tolist()]
+        if event_log.wants('body_removed'):
+            for body in removed:
+                event_log.emit('body_removed', body.id, -1, body.x, body.y, body.mass, body.radius)
+        for body in removed:
+            body._detach()
+
+        n = self.count - len(dead)
+        holes = dead[dead < n]
+        fillers = n + np.flatnonzero(self._exists[n:self.count])
+        for name in self.ARRAYS:
+            array = getattr(self, name)
+            array[holes] = array[fillers]
+        if self.trails is not None:
+            self.trails.move_rows(fillers, holes)
+        for hole, filler in zip(holes.tolist(), fillers.tolist()):
+            body = self.bodies[filler]
+            body._index = hole
+            self.bodies[hole] = body
+        del self.bodies[n:]
+        self.count = n
+        return removed
+
+    def restore(self, ids, pos, vel, mass, radius, color, steps_collision, next_id=None):
+        """Replace the whole state, keeping the Body views of ids that survive"""
+        views = dict(zip(self.ids.tolist(), self.bodies))
+        if self.trails is not None:
+            self.trails.remap(self.ids.copy(), np.asarray(ids, dtype=np.int64))
+        n = len(ids)
+        self._grow(n)
+        self.count = n
+        self.ids[:] = ids
+        self.pos[:] = pos
+        self.vel[:] = vel
+        self.acc[:] = 0
+        self.forget_accelerations()
+        self.mass[:] = mass
+        self.radius[:] = radius
+        self.color[:] = color
+        self.exists[:] = True
+        self.steps_collision[:] = steps_collision
+        if next_id is None:
+            next_id = max(self._next_id, int(self.ids.max(initial=-1)) + 1)
+        self._next_id = next_id
+        self.excluded_pairs = []
+
+        self.bodies = []
+        for i, body_id in enumerate(self.ids.tolist()):
+            body = views.get(body_id)
+            if body is None:
+                body = Body._view(self, i)
+            body._index = i
+            self.bodies.append(body)
+
+    def total_mass(self):
+        return float(self.mass.sum())
+
+
+def _column(array, component):
+    """Build a read/write property for one component of a per-body array"""
+    def getter(self):
+        return float(getattr(self._system, array)[self._index, component])
+
+    def setter(self, value):
+        getattr(self._system, array)[self._index, component] = value
+
+    return property(getter, setter)
+
+
+def _scalar(array, cast):
+    """Build a read/write property for a per-body scalar array"""
+    def getter(self):
+        return cast(getattr(self._system, array)[self._index])
+
+    def setter(self, value):
+        getattr(self._system, array)[self._index] = value
+
+    return property(getter, setter)
 
-# Colors as tuples
-BLACK = tuple(colors['black'])
 
 class Body:
-    """Represents a celestial body in the gravitational simulation"""
-    
-    def __init__(self, x, y, color, mass, radius, x_vel, y_vel):
-        self.exists = True
-        self.x = x
-        self.y = y
-        self.color = color
-        self.mass = mass
-        self.radius = radius
-        self.orbit = []
-        self.x_vel = x_vel  # m/s
-        self.y_vel = y_vel  # m/s
-        self.ax = 0  # m/s²
-        self.ay = 0  # m/s²
-        self.steps_collision = 0
-        
-        # Orbit trail management
-        self.orbit_update_counter = 0
-        self.orbit_update_frequency = 10  # Update orbit every N frames
-        
-        # Debug: Print initial position
-        print(f"Body created at ({x}, {y}) with mass {mass}")
+    """Represents a celestial body in the gravitational simulation
+
+    The state lives in a BodySystem; a Body is a lightweight view onto one
+    row of its arrays. Bodies created without a system get a private one
+    and can later be moved into a shared system with BodySystem.add_body.
+    """
+
+    x = _column('_pos', 0)
+    y = _column('_pos', 1)
+    x_vel = _column('_vel', 0)  # m/s
+    y_vel = _column('_vel', 1)  # m/s
+    ax = _column('_acc', 0)  # m/s²
+    ay = _column('_acc', 1)  # m/s²
+    mass = _scalar('_mass', float)
+    radius = _scalar('_radius', float)
+    exists = _scalar('_exists', bool)
+    steps_collision = _scalar('_steps_collision', int)
+
+    def __init__(self, x, y, color, mass, radius, x_vel, y_vel, system=None):
+        if system is None:
+            system = BodySystem(capacity=1, trails=False)
+        self._system = system
+        self._index = system._append_row(x, y, color, mass, radius, x_vel, y_vel)
+        system.bodies.append(self)
+
+    @classmethod
+    def _view(cls, system, index):
+        """Wrap an existing row of `system` without printing or appending"""
+        body = cls.__new__(cls)
+        body._system = system
+        body._index = index
+        return body
+
+    @property
+    def id(self):
+        return int(self._system._ids[self._index])
+
+    @property
+    def orbit(self):
+        """Orbit trail in pixels from the screen center, oldest first, as a (k, 2) array"""
+        trails = getattr(self._system, 'trails', None)
+        if trails is None:
+            return np.zeros((0, 2), dtype=np.float32)
+        return trails.trail(self._index)
+
+    @property
+    def color(self):
+        return tuple(int(c) for c in self._system._color[self._index])
+
+    @color.setter
+    def color(self, value):
+        self._system._color[self._index] = value
+
+    def _detach(self):
+        """Move this body's last known state into a private system"""
+        BodySystem(capacity=1, trails=False).add_body(self)
 
     def update_position(self, bodies, time_step):
-        """Update position using the fixed time step"""
+        """Update position using the fixed time step
+
+        Per-pair reference implementation; BodySystem.step computes the same
+        update for all bodies at once.
+        """
         from core.physics import calculate_attraction
-        
-        # Store old position for debugging
-        old_x, old_y = self.x, self.y
-        
+
         # Calculate total gravitational forces
         total_fx = total_fy = 0
         for body in bodies:
@@ -77,80 +504,18 @@ class Body:
         self.x += self.x_vel * time_step
         self.y += self.y_vel * time_step
 
-        # Debug: Print position changes every 60 frames
-        if hasattr(self, 'debug_counter'):
-            self.debug_counter += 1
-        else:
-            self.debug_counter = 0
-            
-        if self.debug_counter % 60 == 0:  # Every second at 60fps
-            print(f"Body: pos=({self.x:.1f}, {self.y:.1f}), vel=({self.x_vel:.1f}, {self.y_vel:.1f}), acc=({self.ax:.6f}, {self.ay:.6f})")
-
-        # Update orbit trail
-        self.orbit.append((self.x*SCALE, self.y*SCALE))
-        
-        # Limit orbit trail length
-        if len(self.orbit) > MAX_ORBIT:
-            self.orbit.pop(0)
-
     def get_speed(self):
         """Get current speed in m/s"""
         return math.sqrt(self.x_vel**2 + self.y_vel**2)
 
-def delete_body(body, body_list):
-    """Remove a body from the simulation"""
-    if body in body_list:
-        body_list.remove(body)
+def create_body_system(scenario=None, trails=False):
+    """Create the initial body system from a scenario (JSON or compiled .npz)"""
+    from core.scenario import load_scenario
+    columns = load_scenario(scenario)
+    system = BodySystem(capacity=len(columns['mass']), trails=trails)
+    system.extend(columns['pos'], columns['vel'], columns['mass'], columns['radius'], columns['color'])
+    return system
 
 def create_bodies_list():
     """Create initial bodies from JSON configuration"""
-    # Load configurations
-    bodies_config = config.load_bodies()
-    colors = config.load_colors()
-    constants = config.load_constants()['physics']
-    
-    # Constants
-    AU = constants['AU']
-    SCALE = 200 / AU
-    SUN_MASS = constants['sun_mass']
-    
-    bodies = []
-    
-    for body_config in bodies_config['initial_bodies']:
-        # Get color tuple
-        color_name = body_config['color']
-        color = tuple(colors[color_name])
-        
-        # Calculate position
-        if 'x_au' in body_config['position'] and 'y_au' in body_config['position']:
-            # Position specified in AU
-            x = body_config['position']['x_au'] / SCALE
-            y = body_config['position']['y_au'] / SCALE
-        else:
-            # Position specified in meters
-            x = body_config['position']['x']
-            y = body_config['position']['y']
-        
-        # Calculate mass
-        mass_unit = body_config['mass_unit']
-        mass_multiplier = body_config['mass_multiplier']
-        
-        if mass_unit == 'sun_mass':
-            mass = mass_multiplier * SUN_MASS
-        elif mass_unit == 'kg':
-            mass = mass_multiplier
-        else:
-            raise ValueError(f"Unknown mass unit: {mass_unit}")
-        
-        # Get other properties
-        radius = body_config['radius']
-        x_vel = body_config['velocity']['x']
-        y_vel = body_config['velocity']['y']
-        
-        # Create body
-        body = Body(x, y, color, mass, radius, x_vel, y_vel)
-        bodies.append(body)
-        
-        print(f"Created body {color}: mass={mass:.2e} kg, pos=({x/AU:.4f}, {y/AU:.4f}) AU")
-    
-    return bodies
\ No newline at end of file
+    return create_body_system().bodies
\ No newline at end of file
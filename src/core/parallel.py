@@ -0,0 +1,119 @@
+import atexit
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+import numpy as np
+from core.config_load import config
+from core.kernels import numpy_accelerations
+
+# Load constants
+simulation_constants = config.load_constants()['simulation']
+
+WORKERS = simulation_constants['parallel_workers']
+BLOCK = 256  # Target rows per task; fixed so results don't depend on worker count
+
+# Arrays a worker process has attached to, set by _attach
+_shared = {}
+
+
+def _attach(names, capacity):
+    """Pool initializer: map the shared arrays into this worker process"""
+    _shared.clear()
+    for key, (name, shape) in names.items():
+        block = shared_memory.SharedMemory(name=name)
+        _shared[key] = (block, np.ndarray((capacity,) + shape, dtype=np.float64, buffer=block.buf))
+
+
+def _accelerations_task(task):
+    """Compute the accelerations of rows [start, stop) into the shared output
+
+    Uses the tiled NumPy kernel, so a task's temporaries stay at
+    BLOCK x kernels.TILE pairs whatever the number of bodies.
+    """
+    n, start, stop = task
+    pos = _shared['pos'][1][:n]
+    mass = _shared['mass'][1][:n]
+    acc = _shared['acc'][1]
+    acc[start:stop] = numpy_accelerations(pos, mass, np.arange(start, stop))
+
+
+class ParallelForceBackend:
+    """Direct-sum forces split across a process pool over shared-memory arrays
+
+    Positions and masses are copied once per step into shared memory;
+    workers attach to it at start-up and write their rows of the
+    acceleration array in place, so nothing is pickled per step except
+    (n, start, stop) tuples. Work is cut into fixed blocks of rows, so
+    the result is the same for any number of workers.
+    """
+
+    FIELDS = {'pos': (2,), 'mass': (), 'acc': (2,)}
+
+    def __init__(self, workers=WORKERS, capacity=1024):
+        self.workers = workers or os.cpu_count()
+        self.capacity = 0
+        self.pool = None
+        self._blocks = {}
+        self._arrays = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        """(Re)create the shared arrays and the pool for `capacity` bodies"""
+        self.close()
+        self.capacity = capacity
+        names = {}
+        for key, shape in self.FIELDS.items():
+            size = capacity * int(np.prod(shape, dtype=np.int64)) * 8
+            block = shared_memory.SharedMemory(create=True, size=size)
+            self._blocks[key] = block
+            self._arrays[key] = np.ndarray((capacity,) + shape, dtype=np.float64, buffer=block.buf)
+            names[key] = (block.name, shape)
+        self.pool = multiprocessing.Pool(self.workers, initializer=_attach, initargs=(names, capacity))
+
+    def _load(self, **arrays):
+        """Copy the step's inputs into shared memory, growing it if needed"""
+        n = len(next(iter(arrays.values())))
+        if n > self.capacity:
+            self._allocate(max(n, 2 * self.capacity))
+        for key, values in arrays.items():
+            self._arrays[key][:n] = values
+        return n
+
+    @staticmethod
+    def _tasks(n):
+        return [(n, start, min(start + BLOCK, n)) for start in range(0, n, BLOCK)]
+
+    def accelerations(self, pos, mass):
+        """Exact gravitational accelerations, identical for any worker count"""
+        n = self._load(pos=pos, mass=mass)
+        self.pool.map(_accelerations_task, self._tasks(n))
+        return self._arrays['acc'][:n].copy()
+
+    def close(self):
+        """Stop the pool and release the shared memory"""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        self._arrays.clear()
+        for block in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._blocks.clear()
+
+
+_backend = None
+
+
+def get_backend():
+    """Return the process-wide parallel backend, starting it on first use"""
+    global _backend
+    if _backend is None:
+        _backend = ParallelForceBackend()
+        atexit.register(_backend.close)
+    return _backend
+
+
+def parallel_accelerations(pos, mass):
+    """Force engine entry point for the parallel backend"""
+    return get_backend().accelerations(pos, mass)
@@ -0,0 +1,152 @@
+import numpy as np
+from core.config_load import config
+from core.profiler import profiler
+from core.spatial_hash import pairs_within
+
+# Load constants
+constants = config.load_constants()['physics']
+simulation_constants = config.load_constants()['simulation']
+
+G = constants['gravitational_constant']
+GRID_SIZE = simulation_constants['pm_grid_size']
+PADDING = simulation_constants['pm_padding']
+SHORT_RANGE = simulation_constants['pm_short_range']
+SPLIT_CELLS = 1.5  # Scale r_s of the Gaussian long/short-range force split, in cells
+CUTOFF_CELLS = 6 * SPLIT_CELLS  # Pairs closer than this get the short-range force (P3M)
+
+# FFT of the unit-spacing Green's function, keyed on grid size
+_kernel_cache = {}
+
+
+def _erfc(x):
+    """Complementary error function for x >= 0 (Abramowitz & Stegun 7.1.26, error below 1.5e-7)"""
+    t = 1 / (1 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return poly * np.exp(-x * x)
+
+
+def long_range_factor(r, split):
+    """Fraction of the Newtonian pair force carried by the mesh at distance r
+
+    Splitting 1/r into erf(r / 2r_s) / r (long range, on the mesh) and
+    erfc(r / 2r_s) / r (short range, summed over close pairs) gives the
+    mesh the force factor 1 - erfc(x) - 2x exp(-x²) / sqrt(pi), x = r / 2r_s.
+    """
+    x = r / (2 * split)
+    return 1 - _erfc(x) - 2 * x * np.exp(-x * x) / np.sqrt(np.pi)
+
+
+def _green_kernel(grid_size):
+    """FFT of the long-range potential -erf(r / 2r_s) / r on the zero-padded grid, for cell size 1
+
+    The grid is doubled in each direction (Hockney's method) so the
+    periodic FFT convolution behaves like isolated boundaries.
+    """
+    if grid_size not in _kernel_cache:
+        k = np.arange(2 * grid_size)
+        k = np.minimum(k, 2 * grid_size - k).astype(float)
+        r = np.sqrt(k[:, np.newaxis]**2 + k[np.newaxis, :]**2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            green = -(1 - _erfc(r / (2 * SPLIT_CELLS))) / r
+        green[0, 0] = -1 / (SPLIT_CELLS * np.sqrt(np.pi))  # The limit at r = 0
+        _kernel_cache[grid_size] = np.fft.rfft2(green)
+    return _kernel_cache[grid_size]
+
+
+def mesh_cell(pos, grid_size=GRID_SIZE, padding=PADDING):
+    """Origin and cell size of the mesh laid over `pos`"""
+    low, high = pos.min(axis=0), pos.max(axis=0)
+    extent = max((high - low).max(), 1.0) * (1 + 2 * padding)
+    cell = extent / (grid_size - 2)
+    origin = (low + high) / 2 - cell * grid_size / 2
+    return origin, cell
+
+
+def mesh_pair_acceleration(pos, mass, i, j, grid_size=GRID_SIZE, padding=PADDING, short_range=SHORT_RANGE):
+    """Acceleration of body i caused by body j alone, as mesh_accelerations accounts for it
+
+    The long-range part of the pair force, plus the short-range part
+    when `short_range` is on and the pair is within the cutoff. Taking
+    this off the mesh result removes the pair (colliding bodies).
+    """
+    delta = pos[j] - pos[i]
+    distance = np.sqrt(delta @ delta)
+    if distance == 0:
+        return np.zeros(2)
+    _, cell = mesh_cell(pos, grid_size, padding)
+    if short_range and distance < CUTOFF_CELLS * cell:
+        factor = 1.0
+    else:
+        factor = long_range_factor(distance, SPLIT_CELLS * cell)
+    return G * mass[j] * factor * delta / distance**3
+
+
+def _cic_weights(pos, origin, cell, grid_size):
+    """Lower node index and fractional offset of every body on the mesh"""
+    u = (pos - origin) / cell - 0.5
+    lower = np.clip(np.floor(u).astype(np.int64), 0, grid_size - 2)
+    frac = np.clip(u - lower, 0.0, 1.0)
+    return lower, frac
+
+
+def _cic_stencil(lower, frac, grid_size):
+    """Flat node indices and weights of the four CIC neighbours of every body"""
+    ix, iy = lower[:, 0], lower[:, 1]
+    fx, fy = frac[:, 0], frac[:, 1]
+    index = np.stack([ix * grid_size + iy, (ix + 1) * grid_size + iy,
+                      ix * grid_size + iy + 1, (ix + 1) * grid_size + iy + 1])
+    weight = np.stack([(1 - fx) * (1 - fy), fx * (1 - fy), (1 - fx) * fy, fx * fy])
+    return index, weight
+
+
+def mesh_accelerations(pos, mass, grid_size=GRID_SIZE, padding=PADDING, short_range=SHORT_RANGE):
+    """Approximate gravitational accelerations with a particle-mesh (PM/P3M) solver
+
+    Mass is deposited with cloud-in-cell onto a grid covering the bodies
+    plus `padding` (a fraction of the extent) on each side, the potential
+    is obtained by FFT convolution and the field is interpolated back with
+    the same CIC weights. The mesh carries the long-range part of a
+    Gaussian force split at r_s = SPLIT_CELLS cells, so the force is
+    smoothed below a few cells. With `short_range`, pairs within the
+    cutoff also get the short-range part, which brings them to the exact
+    force (P3M); beyond the cutoff that part is below 0.05%.
+    """
+    n = len(pos)
+    if n < 2:
+        return np.zeros_like(pos)
+
+    origin, cell = mesh_cell(pos, grid_size, padding)
+
+    # Cloud-in-cell mass deposit
+    lower, frac = _cic_weights(pos, origin, cell, grid_size)
+    index, weight = _cic_stencil(lower, frac, grid_size)
+    grid_mass = np.bincount(index.ravel(), weights=(weight * mass).ravel(),
+                            minlength=grid_size * grid_size)
+
+    # Potential by zero-padded FFT convolution with the Green's function
+    padded = np.zeros((2 * grid_size, 2 * grid_size))
+    padded[:grid_size, :grid_size] = grid_mass.reshape(grid_size, grid_size)
+    potential = np.fft.irfft2(np.fft.rfft2(padded) * _green_kernel(grid_size),
+                              s=padded.shape)[:grid_size, :grid_size]
+    potential *= G / cell
+
+    # Field on the mesh, interpolated back to the bodies
+    field_x, field_y = np.gradient(-potential, cell)
+    acc = np.stack([(field_x.ravel()[index] * weight).sum(axis=0),
+                    (field_y.ravel()[index] * weight).sum(axis=0)], axis=1)
+
+    if short_range:
+        # P3M: add the short-range part of the split to close pairs
+        first, second = pairs_within(pos, CUTOFF_CELLS * cell)
+        profiler.count('interactions', 2 * len(first))
+        delta = pos[second] - pos[first]
+        distance = np.sqrt(np.einsum('ij,ij->i', delta, delta))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correction = G * (1 - long_range_factor(distance, SPLIT_CELLS * cell)) / distance**3
+        correction[~np.isfinite(correction)] = 0.0
+        for k in range(2):
+            pull = correction * delta[:, k]
+            acc[:, k] += np.bincount(first, weights=pull * mass[second], minlength=n)
+            acc[:, k] -= np.bincount(second, weights=pull * mass[first], minlength=n)
+
+    return acc
@@ -1,5 +1,8 @@
 import math
+import numpy as np
 from core.config_load import config
+from core.event_log import event_log
+from core.kernels import get_backend
 
 # Load constants
 constants = config.load_constants()['physics']
@@ -9,32 +12,30 @@ G = constants['gravitational_constant']
 ABSORPTION_COEFF = constants['absorption_coefficient']
 BLACK_HOLE_MASS = constants['black_hole_mass']
 MASS_RATIO_THRESHOLD = constants['mass_ratio_threshold']
+COLLISION_COOLDOWN = constants['collision_cooldown_steps']
 AU = constants['AU']
 SCALE = 200/AU
 
 BLACK = tuple(colors['black'])
 
-# Global list for new bodies
-new_bodies_queue = []
-
-def create_body(x, y, color, mass, radius, x_vel, y_vel, body_list):
-    """Factory function to create a new celestial body"""
+def create_body(x, y, color, mass, radius, x_vel, y_vel, buffer):
+    """Factory function to create a new celestial body in `buffer` (a BodySystem)"""
     from core.objects import Body
-    new_body = Body(x, y, color, mass, radius, x_vel, y_vel)
-    body_list.append(new_body)
-    return new_body
+    return Body(x, y, color, mass, radius, x_vel, y_vel, system=buffer)
 
 def consume_body(consumer, consumed):
     """Handle one body consuming another"""
-    if consumed.mass < constants['collision_threshold']:
-        print("Collision led to total comsunption")
-        consumer.mass += consumed.mass
-    else:
-        print(f"Collision in pos {(consumer.x, consumer.y)} not total")    
-        consumer.mass += ABSORPTION_COEFF * consumed.mass
+    # Total consumption below the collision threshold, partial above it
+    absorbed = 1.0 if consumed.mass < constants['collision_threshold'] else ABSORPTION_COEFF
+    consumer.mass += absorbed * consumed.mass
     consumed.exists = False
+    event_log.emit('absorption', consumer.id, consumed.id, consumer.x, consumer.y,
+                   absorbed * consumed.mass, absorbed)
 
-def handle_collision(body1, body2, theta):
+def handle_collision(body1, body2, theta, new_bodies=None):
+    """Resolve one collision; debris and mergers go to `new_bodies` (default: body1's system buffer)"""
+    if new_bodies is None:
+        new_bodies = body1._system.new_bodies
     # Calculate relative velocities
     if (body1.x_vel < 0 and body2.x_vel < 0) or (body1.x_vel > 0 and body2.x_vel > 0):
         vrel_x = body1.x_vel + body2.x_vel
@@ -64,8 +65,8 @@ def handle_collision(body1, body2, theta):
             merged_mass = body1.mass + body2.mass
             merged_radius = (body1.radius + body2.radius) / 2
             create_body(merged_x, merged_y, BLACK, merged_mass, 
-                       merged_radius, 0, 0, new_bodies_queue)
-            print(f"Merged black holes - pos:{(merged_x, merged_y)}")
+                       merged_radius, 0, 0, new_bodies)
+            event_log.emit('merger', body1.id, body2.id, merged_x, merged_y, merged_mass)
 
         elif body1.mass > MASS_RATIO_THRESHOLD * body2.mass:
             # body1 consumes body2
@@ -76,7 +77,7 @@ def handle_collision(body1, body2, theta):
                 create_body(body2.x, body2.y, body2.color, 
                            body2.mass * (1 - ABSORPTION_COEFF),
                            body2.radius / (1 + ABSORPTION_COEFF),
-                           escape_velocity, escape_velocity, new_bodies_queue)
+                           escape_velocity, escape_velocity, new_bodies)
             else: 
                 consume_body(body1, body2)
                 
@@ -88,7 +89,7 @@ def handle_collision(body1, body2, theta):
                 create_body(body1.x, body1.y, body1.color,
                            body1.mass * (1 - ABSORPTION_COEFF),
                            body1.radius / (1 + ABSORPTION_COEFF),
-                           escape_velocity, escape_velocity, new_bodies_queue)
+                           escape_velocity, escape_velocity, new_bodies)
             else: 
                 consume_body(body2, body1)
                 
@@ -100,8 +101,11 @@ def handle_collision(body1, body2, theta):
 
         body1.y_vel = (body1.mass * yvel1 + body2.mass * yvel2 - body2.mass * vrel_y * e) / (body1.mass + body2.mass)
         body2.y_vel = vrel_y * e - abs(body1.y_vel)
-        print(f"Elastic collision.\n Velocities before: {(xvel1, yvel1)} and {(xvel2, yvel2)}; \n Velocities after: {(body1.x_vel, body1.y_vel)} and {(body2.x_vel, body2.y_vel)}")
-        
+
+        # Relative speed before the collision
+        event_log.emit('collision', body1.id, body2.id, body1.x, body1.y, body1.mass + body2.mass,
+                       math.hypot(xvel1 - xvel2, yvel1 - yvel2))
+
 
 def calculate_attraction(body1, body2):
     """Calculate gravitational attraction between two bodies"""
@@ -112,7 +116,6 @@ def calculate_attraction(body1, body2):
     distance = math.sqrt(distance_x**2 + distance_y**2)
     
     if distance <= critical_distance and (body1.steps_collision>10 or body2.steps_collision>10):
-        print("Collision detected")
         # Handle collision/merging
         handle_collision(body1, body2, theta)
         body1.steps_collision=0
@@ -138,4 +141,87 @@ def calculate_attraction(body1, body2):
         body1.steps_collision+=1
         body2.steps_collision+=1
 
-        return F_x, F_y
\ No newline at end of file
+        return F_x, F_y
+
+def direct_accelerations(pos, mass, targets=None):
+    """Exact O(N²) gravitational accelerations for an (N, 2) position array
+
+    Every acceleration is computed from the same snapshot. This is the
+    reference the approximate force engines are measured against. With
+    `targets` (an index array), only those bodies' accelerations are
+    computed, still pulled by every body. The sum runs on the configured
+    kernel backend (see core.kernels).
+    """
+    return get_backend().accelerations(pos, mass, targets)
+
+def pair_acceleration(pos, mass, i, j):
+    """Acceleration of body i caused by body j alone"""
+    delta = pos[j] - pos[i]
+    distance = math.sqrt(delta[0]**2 + delta[1]**2)
+    if distance == 0:
+        return np.zeros(2)
+    return G * mass[j] * delta / distance**3
+
+def get_pair_acceleration(name):
+    """Return `pair(pos, mass, i, j)`: the acceleration of body i caused by body j under engine `name`
+
+    The particle mesh only carries a smoothed long-range force for close
+    pairs; every other engine sums them exactly.
+    """
+    if name == 'particle_mesh':
+        from core.particle_mesh import mesh_pair_acceleration
+        return mesh_pair_acceleration
+    return pair_acceleration
+
+def find_collisions(pos, radius, steps_collision):
+    """Return the colliding index pairs (i < j) of one snapshot, sorted
+
+    Bodies collide when their radii overlap and at least one of them is
+    past the collision cooldown. Candidates come from a spatial hash
+    keyed on body radius (on every backend but the pure-Python
+    reference), so this is roughly O(N) and independent of the force
+    engine.
+    """
+    first, second = get_backend().overlapping_pairs(pos, radius / SCALE)
+    ready = steps_collision > COLLISION_COOLDOWN
+    keep = ready[first] | ready[second]
+    first, second = first[keep], second[keep]
+    order = np.lexsort((second, first))
+    return list(zip(first[order].tolist(), second[order].tolist()))
+
+def get_force_engine(name):
+    """Return the acceleration function `engine(pos, mass)` registered as `name`"""
+    if name == 'direct':
+        return direct_accelerations
+    if name == 'barnes_hut':
+        from core.barnes_hut import barnes_hut_accelerations
+        return barnes_hut_accelerations
+    if name == 'particle_mesh':
+        from core.particle_mesh import mesh_accelerations
+        return mesh_accelerations
+    if name == 'parallel':
+        from core.parallel import parallel_accelerations
+        return parallel_accelerations
+    raise ValueError(f"Unknown force engine: {name}")
+
+def kinetic_energy(vel, mass):
+    """Total kinetic energy of the bodies, in joules"""
+    return 0.5 * float(np.sum(mass * np.einsum('ij,ij->i', vel, vel)))
+
+def potential_energy(pos, mass, block=1024):
+    """Total gravitational potential energy of the bodies, in joules (O(N²), blocked)"""
+    energy = 0.0
+    for start in range(0, len(pos), block):
+        stop = min(start + block, len(pos))
+        delta = pos[np.newaxis, :, :] - pos[start:stop, np.newaxis, :]
+        distance = np.sqrt(np.einsum('ijk,ijk->ij', delta, delta))
+        # Only count each pair once (j > i)
+        upper = np.arange(len(pos))[np.newaxis, :] > np.arange(start, stop)[:, np.newaxis]
+        with np.errstate(divide='ignore'):
+            pair = np.where(upper & (distance > 0), mass[start:stop, np.newaxis] * mass[np.newaxis, :] / distance, 0.0)
+        energy -= G * float(pair.sum())
+    return energy
+
+def total_momentum(vel, mass):
+    """Total linear momentum vector of the bodies, in kg·m/s"""
+    return (mass[:, np.newaxis] * vel).sum(axis=0)
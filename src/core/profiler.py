@@ -0,0 +1,193 @@
+import cProfile
+import csv
+import json
+import pstats
+import threading
+import time
+from pathlib import Path
+
+PHASES = ('events', 'forces', 'collisions', 'merge', 'history', 'trails', 'draw_bodies', 'hud')
+COUNTERS = ('steps', 'interactions', 'collisions')
+SMOOTHING = 0.1  # Weight of the newest frame in the averages shown on the HUD
+CPROFILE_FILE = 'simulation.prof'
+
+
+class _Phase:
+    """Context manager adding the time spent inside it, minus nested phases, to one phase"""
+
+    __slots__ = ('profiler', 'name')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        # [start, time spent in phases nested inside this one]
+        self.profiler._open_phases().append([time.perf_counter(), 0.0])
+
+    def __exit__(self, *exc):
+        stack = self.profiler._open_phases()
+        start, nested = stack.pop()
+        elapsed = time.perf_counter() - start
+        self.profiler._times[self.name] += elapsed - nested
+        if stack:
+            stack[-1][1] += elapsed
+
+
+class _Disabled:
+    """Shared do-nothing context manager returned while profiling is off"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_DISABLED = _Disabled()
+
+
+class Profiler:
+    """Per-frame wall-clock time of each main loop phase, plus event counters
+
+    Code marks a phase with `with profiler.phase('forces'):` and counts
+    with `profiler.count('collisions', n)`. While disabled, phase() hands
+    back a shared no-op context manager and count() returns at once, so
+    the instrumentation can stay in the hot loop. end_frame() closes the
+    frame: it updates the smoothed averages shown on the HUD and streams
+    the record to the export file, if any.
+
+    Phases record self time: time spent in a phase nested inside another
+    (forces inside collisions, the steps of a rewind inside history) only
+    counts for the inner one, so the phases add up to total_ms. Nesting
+    is tracked per thread.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.frame = 0
+        self.last = {}  # Record of the last finished frame
+        self.average = {}  # Exponential moving average of every field, for display
+        self._phases = {name: _Phase(self, name) for name in PHASES}
+        self._times = dict.fromkeys(PHASES, 0.0)
+        self._local = threading.local()
+        self._counters = dict.fromkeys(COUNTERS, 0)
+        self._file = None
+        self._csv = None
+        self._json_records = 0
+        self._cprofile = None
+        self._cprofile_frames = 0
+        self._cprofile_path = None
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self._reset()
+
+    def phase(self, name):
+        if not self.enabled:
+            return _DISABLED
+        return self._phases[name]
+
+    def _open_phases(self):
+        """This thread's stack of phases entered and not yet left"""
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self._counters[name] += n
+
+    def _reset(self):
+        for name in self._times:
+            self._times[name] = 0.0
+        for name in self._counters:
+            self._counters[name] = 0
+
+    def end_frame(self):
+        """Close the current frame's record"""
+        if self._cprofile is not None:
+            self._cprofile_frames -= 1
+            if self._cprofile_frames <= 0:
+                self._finish_cprofile()
+        if not self.enabled:
+            return
+        self.frame += 1
+        record = {'frame': self.frame}
+        for name, seconds in self._times.items():
+            record[f'{name}_ms'] = seconds * 1000
+        record['total_ms'] = sum(self._times.values()) * 1000
+        record.update(self._counters)
+        self.last = record
+        for key, value in record.items():
+            previous = self.average.get(key, value)
+            self.average[key] = previous + (value - previous) * SMOOTHING
+        if self._file is not None:
+            self._write(record)
+        self._reset()
+
+    # Export
+
+    def open(self, path):
+        """Stream every frame record to `path`: CSV, or a JSON array if it ends in .json"""
+        self.close()
+        path = Path(path)
+        self._file = open(path, 'w', newline='')
+        if path.suffix.lower() == '.json':
+            self._file.write('[')
+            self._json_records = 0
+        else:
+            fields = ['frame'] + [f'{name}_ms' for name in PHASES] + ['total_ms'] + list(COUNTERS)
+            self._csv = csv.DictWriter(self._file, fieldnames=fields)
+            self._csv.writeheader()
+        self.enable()
+
+    def _write(self, record):
+        if self._csv is not None:
+            self._csv.writerow(record)
+        else:
+            self._file.write(',\n' if self._json_records else '\n')
+            json.dump(record, self._file)
+            self._json_records += 1
+
+    def close(self):
+        """Finish the export file and any running cProfile session"""
+        if self._cprofile is not None:
+            self._finish_cprofile()
+        if self._file is None:
+            return
+        if self._csv is None:
+            self._file.write('\n]\n')
+        self._file.close()
+        self._file = None
+        self._csv = None
+
+    # cProfile
+
+    def run_cprofile(self, frames, path=CPROFILE_FILE):
+        """Run cProfile over the next `frames` calls to end_frame, then save the stats to `path`"""
+        self._cprofile = cProfile.Profile()
+        self._cprofile_frames = frames
+        self._cprofile_path = path
+        self._cprofile.enable()
+
+    def _finish_cprofile(self):
+        self._cprofile.disable()
+        self._cprofile.dump_stats(self._cprofile_path)
+        print(f'cProfile stats written to {self._cprofile_path}')
+        pstats.Stats(self._cprofile).sort_stats('cumulative').print_stats(15)
+        self._cprofile = None
+
+
+# Create a global instance for easy access
+profiler = Profiler()
@@ -0,0 +1,102 @@
+import argparse
+import time
+from core.checkpoint import Timeline, find_checkpoint, load_checkpoint
+from core.event_log import EVENT_FILE, event_log
+from core.profiler import CPROFILE_FILE, profiler
+from core.simulation import Simulation
+from core.stream import HOST, PORT, StreamServer
+from core.trajectory import TrajectoryWriter
+
+def print_final_state(simulation, limit=50):
+    """Print the simulation time and the state of (up to `limit`) bodies"""
+    from core.objects import AU
+    system = simulation.system
+    print(f'\nSimulation ended after {simulation.time_manager.get_formatted_time()} '
+          f'({simulation.time_manager.frame_count} steps, {simulation.collision_count} collisions)')
+    print(f'{len(system)} bodies, total mass {system.total_mass():.4e} kg')
+    for i, body in enumerate(system.bodies[:limit], 1):
+        print(f'Body {i}: mass={body.mass:.4e} kg, pos=({body.x/AU:.4f}, {body.y/AU:.4f}) AU, '
+              f'vel=({body.x_vel:.1f}, {body.y_vel:.1f}) m/s')
+    if len(system) > limit:
+        print(f'... {len(system) - limit} more bodies')
+
+def main(argv=None):
+    """Run the simulation headless, as fast as the CPU allows"""
+    parser = argparse.ArgumentParser(description="Run the gravitational simulation without a display")
+    parser.add_argument('--steps', type=int, required=True, help="Number of time steps to simulate")
+    parser.add_argument('--scenario', default=None,
+                        help="Bodies file (JSON or compiled .npz), either a name inside config/ or a path (default: bodies.json)")
+    parser.add_argument('--record', metavar='FILE', default=None,
+                        help="Record every step to a trajectory file (play it with main.py --replay)")
+    parser.add_argument('--checkpoint-dir', metavar='DIR', default=None,
+                        help="Write a checkpoint every checkpoint_interval steps into DIR")
+    parser.add_argument('--resume', metavar='PATH', default=None,
+                        help="Continue from a checkpoint file, or from the latest one in a directory")
+    parser.add_argument('--event-log', metavar='FILE', default=EVENT_FILE,
+                        help="Write collision, merger and body events to a binary event file")
+    parser.add_argument('--profile-out', metavar='FILE', default=None,
+                        help="Stream per-step phase timings and counters to a CSV file (JSON if FILE ends in .json)")
+    parser.add_argument('--cprofile', metavar='STEPS', type=int, default=None,
+                        help=f"Run cProfile over the first STEPS steps and save the stats to {CPROFILE_FILE}")
+    parser.add_argument('--serve', metavar='PORT', type=int, nargs='?', const=PORT,
+                        help=f"Stream every step to viewers on {HOST} (default port {PORT}); see main.py --watch")
+    args = parser.parse_args(argv)
+
+    if args.event_log:
+        event_log.open(args.event_log)
+    simulation = Simulation(args.scenario)
+    if args.resume:
+        path = find_checkpoint(args.resume)
+        if path is None:
+            parser.error(f"No checkpoints in {args.resume}")
+        load_checkpoint(simulation, path)
+        print(f'Resumed from {path} at {simulation.time_manager.get_formatted_time()} '
+              f'(step {simulation.time_manager.frame_count})')
+    timeline = Timeline(args.checkpoint_dir) if args.checkpoint_dir else None
+
+    recorder = None
+    if args.record:
+        recorder = TrajectoryWriter(args.record, simulation.system,
+                                    simulation.time_manager.time_step_per_frame)
+        recorder.capture(simulation.system, simulation.time_manager)
+
+    if timeline is not None:
+        timeline.update(simulation)
+
+    if args.profile_out:
+        profiler.open(args.profile_out)
+    if args.cprofile:
+        profiler.run_cprofile(args.cprofile)
+    server = None
+    if args.serve is not None:
+        server = StreamServer(port=args.serve)
+        print(f'Streaming on {server.host}:{server.port}')
+
+    body_steps = 0
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        body_steps += len(simulation.system)
+        simulation.step()
+        if recorder is not None:
+            recorder.capture(simulation.system, simulation.time_manager)
+        if timeline is not None:
+            timeline.update(simulation)
+        if server is not None:
+            server.publish(simulation)
+        profiler.end_frame()
+    elapsed = time.perf_counter() - start
+    profiler.close()
+    event_log.close()
+    if server is not None:
+        server.close()
+    if recorder is not None:
+        recorder.close()
+        print(f'Recorded {len(recorder)} frames to {args.record}')
+
+    rate = args.steps / elapsed if elapsed > 0 else float('inf')
+    body_rate = body_steps / elapsed if elapsed > 0 else float('inf')
+    print(f'\n{args.steps} steps in {elapsed:.3f} s: {rate:.1f} steps/s, {body_rate:.1f} body-steps/s')
+    print_final_state(simulation)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+from core.config_load import config
+
+FORMAT_VERSION = 1
+COLUMNS = ('pos', 'vel', 'mass', 'radius', 'color')
+MASS_UNITS = ('sun_mass', 'kg')
+
+
+def compile_bodies(bodies_config):
+    """Turn a bodies.json-style dict into column arrays (SI units), validating every body
+
+    Returns a dict with pos and vel (N, 2) float64 arrays, mass and radius
+    (N,) float64 arrays, color as (N, 3) uint8 and name as a string array.
+    Bodies listed in "initial_bodies" come first, then those of each entry
+    of "generators" (see core.generators.generate).
+    """
+    from core.generators import generate
+    colors = config.load_colors()
+    constants = config.load_constants()['physics']
+    scale = 200 / constants['AU']
+    sun_mass = constants['sun_mass']
+
+    bodies = bodies_config.get('initial_bodies', [])
+    generators = bodies_config.get('generators', [])
+    if not isinstance(bodies, list) or not isinstance(generators, list) or not (bodies or generators):
+        raise ValueError("A scenario needs an 'initial_bodies' or a 'generators' list")
+    n = len(bodies)
+    pos = np.zeros((n, 2))
+    vel = np.zeros((n, 2))
+    mass = np.zeros(n)
+    radius = np.zeros(n)
+    color = np.zeros((n, 3), dtype=np.uint8)
+    names = []
+    for i, body in enumerate(bodies):
+        name = body.get('name', f'Body {i + 1}')
+        try:
+            position = body['position']
+            if 'x_au' in position and 'y_au' in position:
+                # Position specified in AU
+                pos[i] = (position['x_au'] / scale, position['y_au'] / scale)
+            else:
+                # Position specified in meters
+                pos[i] = (position['x'], position['y'])
+            if body['mass_unit'] not in MASS_UNITS:
+                raise ValueError(f"Unknown mass unit: {body['mass_unit']}")
+            multiplier = body['mass_multiplier']
+            mass[i] = multiplier * sun_mass if body['mass_unit'] == 'sun_mass' else multiplier
+            radius[i] = body['radius']
+            vel[i] = (body['velocity']['x'], body['velocity']['y'])
+            if body['color'] not in colors:
+                raise ValueError(f"Unknown color: {body['color']}")
+            color[i] = colors[body['color']]
+        except KeyError as e:
+            raise ValueError(f"Body {name!r} is missing {e}") from None
+        names.append(name)
+    columns = {'pos': pos, 'vel': vel, 'mass': mass, 'radius': radius, 'color': color,
+               'name': np.array(names, dtype=str)}
+    for spec in generators:
+        generated = generate(spec, colors)
+        columns = {key: np.concatenate([columns[key], generated[key]]) for key in columns}
+    return columns
+
+
+def save_compiled(path, columns):
+    """Write scenario columns to a compiled .npz scenario file"""
+    np.savez(path, version=FORMAT_VERSION, **columns)
+
+
+def load_compiled(path):
+    """Read the columns of a compiled .npz scenario"""
+    with np.load(path) as data:
+        if int(data['version']) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported scenario version {int(data['version'])} in {path}")
+        columns = {name: data[name] for name in COLUMNS}
+        columns['name'] = data['name'] if 'name' in data else np.zeros(0, dtype=str)
+    n = len(columns['mass'])
+    for name in COLUMNS:
+        if len(columns[name]) != n:
+            raise ValueError(f"Column {name!r} of {path} has {len(columns[name])} rows, expected {n}")
+    return columns
+
+
+def load_scenario(scenario=None):
+    """Columns of a scenario: a compiled .npz file, or a bodies.json-style JSON file
+
+    `scenario` is a file name inside the config directory or a path;
+    defaults to bodies.json.
+    """
+    path = config.resolve_path(scenario or "bodies.json")
+    if Path(path).suffix == '.npz':
+        return load_compiled(path)
+    return compile_bodies(config.load_bodies(path))
+
+
+def main(argv=None):
+    """Compile a JSON scenario into the binary .npz format"""
+    parser = argparse.ArgumentParser(description="Compile a bodies.json-style scenario to .npz")
+    parser.add_argument('source', help="JSON scenario, a name inside config/ or a path")
+    parser.add_argument('output', nargs='?', help="Output file (default: source with .npz suffix)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    columns = compile_bodies(config.load_bodies(args.source))
+    output = args.output or config.resolve_path(args.source).with_suffix('.npz')
+    save_compiled(output, columns)
+    print(f"Compiled {len(columns['mass'])} bodies to {output} in {time.perf_counter() - start:.2f} s")
+
+if __name__ == "__main__":
+    main()
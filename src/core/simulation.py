@@ -0,0 +1,45 @@
+import numpy as np
+from core.objects import create_body_system
+from core.event_log import event_log
+from core.profiler import profiler
+from core.time_manager import TimeManager
+
+class Simulation:
+    """Physics state and stepping, independent of any display
+
+    Orbit trails are only kept with `trails` (for a renderer); headless
+    runs leave them off, saving their memory and per-step sampling.
+    """
+
+    def __init__(self, scenario=None, system=None, time_manager=None, trails=False):
+        self.system = system if system is not None else create_body_system(scenario, trails)
+        self.time_manager = time_manager if time_manager is not None else TimeManager()
+        self.collision_count = 0
+
+    def merge_new_bodies(self):
+        """Add bodies created by physics interactions (debris, mergers)"""
+        self.system.merge_new_bodies()
+
+    def step(self):
+        """Advance the simulation by one time step"""
+        dt = self.time_manager.plan_step(self.system)
+        self.time_manager.update()
+        event_log.frame = self.time_manager.frame_count
+        event_log.time = self.time_manager.simulation_time
+
+        self.collision_count += self.system.step(dt, self.time_manager.levels)
+        # Merge debris now so the state between steps is complete (rewind, checkpoints)
+        with profiler.phase('merge'):
+            self.system.remove_dead()
+            self.merge_new_bodies()
+        if event_log.wants('position'):
+            self.log_positions()
+        profiler.count('steps')
+
+    def log_positions(self):
+        """Emit a position record per body (the event log keeps its sampled share)"""
+        system = self.system
+        speed = np.hypot(system.vel[:, 0], system.vel[:, 1])
+        for body, (x, y), mass, v in zip(system.ids.tolist(), system.pos.tolist(), system.mass.tolist(),
+                                         speed.tolist()):
+            event_log.emit('position', body, -1, x, y, mass, v)
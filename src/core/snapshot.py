@@ -0,0 +1,98 @@
+import numpy as np
+
+
+class Snapshot:
+    """Drawable state of every body, independent of the live BodySystem
+
+    The per-body arrays use the BodySystem array names, so Body views
+    (and anything drawing them) work on a snapshot unchanged. `trails`
+    is an optional OrbitTrails whose rows match the snapshot's rows; a
+    snapshot taken from a live system shares its trails, which only match
+    until the next step.
+    """
+
+    def __init__(self, ids, pos, vel, mass, radius, color, frame_count=0, simulation_time=0.0,
+                 trails=None):
+        self._ids = ids
+        self._pos = pos
+        self._vel = vel
+        self._mass = mass
+        self._radius = radius
+        self._color = color
+        self.frame_count = frame_count
+        self.simulation_time = simulation_time
+        self.trails = trails
+        self._bodies = None
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros(0, dtype=np.int64), np.zeros((0, 2)), np.zeros((0, 2)), np.zeros(0),
+                   np.zeros(0), np.zeros((0, 3), dtype=np.uint8))
+
+    def __len__(self):
+        return len(self._ids)
+
+    ids = property(lambda self: self._ids)
+    pos = property(lambda self: self._pos)
+    vel = property(lambda self: self._vel)
+    mass = property(lambda self: self._mass)
+    radius = property(lambda self: self._radius)
+    color = property(lambda self: self._color)
+
+    @property
+    def bodies(self):
+        """Body views over the snapshot's rows, created on first access"""
+        if self._bodies is None:
+            self._bodies = _SnapshotBodies(self)
+        return self._bodies
+
+    def copy_from(self, system, time_manager):
+        """Overwrite this snapshot with the system's current state, reusing its buffers"""
+        n = len(system)
+        for name in ('_ids', '_pos', '_vel', '_mass', '_radius', '_color'):
+            source = getattr(system, name)
+            target = getattr(self, name)
+            base = target.base if target.base is not None else target
+            if len(base) < n or base.dtype != source.dtype:
+                base = np.empty((max(n, 2 * len(base)),) + source.shape[1:], dtype=source.dtype)
+            target = base[:n]
+            target[:] = source[:n]
+            setattr(self, name, target)
+        self.frame_count = time_manager.frame_count
+        self.simulation_time = time_manager.simulation_time
+        self.trails = system.trails
+        self._bodies = None
+
+    def interpolate(self, newer, alpha):
+        """Snapshot between self (alpha 0) and `newer` (alpha 1)
+
+        Positions are blended linearly; everything else comes from `newer`.
+        When bodies were added or removed in between, `newer` is returned.
+        """
+        if alpha >= 1 or not np.array_equal(self._ids, newer._ids):
+            return newer
+        pos = self._pos + (newer._pos - self._pos) * alpha
+        return Snapshot(newer._ids, pos, newer._vel, newer._mass, newer._radius, newer._color,
+                        newer.frame_count, newer.simulation_time, newer.trails)
+
+
+class _SnapshotBodies:
+    """Sequence of a snapshot's Body views that only builds the ones indexed
+
+    The bulk renderer touches a handful of bodies out of possibly many
+    thousands, so views are not created up front.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._views = [None] * len(snapshot)
+
+    def __len__(self):
+        return len(self._views)
+
+    def __getitem__(self, i):
+        from core.objects import Body
+        view = self._views[i]
+        if view is None:
+            view = self._views[i] = Body._view(self.snapshot, i % len(self._views))
+        return view
@@ -0,0 +1,124 @@
+import numpy as np
+
+LARGE_REACH_FACTOR = 4  # Bodies this many times the median reach skip the grid
+MAX_CELLS = 2**30  # Cells across the points' extent at most, so cell keys fit in int64
+
+
+def expand_ranges(starts, counts):
+    """Concatenate the index ranges [start, start + count) for every entry"""
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets
+
+
+class SpatialHash:
+    """Uniform grid over a set of points, stored as a key-sorted index
+
+    Every point gets the integer key of the square cell it falls in; the
+    points are sorted by key so the members of any cell are one contiguous
+    slice of `order`. Built with NumPy in O(N log N), queried in O(N).
+    A cell size of 0 (or one too small for the extent of the points) is
+    raised to extent / MAX_CELLS; larger cells only add candidates.
+    """
+
+    def __init__(self, pos, cell_size):
+        self.pos = pos
+        extent = float(np.ptp(pos, axis=0).max()) if len(pos) else 0.0
+        self.cell_size = max(cell_size, extent / MAX_CELLS) or 1.0
+        self.origin = pos.min(axis=0) if len(pos) else np.zeros(2)
+        cells = np.floor((pos - self.origin) / self.cell_size).astype(np.int64)
+        # One empty row/column of padding on each side keeps neighbour keys unique
+        self.width = (cells[:, 1].max() + 3) if len(pos) else 3
+        self.keys = (cells[:, 0] + 1) * self.width + cells[:, 1] + 1
+        self.order = np.argsort(self.keys, kind='stable')
+        self.sorted_keys = self.keys[self.order]
+        self.last_cell = cells.max(axis=0) if len(pos) else np.zeros(2, dtype=np.int64)
+
+    def query_rect(self, low, high):
+        """Return the indices of the points inside the rectangle [low, high], in index order
+
+        Only the cells overlapping the rectangle are visited: one slice of
+        `order` per column of cells, so the cost follows the number of
+        points returned rather than the total.
+        """
+        if not len(self.pos):
+            return np.zeros(0, dtype=np.int64)
+        low, high = np.asarray(low, dtype=float), np.asarray(high, dtype=float)
+        first = np.maximum(np.floor((low - self.origin) / self.cell_size), 0)
+        last = np.minimum(np.floor((high - self.origin) / self.cell_size), self.last_cell)
+        if (first > last).any():
+            return np.zeros(0, dtype=np.int64)
+        first, last = first.astype(np.int64), last.astype(np.int64)
+        columns = np.arange(first[0], last[0] + 1)
+        start = np.searchsorted(self.sorted_keys, (columns + 1) * self.width + first[1] + 1, side='left')
+        stop = np.searchsorted(self.sorted_keys, (columns + 1) * self.width + last[1] + 1, side='right')
+        candidates = self.order[expand_ranges(start, stop - start)]
+        inside = ((self.pos[candidates] >= low) & (self.pos[candidates] <= high)).all(axis=1)
+        return np.sort(candidates[inside])
+
+    def candidate_pairs(self):
+        """Return index arrays (first, second), first < second, of points in neighbouring cells"""
+        n = len(self.pos)
+        firsts, seconds = [], []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                neighbour = self.keys + dx * self.width + dy
+                start = np.searchsorted(self.sorted_keys, neighbour, side='left')
+                stop = np.searchsorted(self.sorted_keys, neighbour, side='right')
+                counts = stop - start
+                first = np.repeat(np.arange(n), counts)
+                second = self.order[expand_ranges(start, counts)]
+                keep = first < second
+                firsts.append(first[keep])
+                seconds.append(second[keep])
+        if not firsts:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def pairs_within(pos, cutoff):
+    """Return index arrays (first, second), first < second, of points closer than `cutoff`"""
+    if len(pos) < 2:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    first, second = SpatialHash(pos, cutoff).candidate_pairs()
+    delta = pos[second] - pos[first]
+    close = np.einsum('ij,ij->i', delta, delta) < cutoff * cutoff
+    return first[close], second[close]
+
+
+def overlapping_pairs(pos, reach):
+    """Return index arrays (first, second), first < second, with |p_i - p_j| <= reach_i + reach_j
+
+    The grid cell is sized from the typical reach. The few bodies much
+    larger than the median would need a huge neighbourhood, so they are
+    checked against every body directly instead.
+    """
+    n = len(pos)
+    empty = np.zeros(0, dtype=np.int64)
+    if n < 2:
+        return empty, empty
+    large = reach > LARGE_REACH_FACTOR * np.median(reach)
+    cell_size = 2 * reach[~large].max(initial=0.0)
+
+    firsts, seconds = [], []
+    small = np.flatnonzero(~large)
+    if len(small) > 1:
+        first, second = SpatialHash(pos[small], cell_size).candidate_pairs()
+        firsts.append(small[first])
+        seconds.append(small[second])
+    for i in np.flatnonzero(large):
+        # Pair each large body with every later body, and with every earlier small one
+        others = np.arange(n)
+        others = others[(others > i) | ((others < i) & ~large)]
+        firsts.append(np.full(len(others), i))
+        seconds.append(others)
+    if not firsts:
+        return empty, empty
+
+    first, second = np.concatenate(firsts), np.concatenate(seconds)
+    first, second = np.minimum(first, second), np.maximum(first, second)
+    delta = pos[second] - pos[first]
+    distance = np.sqrt(np.einsum('ij,ij->i', delta, delta))
+    touching = distance <= reach[first] + reach[second]
+    return first[touching], second[touching]
@@ -0,0 +1,156 @@
+import threading
+import time
+from core.config_load import config
+from core.snapshot import Snapshot
+
+# Load constants
+simulation_constants = config.load_constants()['simulation']
+
+STEPS_PER_SECOND = simulation_constants['steps_per_second']
+MAX_SUBSTEPS = simulation_constants['max_substeps']
+PHYSICS_BUDGET_MS = simulation_constants['physics_budget_ms']
+INTERPOLATE = simulation_constants['interpolate']
+
+
+class FixedStepper:
+    """Fixed-timestep accumulator that decouples physics steps from display frames
+
+    Wall-clock time accumulates at `steps_per_second * speed` steps per
+    second; each displayed frame runs the whole steps that are due, at
+    most `max_substeps` and within `budget_ms`. Any backlog left then is
+    dropped, so a slow frame lowers the simulation speed instead of
+    stalling the window. The state after each step is published into one
+    of two snapshot buffers; snapshot() blends the last two by the
+    fraction of a step left in the accumulator.
+
+    Every change to the simulation made from outside must hold `lock` and
+    be followed by sync(). The snapshots share their buffers (and the
+    orbit trails) with the stepper, so read a snapshot while holding
+    `lock` too; it is reentrant, so snapshot() can be called inside.
+    """
+
+    def __init__(self, simulation, steps_per_second=STEPS_PER_SECOND, max_substeps=MAX_SUBSTEPS,
+                 budget_ms=PHYSICS_BUDGET_MS, interpolate=INTERPOLATE, before_step=None, after_step=None):
+        self.simulation = simulation
+        self.steps_per_second = steps_per_second
+        self.max_substeps = max_substeps
+        self.budget_ms = budget_ms
+        self.interpolate = interpolate
+        self.before_step = before_step  # Called with the simulation before / after every step
+        self.after_step = after_step
+        self.speed = 1.0  # Multiplier of steps_per_second
+        self.paused = False
+        self.substeps = 0  # Steps run for the last displayed frame
+        self.lock = threading.RLock()
+        self._previous, self._current = Snapshot.empty(), Snapshot.empty()
+        self._accumulator = 0.0
+        self._last_advance = None
+        self.sync()
+
+    @property
+    def rate(self):
+        """Physics steps per wall-clock second"""
+        return self.steps_per_second * self.speed
+
+    def faster(self):
+        self.speed *= 2
+
+    def slower(self):
+        self.speed /= 2
+
+    def sync(self):
+        """Publish the current state as both buffers (after outside changes)"""
+        system, time_manager = self.simulation.system, self.simulation.time_manager
+        self._previous.copy_from(system, time_manager)
+        self._current.copy_from(system, time_manager)
+
+    def _step(self):
+        """One physics step, publishing the state before and after it"""
+        simulation = self.simulation
+        if self.before_step is not None:
+            self.before_step(simulation)
+        simulation.step()
+        if self.after_step is not None:
+            self.after_step(simulation)
+        self._previous, self._current = self._current, self._previous
+        self._current.copy_from(simulation.system, simulation.time_manager)
+
+    def advance(self):
+        """Run the steps due since the last call; returns how many ran"""
+        now = time.perf_counter()
+        elapsed = 0.0 if self._last_advance is None else now - self._last_advance
+        self._last_advance = now
+        self.substeps = 0
+        if self.paused:
+            self._accumulator = 0.0
+            return 0
+
+        self._accumulator += elapsed * self.rate
+        deadline = now + self.budget_ms / 1000
+        while self._accumulator >= 1 and self.substeps < self.max_substeps:
+            with self.lock:
+                self._step()
+            self._accumulator -= 1
+            self.substeps += 1
+            if time.perf_counter() > deadline:
+                break
+        self._accumulator = min(self._accumulator, 1.0)  # Drop what did not fit
+        return self.substeps
+
+    def snapshot(self):
+        """State to draw: between the last two steps, by the accumulated fraction"""
+        if not self.interpolate or self.paused:
+            return self._current
+        return self._previous.interpolate(self._current, self._accumulator)
+
+
+class PhysicsThread(FixedStepper):
+    """FixedStepper whose steps run in a background thread
+
+    The thread paces itself at `rate` steps per second and publishes
+    snapshots under `lock`; the display loop only reads them, so drawing
+    never waits for a long step and vice versa (NumPy releases the GIL
+    in its heavy loops). advance() just reports progress.
+    """
+
+    def __init__(self, simulation, **kwargs):
+        super().__init__(simulation, **kwargs)
+        self._published = time.perf_counter()
+        self._steps_done = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        next_step = time.perf_counter()
+        while not self._stop.is_set():
+            now = time.perf_counter()
+            if self.paused:
+                time.sleep(0.01)
+                next_step = now
+                continue
+            if now < next_step:
+                time.sleep(min(next_step - now, 0.01))
+                continue
+            with self.lock:
+                self._step()
+                self._published = time.perf_counter()
+                self._steps_done += 1
+            # Fall behind by at most one step instead of bursting to catch up
+            next_step = max(next_step + 1 / self.rate, time.perf_counter() - 1 / self.rate)
+
+    def advance(self):
+        with self.lock:
+            self.substeps, self._steps_done = self._steps_done, 0
+        return self.substeps
+
+    def snapshot(self):
+        if not self.interpolate or self.paused:
+            return self._current
+        with self.lock:
+            alpha = (time.perf_counter() - self._published) * self.rate
+            return self._previous.interpolate(self._current, min(alpha, 1.0))
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
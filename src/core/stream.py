@@ -0,0 +1,425 @@
+import asyncio
+import collections
+import socket
+import threading
+import zlib
+import numpy as np
+from core.config_load import config
+from core.snapshot import Snapshot
+
+# Load constants
+stream_constants = config.load_constants()['stream']
+
+HOST = stream_constants['host']
+PORT = stream_constants['port']
+POSITION_QUANTUM = stream_constants['position_quantum_m']  # Meters per position unit
+VELOCITY_QUANTUM = stream_constants['velocity_quantum']  # m/s per velocity unit
+MAX_QUEUE_FRAMES = stream_constants['max_queue_frames']
+COMPRESSION_LEVEL = stream_constants['compression_level']
+MAGIC = b'GRST'
+VERSION = 1
+KEYFRAME = 1  # Flag: decode against an empty state
+IDS = 2  # Flag: the frame lists its body ids (bodies were created or destroyed)
+
+# Message layout (little-endian), sent as LENGTH (<u4) followed by the message:
+#   HEADER | zlib(payload)
+# payload = ids (<i8 * count, only with the IDS flag) | destroyed ids (<i8 * destroyed)
+#         | ATTRIBUTES * created | ATTRIBUTES * changed
+#         | position deltas (<i8 * count * 2) | velocity deltas (<i8 * count * 2)
+# Positions and velocities are quantized to integers and sent as the difference
+# from the same body's value in the previous frame (from 0 for created bodies).
+LENGTH = np.dtype('<u4')
+HEADER = np.dtype([('magic', 'S4'), ('version', 'u1'), ('flags', 'u1'), ('reserved', '<u2'),
+                   ('count', '<u4'), ('created', '<u4'), ('destroyed', '<u4'), ('changed', '<u4'),
+                   ('frame_count', '<i8'), ('simulation_time', '<f8'), ('time_step', '<f8'),
+                   ('collision_count', '<i8'), ('position_quantum', '<f8'), ('velocity_quantum', '<f8')])
+ATTRIBUTES = np.dtype([('id', '<i8'), ('mass', '<f8'), ('radius', '<f8'), ('color', 'u1', (3,))],
+                      align=True)
+
+
+def _align(old_ids, new_ids):
+    """Rows of `old_ids` holding each of `new_ids`, and which of them were there at all"""
+    if not len(old_ids):
+        return np.zeros(len(new_ids), dtype=np.int64), np.zeros(len(new_ids), dtype=bool)
+    order = np.argsort(old_ids, kind='stable')
+    found = np.minimum(np.searchsorted(old_ids[order], new_ids), len(old_ids) - 1)
+    source = order[found]
+    return source, old_ids[source] == new_ids
+
+
+class StreamFrame(Snapshot):
+    """A decoded stream frame, drawable like any snapshot
+
+    Adds the HUD values sent along with the bodies, and the ids of the
+    bodies created and destroyed since the previous frame.
+    """
+
+    def __init__(self, header, ids, pos, vel, mass, radius, color, created, destroyed):
+        super().__init__(ids, pos, vel, mass, radius, color, int(header['frame_count']),
+                         float(header['simulation_time']))
+        self.time_step = float(header['time_step'])
+        self.collision_count = int(header['collision_count'])
+        self.keyframe = bool(header['flags'] & KEYFRAME)
+        self.created = created
+        self.destroyed = destroyed
+
+
+class StreamEncoder:
+    """Turns successive states into delta-encoded stream messages
+
+    Each encode() is relative to the state of the previous call, so a
+    receiver must decode every message in order; keyframe() encodes the
+    last state against nothing, for receivers joining or catching up.
+    """
+
+    def __init__(self, position_quantum=POSITION_QUANTUM, velocity_quantum=VELOCITY_QUANTUM,
+                 level=COMPRESSION_LEVEL):
+        self.position_quantum = position_quantum
+        self.velocity_quantum = velocity_quantum
+        self.level = level
+        self.frames = 0
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._pos = np.zeros((0, 2), dtype=np.int64)
+        self._vel = np.zeros((0, 2), dtype=np.int64)
+        self._mass = np.zeros(0)
+        self._radius = np.zeros(0)
+        self._color = np.zeros((0, 3), dtype=np.uint8)
+        self._stamp = (0, 0.0, 0.0, 0)  # frame_count, simulation_time, time_step, collision_count
+
+    def _header(self, flags, created, destroyed, changed):
+        header = np.zeros((), dtype=HEADER)
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['flags'] = flags
+        header['count'] = len(self._ids)
+        header['created'] = created
+        header['destroyed'] = destroyed
+        header['changed'] = changed
+        (header['frame_count'], header['simulation_time'], header['time_step'],
+         header['collision_count']) = self._stamp
+        header['position_quantum'] = self.position_quantum
+        header['velocity_quantum'] = self.velocity_quantum
+        return header
+
+    def _attributes(self, rows):
+        records = np.zeros(len(rows), dtype=ATTRIBUTES)
+        records['id'] = self._ids[rows]
+        records['mass'] = self._mass[rows]
+        records['radius'] = self._radius[rows]
+        records['color'] = self._color[rows]
+        return records
+
+    def _message(self, header, parts):
+        payload = zlib.compress(b''.join(np.ascontiguousarray(part).tobytes() for part in parts), self.level)
+        return header.tobytes() + payload
+
+    def encode(self, snapshot, time_step=0.0, collision_count=0):
+        """Message for `snapshot` relative to the previously encoded state"""
+        ids = snapshot.ids
+        pos = np.rint(snapshot.pos / self.position_quantum).astype(np.int64)
+        vel = np.rint(snapshot.vel / self.velocity_quantum).astype(np.int64)
+        if np.array_equal(ids, self._ids):
+            source, known = np.arange(len(ids)), np.ones(len(ids), dtype=bool)
+        else:
+            source, known = _align(self._ids, ids)
+        destroyed = np.setdiff1d(self._ids, ids)
+        kept = np.flatnonzero(known)
+        base_pos = np.zeros_like(pos)
+        base_vel = np.zeros_like(vel)
+        base_pos[kept] = self._pos[source[kept]]
+        base_vel[kept] = self._vel[source[kept]]
+        old = source[kept]
+        changed = kept[(self._mass[old] != snapshot.mass[kept]) | (self._radius[old] != snapshot.radius[kept])
+                       | (self._color[old] != snapshot.color[kept]).any(axis=1)]
+        created = np.flatnonzero(~known)
+
+        self._ids = ids.copy()
+        self._pos, self._vel = pos, vel
+        self._mass, self._radius, self._color = snapshot.mass.copy(), snapshot.radius.copy(), snapshot.color.copy()
+        self._stamp = (snapshot.frame_count, snapshot.simulation_time, time_step, collision_count)
+        flags = IDS if len(created) or len(destroyed) else 0
+        if not self.frames:
+            flags |= KEYFRAME | IDS  # Nothing came before
+        self.frames += 1
+
+        header = self._header(flags, len(created), len(destroyed), len(changed))
+        parts = ([ids.astype('<i8')] if flags & IDS else []) + [
+            destroyed.astype('<i8'), self._attributes(created), self._attributes(changed),
+            (pos - base_pos).astype('<i8'), (vel - base_vel).astype('<i8')]
+        return self._message(header, parts)
+
+    def keyframe(self):
+        """Message for the last encoded state, decodable without any earlier message"""
+        n = len(self._ids)
+        header = self._header(KEYFRAME | IDS, n, 0, 0)
+        return self._message(header, [self._ids.astype('<i8'), self._attributes(np.arange(n)),
+                                      self._pos.astype('<i8'), self._vel.astype('<i8')])
+
+
+class StreamDecoder:
+    """Rebuilds frames from stream messages, applied in the order they were sent"""
+
+    def __init__(self):
+        self.frames = 0
+        self._ids = None  # None until the first keyframe
+        self._pos = self._vel = None
+        self._mass = self._radius = self._color = None
+
+    def decode(self, message):
+        """The StreamFrame of one message"""
+        header = np.frombuffer(message, dtype=HEADER, count=1)[0]
+        if header['magic'] != MAGIC or header['version'] != VERSION:
+            raise ValueError("Not a simulation stream message")
+        flags = int(header['flags'])
+        if flags & KEYFRAME:
+            self._ids = np.zeros(0, dtype=np.int64)
+            self._pos = self._vel = np.zeros((0, 2), dtype=np.int64)
+            self._mass = self._radius = np.zeros(0)
+            self._color = np.zeros((0, 3), dtype=np.uint8)
+        elif self._ids is None:
+            raise ValueError("Stream delta before the first keyframe")
+
+        payload = zlib.decompress(message[HEADER.itemsize:])
+        offset = 0
+
+        def take(dtype, count):
+            nonlocal offset
+            array = np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+            offset += array.nbytes
+            return array
+
+        n = int(header['count'])
+        ids = take('<i8', n).astype(np.int64) if flags & IDS else self._ids
+        if len(ids) != n:
+            raise ValueError(f"Stream frame has {n} bodies, the previous one {len(ids)}")
+        destroyed = take('<i8', int(header['destroyed'])).astype(np.int64)
+        created = take(ATTRIBUTES, int(header['created']))
+        changed = take(ATTRIBUTES, int(header['changed']))
+        delta_pos = take('<i8', 2 * n).reshape(n, 2)
+        delta_vel = take('<i8', 2 * n).reshape(n, 2)
+
+        if flags & IDS:
+            # Carry the bodies still present over to their new rows; created ones start from 0
+            source, known = _align(self._ids, ids)
+            kept = np.flatnonzero(known)
+            pos = np.zeros((n, 2), dtype=np.int64)
+            vel = np.zeros((n, 2), dtype=np.int64)
+            mass, radius = np.zeros(n), np.zeros(n)
+            color = np.zeros((n, 3), dtype=np.uint8)
+            for target, previous in ((pos, self._pos), (vel, self._vel), (mass, self._mass),
+                                     (radius, self._radius), (color, self._color)):
+                target[kept] = previous[source[kept]]
+            pos += delta_pos
+            vel += delta_vel
+        else:
+            pos, vel = self._pos + delta_pos, self._vel + delta_vel
+            mass, radius, color = self._mass.copy(), self._radius.copy(), self._color.copy()
+        for records in (created, changed):
+            if len(records):
+                rows, _ = _align(ids, records['id'])
+                mass[rows] = records['mass']
+                radius[rows] = records['radius']
+                color[rows] = records['color']
+
+        self._ids, self._pos, self._vel = ids, pos, vel
+        self._mass, self._radius, self._color = mass, radius, color
+        self.frames += 1
+        return StreamFrame(header, ids, pos * float(header['position_quantum']),
+                           vel * float(header['velocity_quantum']), mass, radius, color,
+                           created['id'].astype(np.int64), destroyed)
+
+
+class _Client:
+    """One connected viewer: its queue of messages and its writer task"""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.queue = collections.deque()
+        self.ready = asyncio.Event()
+        self.needs_keyframe = True
+        self.skipped = 0  # Frames dropped because the client fell behind
+        self.task = None
+
+    def push(self, message):
+        self.queue.append(len(message).to_bytes(LENGTH.itemsize, 'little') + message)
+        self.ready.set()
+
+
+class StreamServer:
+    """Publishes the simulation state to viewers on a TCP port, from an asyncio loop in its own thread
+
+    publish() is called from the simulation loop; it copies the state
+    (only when someone is connected and the state changed) and returns.
+    The server thread encodes the newest published state once per frame
+    and queues the message for every client. A client whose queue holds
+    `max_queue` frames is behind: its queue is dropped and it gets a
+    keyframe of the current state instead, so slow viewers skip frames
+    and never hold up the simulation or the other viewers. New clients
+    start with a keyframe too.
+    """
+
+    def __init__(self, host=HOST, port=PORT, max_queue=MAX_QUEUE_FRAMES, encoder=None):
+        self.host = host
+        self.port = port
+        self.max_queue = max(1, max_queue)
+        self.encoder = encoder if encoder is not None else StreamEncoder()
+        self.client_count = 0
+        self.skipped = 0  # Frames dropped for slow clients, over all clients
+        self._clients = set()
+        self._pending = None
+        self._pending_lock = threading.Lock()
+        self._last_frame = None
+        self._keyframe_wanted = False
+        self._closing = False
+        self._error = None
+        self._loop = asyncio.new_event_loop()
+        self._wake = None
+        self._server = None
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._error is not None:
+            raise self._error
+
+    # Simulation side
+
+    def publish(self, simulation):
+        """Hand the simulation's current state to the server without waiting"""
+        time_manager = simulation.time_manager
+        if not self.client_count or (time_manager.frame_count == self._last_frame
+                                     and not self._keyframe_wanted):
+            return
+        self._last_frame = time_manager.frame_count
+        self._keyframe_wanted = False
+        snapshot = Snapshot.empty()
+        snapshot.copy_from(simulation.system, time_manager)
+        with self._pending_lock:
+            self._pending = (snapshot, time_manager.get_time_step(), simulation.collision_count)
+        self._loop.call_soon_threadsafe(self._wake.set)
+
+    def close(self):
+        """Disconnect every client and stop the server thread"""
+        if self._closing:
+            return
+        self._closing = True
+        self._loop.call_soon_threadsafe(self._wake.set)
+        self._thread.join()
+
+    # Server thread
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._wake = asyncio.Event()
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._serve_client, self.host, self.port))
+        except OSError as e:
+            self._error = e
+            self._started.set()
+            return
+        self.port = self._server.sockets[0].getsockname()[1]  # The actual port when 0 was asked
+        self._started.set()
+        self._loop.run_until_complete(self._broadcast())
+
+        # Shutting down
+        self._server.close()
+        for client in list(self._clients):
+            client.task.cancel()
+        tasks = [client.task for client in self._clients]
+        if tasks:
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self._loop.run_until_complete(self._server.wait_closed())
+        self._loop.close()
+
+    async def _broadcast(self):
+        """Encode each published state once and queue it for every client"""
+        while not self._closing:
+            await self._wake.wait()
+            self._wake.clear()
+            with self._pending_lock:
+                pending, self._pending = self._pending, None
+            if pending is None or not self._clients:
+                continue
+            message = self.encoder.encode(*pending)
+            keyframe = None
+            for client in self._clients:
+                if len(client.queue) >= self.max_queue:
+                    client.skipped += len(client.queue)
+                    self.skipped += len(client.queue)
+                    client.queue.clear()
+                    client.needs_keyframe = True
+                if client.needs_keyframe:
+                    if keyframe is None:
+                        keyframe = self.encoder.keyframe()
+                    client.needs_keyframe = False
+                    client.push(keyframe)
+                else:
+                    client.push(message)
+
+    async def _serve_client(self, reader, writer):
+        """Send one client its queued messages, one at a time, until it disconnects"""
+        client = _Client(writer)
+        client.task = asyncio.current_task()
+        self._clients.add(client)
+        self.client_count = len(self._clients)
+        self._keyframe_wanted = True  # Publish even if the state has not changed since
+        try:
+            while True:
+                await client.ready.wait()
+                client.ready.clear()
+                while client.queue:
+                    writer.write(client.queue.popleft())
+                    await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._clients.discard(client)
+            self.client_count = len(self._clients)
+            writer.close()
+
+
+class StreamClient:
+    """Connects to a StreamServer and decodes every message in a background thread
+
+    latest() returns the newest decoded frame (None before the first);
+    frames decoded in between are not kept.
+    """
+
+    def __init__(self, host=HOST, port=PORT):
+        self.decoder = StreamDecoder()
+        self.connected = True
+        self.error = None
+        self._latest = None
+        self._lock = threading.Lock()
+        self._socket = socket.create_connection((host, port))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        stream = self._socket.makefile('rb')
+        try:
+            while True:
+                length = stream.read(LENGTH.itemsize)
+                if len(length) < LENGTH.itemsize:
+                    break
+                message = stream.read(int.from_bytes(length, 'little'))
+                frame = self.decoder.decode(message)
+                with self._lock:
+                    self._latest = frame
+        except (OSError, ValueError, zlib.error) as e:
+            self.error = e
+        finally:
+            self.connected = False
+
+    def latest(self):
+        with self._lock:
+            return self._latest
+
+    def close(self):
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._socket.close()
+        self._thread.join()
@@ -1,29 +1,95 @@
+import collections
 import time
+import numpy as np
 from core.config_load import config
 
 class TimeManager:
-    """Simple time manager with fixed time step"""
-    
+    """Time manager with fixed, adaptive or block (power-of-two) time steps
+
+    time_step_per_frame is the largest step. In "adaptive" mode one global
+    step per frame is shrunk to resolve the fastest body; in "block" mode
+    every frame still covers time_step_per_frame, but each body substeps
+    at its own level: time_step_per_frame / 2**level.
+    """
+
     def __init__(self):
         self.config = config.load_constants()['simulation']
-        
+
         # Fixed time step per frame (in seconds)
         self.time_step_per_frame = self.config['time_step_per_frame']
-        
+
+        # Step control
+        self.mode = self.config['time_step_mode']
+        self.accuracy = self.config['time_step_accuracy']
+        self.max_level = self.config['max_time_step_level']
+        self.min_time_step = self.time_step_per_frame / 2**self.max_level
+        self.current_time_step = self.time_step_per_frame
+        self.levels = None  # Per-body block levels of the planned frame
+        self.level_counts = []  # Number of bodies on each level, for the HUD
+        # Accelerations at the start of the last planned frame, with the body ids
+        # and the simulation time they were evaluated at (the jerk estimate)
+        self._previous_acc = None
+        self._previous_ids = None
+        self._previous_time = None
+        self._step_history = collections.deque(maxlen=100000)  # For rewind()
+
         # Simulation time tracking
         self.simulation_time = 0.0  # Total simulation time in seconds
         self.frame_count = 0
-        
+
         # FPS tracking
         self.fps = 0
         self.last_fps_update = time.time()
         self.fps_frame_count = 0
-    
+
+    def _body_time_steps(self, system):
+        """Per-body step estimate eta * |a| / |da/dt|
+
+        The jerk is the change between the accelerations at the start of
+        this frame and at the start of the previous one, over the time
+        between them. Without a usable previous frame (first frame, rewind,
+        bodies created or destroyed) it is probed by evaluating the
+        accelerations again a short drift ahead.
+        """
+        acc = system.start_accelerations()
+        ids = system.ids
+        interval = self.simulation_time - self._previous_time if self._previous_acc is not None else 0.0
+        if interval > 0 and np.array_equal(ids, self._previous_ids):
+            jerk = np.linalg.norm(acc - self._previous_acc, axis=1) / interval
+        else:
+            probe = system.accelerations(system.pos + system.vel * self.min_time_step)
+            jerk = np.linalg.norm(probe - acc, axis=1) / self.min_time_step
+        self._previous_acc, self._previous_ids, self._previous_time = acc, ids.copy(), self.simulation_time
+        with np.errstate(divide='ignore', invalid='ignore'):
+            steps = self.accuracy * np.linalg.norm(acc, axis=1) / jerk
+        steps[~np.isfinite(steps)] = self.time_step_per_frame
+        return np.clip(steps, self.min_time_step, self.time_step_per_frame)
+
+    def plan_step(self, system):
+        """Choose the time step (and block levels) for the next frame"""
+        self.levels = None
+        self.level_counts = []
+        if self.mode == 'fixed':
+            self.current_time_step = self.time_step_per_frame
+        elif self.mode == 'adaptive':
+            steps = self._body_time_steps(system)
+            self.current_time_step = float(steps.min(initial=self.time_step_per_frame))
+        elif self.mode == 'block':
+            steps = self._body_time_steps(system)
+            self.current_time_step = self.time_step_per_frame
+            levels = np.ceil(np.log2(self.time_step_per_frame / steps)).astype(np.int64)
+            self.levels = np.clip(levels, 0, self.max_level)
+            self.level_counts = np.bincount(self.levels, minlength=1).tolist()
+        else:
+            raise ValueError(f"Unknown time step mode: {self.mode}")
+        return self.current_time_step
+
     def update(self):
         """Update simulation time by one time step"""
-        self.simulation_time += self.time_step_per_frame
+        self.simulation_time += self.current_time_step
+        self._step_history.append(self.current_time_step)
         self.frame_count += 1
-        
+
         # Update FPS counter every second
         self.fps_frame_count += 1
         current_time = time.time()
@@ -31,11 +97,11 @@ class TimeManager:
             self.fps = self.fps_frame_count
             self.fps_frame_count = 0
             self.last_fps_update = current_time
-    
+
     def get_time_step(self):
-        """Get the fixed time step"""
-        return self.time_step_per_frame
-    
+        """Get the time step of the current frame"""
+        return self.current_time_step
+
     def get_formatted_time(self):
         """Get formatted simulation time string"""
         days = self.simulation_time / 86400
@@ -47,13 +113,37 @@ class TimeManager:
         else:
             years = days / 365.25
             return f"{years:.2f} years"
-    
+
     def reset_time(self):
         """Reset simulation time"""
         self.simulation_time = 0.0
         self.frame_count = 0
+        self._step_history.clear()
+
+    def restore(self, simulation_time, frame_count):
+        """Jump the clock to a previously recorded frame"""
+        self.simulation_time = simulation_time
+        self.frame_count = frame_count
+        self._step_history.clear()
+        self._previous_acc = None
+
+    def controller_state(self):
+        """Copy of the step controller's memory, for checkpoints and history keyframes"""
+        if self._previous_acc is None:
+            return None
+        return self._previous_acc.copy(), self._previous_ids.copy(), self._previous_time
+
+    def restore_controller(self, state):
+        """Put back memory taken with controller_state(), so the next steps match the original run"""
+        if state is None:
+            self._previous_acc = self._previous_ids = self._previous_time = None
+        else:
+            acc, ids, previous_time = state
+            self._previous_acc, self._previous_ids, self._previous_time = acc.copy(), ids.copy(), previous_time
 
     def rewind(self):
-        self.simulation_time -= self.time_step_per_frame
+        """Undo the last frame's advance of simulation time"""
+        step = self._step_history.pop() if self._step_history else self.time_step_per_frame
+        self.simulation_time -= step
         self.frame_count -=1
-        
\ No newline at end of file
+        self._previous_acc = None  # Jerk history no longer matches the state
@@ -0,0 +1,102 @@
+import math
+import numpy as np
+from core.config_load import config
+
+# Load constants
+constants = config.load_constants()['physics']
+simulation_constants = config.load_constants()['simulation']
+
+AU = constants['AU']
+SCALE = 200/AU
+TIME_STEP = simulation_constants['time_step_per_frame']
+FPS = simulation_constants['target_fps']
+SAMPLE_INTERVAL = simulation_constants['orbit_sample_interval']
+MAX_ORBIT = math.sqrt(1/TIME_STEP) * 60**3 * FPS/20  # Trail span, in steps
+TRAIL_LENGTH = max(2, math.ceil(MAX_ORBIT / SAMPLE_INTERVAL))  # Points kept per body
+
+
+class OrbitTrails:
+    """Orbit trails of every body of a BodySystem in one circular buffer
+
+    Every `sample_interval` steps the position of every body (in pixels
+    from the screen center) goes into slot `head` of a (length, capacity, 2)
+    float32 array. The buffer is time-major, so a sample is one contiguous
+    write and pages are only touched as the trail fills; memory stays at
+    length * capacity points however long the run. Rows follow the rows
+    of the owning BodySystem; counts[i] is how many of the newest slots
+    belong to row i (bodies added mid-run start empty).
+    """
+
+    def __init__(self, capacity=16, length=TRAIL_LENGTH, sample_interval=SAMPLE_INTERVAL):
+        self.length = length
+        self.sample_interval = max(1, sample_interval)
+        self.points = np.zeros((length, 0, 2), dtype=np.float32)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.stamps = np.full(length, -1, dtype=np.int64)  # Step number of each slot's sample
+        self.head = 0  # Next slot to write
+        self.filled = 0  # Slots holding a sample
+        self.steps = 0
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        """Make room for `capacity` rows, copying only the filled slots"""
+        if capacity <= self.points.shape[1]:
+            return
+        rows = self.points.shape[1]
+        points = np.zeros((self.length, capacity, 2), dtype=np.float32)
+        points[:self.filled, :rows] = self.points[:self.filled]
+        self.points = points
+        counts = np.zeros(capacity, dtype=np.int64)
+        counts[:rows] = self.counts
+        self.counts = counts
+
+    def clear(self):
+        self.counts[:] = 0
+        self.stamps[:] = -1
+        self.head = self.filled = 0
+
+    def reset_row(self, i):
+        self.counts[i] = 0
+
+    def sample(self, pos):
+        """Count one step and record `pos` (metres) if a sample is due"""
+        self.steps += 1
+        if self.steps % self.sample_interval:
+            return
+        n = len(pos)
+        self.points[self.head, :n] = pos * SCALE
+        self.stamps[self.head] = self.steps
+        self.counts[:n] = np.minimum(self.counts[:n] + 1, self.length)
+        self.head = (self.head + 1) % self.length
+        self.filled = min(self.filled + 1, self.length)
+
+    def move_rows(self, source, target):
+        """Copy rows `source` over rows `target` (after BodySystem.remove_dead)"""
+        self.points[:self.filled, target] = self.points[:self.filled, source]
+        self.counts[target] = self.counts[source]
+
+    def remap(self, old_ids, new_ids):
+        """Reorder rows from `old_ids` to `new_ids`; ids not seen before start empty"""
+        self.grow(len(new_ids))
+        order = np.argsort(old_ids, kind='stable')
+        found = np.searchsorted(old_ids[order], new_ids)
+        found = np.minimum(found, max(len(old_ids) - 1, 0))
+        source = order[found] if len(old_ids) else np.zeros(len(new_ids), dtype=np.int64)
+        known = (old_ids[source] == new_ids) if len(old_ids) else np.zeros(len(new_ids), dtype=bool)
+        self.points[:self.filled, :len(new_ids)] = self.points[:self.filled, source]
+        self.counts[:len(new_ids)] = np.where(known, self.counts[source], 0)
+
+    def rewind(self, steps):
+        """Forget the samples taken during the last `steps` steps"""
+        self.steps = max(0, self.steps - steps)
+        while self.filled and self.stamps[(self.head - 1) % self.length] > self.steps:
+            self.head = (self.head - 1) % self.length
+            self.stamps[self.head] = -1
+            self.filled -= 1
+            self.counts[:] = np.maximum(self.counts - 1, 0)
+
+    def trail(self, i):
+        """Points of row i, oldest first, as a (k, 2) array"""
+        count = int(self.counts[i])
+        slots = (self.head - count + np.arange(count)) % self.length
+        return self.points[slots, i]
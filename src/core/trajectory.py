@@ -0,0 +1,194 @@
+import queue
+import threading
+import numpy as np
+from core.config_load import config
+from core.snapshot import Snapshot
+
+# Load constants
+simulation_constants = config.load_constants()['simulation']
+
+CHUNK_FRAMES = simulation_constants['trajectory_chunk_frames']
+MAGIC = b'GRAVTRJ1'
+VERSION = 1
+
+# File layout (little-endian, every section a multiple of 8 bytes):
+#   PREAMBLE | HEADER_BODY * body_count | frames... | index (int64 * frame_count)
+# where each frame is FRAME_HEADER followed by FRAME_HEADER.count BODY records.
+# index_offset stays 0 until the writer is closed; readers then rebuild the
+# index by walking the frame headers.
+PREAMBLE = np.dtype([('magic', 'S8'), ('version', '<u4'), ('chunk_frames', '<u4'),
+                     ('time_step', '<f8'), ('body_count', '<i8'), ('frame_count', '<i8'),
+                     ('index_offset', '<i8')])
+HEADER_BODY = np.dtype([('id', '<i8'), ('mass', '<f8'), ('radius', '<f8'),
+                        ('color', 'u1', (3,))], align=True)
+FRAME_HEADER = np.dtype([('frame_count', '<i8'), ('simulation_time', '<f8'),
+                         ('time_step', '<f8'), ('count', '<i8')])
+BODY = np.dtype([('id', '<i8'), ('pos', '<f8', (2,)), ('vel', '<f8', (2,)), ('mass', '<f8'),
+                 ('radius', '<f8'), ('color', 'u1', (3,))], align=True)
+
+
+class TrajectoryWriter:
+    """Record a run to a trajectory file without blocking the simulation loop
+
+    capture() copies the state into a frame buffer; every `chunk_frames`
+    frames the chunk is handed to a background thread that does the file
+    I/O. Frame offsets are known up front, so the index is kept here and
+    written at the end by close().
+    """
+
+    def __init__(self, path, system, time_step, chunk_frames=CHUNK_FRAMES):
+        self.path = path
+        self.chunk_frames = max(1, chunk_frames)
+        self._file = open(path, 'wb')
+        self._preamble = np.zeros((), dtype=PREAMBLE)
+        self._preamble['magic'] = MAGIC
+        self._preamble['version'] = VERSION
+        self._preamble['chunk_frames'] = self.chunk_frames
+        self._preamble['time_step'] = time_step
+        self._preamble['body_count'] = len(system)
+
+        header = np.zeros(len(system), dtype=HEADER_BODY)
+        header['id'] = system.ids
+        header['mass'] = system.mass
+        header['radius'] = system.radius
+        header['color'] = system.color
+        self._file.write(self._preamble.tobytes())
+        self._file.write(header.tobytes())
+
+        self._offset = PREAMBLE.itemsize + header.nbytes
+        self._index = []
+        self._chunk = []
+        self._last_frame = -1
+        self._error = None
+        self._queue = queue.Queue()  # Unbounded, so put() never waits on the disk
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        return len(self._index)
+
+    def _write_loop(self):
+        """Background thread: write chunks in order until told to stop"""
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            try:
+                for frame in chunk:
+                    self._file.write(frame)
+            except OSError as e:
+                self._error = e
+
+    def capture(self, system, time_manager):
+        """Append the current state as a frame
+
+        Frames are kept in frame_count order: states at or before the last
+        recorded frame (replayed after a rewind) are already in the file.
+        """
+        if time_manager.frame_count <= self._last_frame:
+            return
+        n = len(system)
+        frame = np.empty(FRAME_HEADER.itemsize + n * BODY.itemsize, dtype=np.uint8)
+        head = frame[:FRAME_HEADER.itemsize].view(FRAME_HEADER)[0]
+        head['frame_count'] = time_manager.frame_count
+        head['simulation_time'] = time_manager.simulation_time
+        head['time_step'] = time_manager.get_time_step()
+        head['count'] = n
+        bodies = frame[FRAME_HEADER.itemsize:].view(BODY)
+        bodies['id'] = system.ids
+        bodies['pos'] = system.pos
+        bodies['vel'] = system.vel
+        bodies['mass'] = system.mass
+        bodies['radius'] = system.radius
+        bodies['color'] = system.color
+
+        self._index.append(self._offset)
+        self._offset += frame.nbytes
+        self._last_frame = time_manager.frame_count
+        self._chunk.append(frame)
+        if len(self._chunk) >= self.chunk_frames:
+            self._flush()
+
+    def _flush(self):
+        if self._chunk:
+            self._queue.put(self._chunk)
+            self._chunk = []
+
+    def close(self):
+        """Write the remaining frames and the index, then finalize the preamble"""
+        if self._file.closed:
+            return
+        self._flush()
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            self._file.close()
+            raise self._error
+        index = np.array(self._index, dtype='<i8')
+        self._file.write(index.tobytes())
+        self._preamble['frame_count'] = len(index)
+        self._preamble['index_offset'] = self._offset
+        self._file.seek(0)
+        self._file.write(self._preamble.tobytes())
+        self._file.close()
+
+
+class TrajectoryFrame(Snapshot):
+    """One recorded frame as zero-copy views into the memory-mapped file"""
+
+    def __init__(self, header, records):
+        super().__init__(records['id'], records['pos'], records['vel'], records['mass'],
+                         records['radius'], records['color'], int(header['frame_count']),
+                         float(header['simulation_time']))
+        self.time_step = float(header['time_step'])
+        self.records = records
+
+
+class Trajectory:
+    """Memory-mapped trajectory file with O(1) access to any frame"""
+
+    def __init__(self, path):
+        self.path = path
+        self._map = np.memmap(path, dtype=np.uint8, mode='r')
+        preamble = self._map[:PREAMBLE.itemsize].view(PREAMBLE)[0]
+        if preamble['magic'] != MAGIC:
+            raise ValueError(f"Not a trajectory file: {path}")
+        if preamble['version'] != VERSION:
+            raise ValueError(f"Unsupported trajectory version {preamble['version']} in {path}")
+        self.time_step = float(preamble['time_step'])
+        self.chunk_frames = int(preamble['chunk_frames'])
+        self.header = np.ndarray(int(preamble['body_count']), dtype=HEADER_BODY,
+                                 buffer=self._map, offset=PREAMBLE.itemsize)
+        first_frame = PREAMBLE.itemsize + self.header.nbytes
+        if preamble['index_offset']:
+            self.index = np.ndarray(int(preamble['frame_count']), dtype='<i8',
+                                    buffer=self._map, offset=int(preamble['index_offset']))
+        else:
+            self.index = self._scan(first_frame)
+
+    def _scan(self, offset):
+        """Rebuild the frame index of a file whose writer was not closed"""
+        index = []
+        while offset + FRAME_HEADER.itemsize <= len(self._map):
+            count = int(self._map[offset:offset + FRAME_HEADER.itemsize].view(FRAME_HEADER)[0]['count'])
+            size = FRAME_HEADER.itemsize + count * BODY.itemsize
+            if offset + size > len(self._map):
+                break  # Truncated last frame
+            index.append(offset)
+            offset += size
+        return np.array(index, dtype='<i8')
+
+    def __len__(self):
+        return len(self.index)
+
+    def frame(self, i):
+        """Frame number i (negative counts from the end), without copying"""
+        offset = int(self.index[i])
+        header = self._map[offset:offset + FRAME_HEADER.itemsize].view(FRAME_HEADER)[0]
+        records = np.ndarray(int(header['count']), dtype=BODY, buffer=self._map,
+                             offset=offset + FRAME_HEADER.itemsize)
+        return TrajectoryFrame(header, records)
+
+    def close(self):
+        """Drop the mapping; it is unmapped once no frame views remain"""
+        self.header = self.index = self._map = None
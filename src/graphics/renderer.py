@@ -1,6 +1,11 @@
+import collections
 import pygame
-import math
+import time
+import numpy as np
 from core.config_load import config
+from core.spatial_hash import SpatialHash
+from graphics.text_cache import TextCache
+from graphics.viewport import Viewport
 
 # Load configurations
 constants = config.load_constants()['physics']
@@ -14,6 +19,31 @@ WHITE = tuple(colors['white'])
 YELLOW = tuple(colors['yellow'])
 AU = constants['AU']
 SCALE = 200/AU
+SCREEN_SIZE = np.array([WINDOW_WIDTH, WINDOW_HEIGHT], dtype=np.float32)
+LABEL_MODES = ('all', 'largest', 'selected', 'none')
+LABEL_MODE = display_settings['labels']['mode']
+LARGEST_LABELS = display_settings['labels']['largest_count']
+LABEL_INTERVAL = 1 / display_settings['labels']['refresh_hz']  # Seconds between label updates
+SELECT_MARGIN = 5  # Pixels around a body that still select it
+RENDER_MODES = ('auto', 'detailed', 'bulk')
+RENDER_MODE = display_settings['render']['mode']
+DETAIL_MAX_BODIES = display_settings['render']['detail_max_bodies']
+FRAME_BUDGET_MS = display_settings['render']['frame_budget_ms']
+BULK_DETAIL_BODIES = display_settings['render']['bulk_detail_bodies']
+DENSITY = display_settings['render']['density']
+ZOOM_STEP = display_settings['view']['zoom_step']
+CULL_MARGIN = display_settings['view']['cull_margin_px']  # Pixels outside the window still drawn
+EDGE_SECTORS = display_settings['view']['edge_sectors']  # Directions off-screen bodies are grouped by
+EDGE_INSET = 20  # Pixels between an edge indicator and the window border
+
+def _density_colormap(stops=((0.0, (40, 60, 160)), (0.5, (255, 140, 0)), (1.0, (255, 255, 255)))):
+    """256-entry RGB lookup table interpolated between (level, color) stops"""
+    levels = np.linspace(0, 1, 256)
+    positions = [level for level, _ in stops]
+    return np.stack([np.interp(levels, positions, [c[k] for _, c in stops]) for k in range(3)],
+                    axis=1).astype(np.uint8)
+
+DENSITY_COLORMAP = _density_colormap()
 
 class Renderer:
     """Handles all drawing operations for the simulation"""
@@ -24,113 +54,294 @@ class Renderer:
         self.large_font = pygame.font.SysFont(display_settings['font']['name'], 
                                             display_settings['font']['size'] + 4)
         self.frame_count = 0
+        self.text = TextCache()
+        self.label_mode = LABEL_MODE
+        self.selected = set()  # Ids of bodies picked with the mouse
+        self._label_ids = None  # Ids allowed a label this frame; None means every body
+        self._labels = collections.OrderedDict()  # body id -> (next refresh time, surfaces), LRU
+        self.render_mode = RENDER_MODE
+        self.bulk = False  # Whether the last frame used the bulk path
+        self._body_cost_ms = None  # Running average cost of one detailed draw_body
+        self.view = Viewport(*screen.get_size())
+        self.visible_count = 0  # Bodies inside the view last frame
+        self._profile_texts = []  # Profiler overlay lines, refreshed every LABEL_INTERVAL
+        self._profile_refresh = 0.0
+
+    def cycle_label_mode(self):
+        """Switch to the next label mode (all, largest, selected, none)"""
+        self.label_mode = LABEL_MODES[(LABEL_MODES.index(self.label_mode) + 1) % len(LABEL_MODES)]
+        self._body_cost_ms = None  # Labels change the per-body cost; measure again
+
+    def cycle_render_mode(self):
+        """Switch to the next render mode (auto, detailed, bulk)"""
+        self.render_mode = RENDER_MODES[(RENDER_MODES.index(self.render_mode) + 1) % len(RENDER_MODES)]
+
+    def choose_labels(self, ids, mass):
+        """Pick the bodies that get a label this frame, given all ids and masses"""
+        if self.label_mode == 'all':
+            self._label_ids = None
+        elif self.label_mode == 'largest' and len(ids):
+            k = min(LARGEST_LABELS, len(ids))
+            largest = np.argpartition(-mass, k - 1)[:k]
+            self._label_ids = set(ids[largest].tolist()) | self.selected
+        elif self.label_mode == 'none':
+            self._label_ids = set()
+        else:
+            self._label_ids = set(self.selected)
+
+    def toggle_selection(self, point, ids, pos, radius):
+        """Select or deselect the body under the screen `point`, if any"""
+        if not len(ids):
+            return
+        screen_pos = self.view.to_screen(pos)
+        distance = np.hypot(*(screen_pos - point).T)
+        i = int(np.argmin(distance))
+        if distance[i] <= radius[i] + SELECT_MARGIN:
+            self.selected ^= {int(ids[i])}
     
+    def handle_view_event(self, event):
+        """Zoom (mouse wheel, PAGE UP/DOWN), pan (right-drag), follow the selected body (F),
+        track the center of mass (C) or reset the view (0); returns whether `event` was used"""
+        if event.type == pygame.MOUSEWHEEL:
+            self.view.zoom_at(pygame.mouse.get_pos(), ZOOM_STEP ** event.y)
+        elif event.type == pygame.MOUSEMOTION and event.buttons[2]:
+            self.view.pan(event.rel)
+        elif event.type == pygame.KEYDOWN and event.key in (pygame.K_PAGEUP, pygame.K_PAGEDOWN):
+            factor = ZOOM_STEP if event.key == pygame.K_PAGEUP else 1 / ZOOM_STEP
+            self.view.zoom_at(self.view.size / 2, factor)
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_f:
+            if self.selected and self.view.follow not in self.selected:
+                self.view.follow_body(min(self.selected))
+            else:
+                self.view.follow_body(None)
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_c:
+            self.view.toggle_center_of_mass()
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_0:
+            self.view.reset()
+        else:
+            return False
+        return True
+
+    def _cull(self, pos):
+        """Rows of the bodies inside the view (plus CULL_MARGIN), from a spatial index built for this frame"""
+        if not len(pos):
+            return np.zeros(0, dtype=np.int64)
+        return SpatialHash(pos, self.view.index_cell).query_rect(*self.view.bounds(CULL_MARGIN))
+
+    def _draw_edge_indicators(self, pos, mass, color, visible):
+        """One marker per screen direction holding off-screen bodies, with how many there are
+
+        Off-screen bodies are grouped into EDGE_SECTORS directions seen from
+        the window center; each group is drawn once, at the window edge
+        towards its most massive body and in that body's color.
+        """
+        hidden = np.ones(len(pos), dtype=bool)
+        hidden[visible] = False
+        hidden = np.flatnonzero(hidden)
+        if not len(hidden):
+            return
+        direction = self.view.to_screen(pos[hidden]) - self.view.size / 2
+        angle = np.arctan2(direction[:, 1], direction[:, 0])
+        sector = np.floor((angle / (2 * np.pi) + 0.5 / EDGE_SECTORS) * EDGE_SECTORS).astype(np.int64) % EDGE_SECTORS
+        counts = np.bincount(sector, minlength=EDGE_SECTORS)
+        hidden_mass = mass[hidden]
+        for group in np.flatnonzero(counts).tolist():
+            row = hidden[np.argmax(np.where(sector == group, hidden_mass, -np.inf))]
+            # Where the ray towards the body leaves the window, moved EDGE_INSET inside
+            toward = self.view.to_screen(pos[row]) - self.view.size / 2
+            reach = (self.view.size / 2 - EDGE_INSET) / np.maximum(np.abs(toward), 1e-9)
+            x, y = self.view.size / 2 + toward * min(reach.min(), 1.0)
+            body_color = tuple(int(c) for c in color[row])
+            pygame.draw.circle(self.screen, body_color, (int(x), int(y)), 5)
+            count = int(counts[group])
+            text = self.text.render(self.font, f"{count} OFF-SCREEN" if count > 1 else "OFF-SCREEN", WHITE)
+            # Keep the text inside the window
+            tx = x + 10 if x + 10 + text.get_width() <= self.view.size[0] else x - 10 - text.get_width()
+            self.screen.blit(text, (tx, y - text.get_height() / 2))
+
+    def _use_bulk(self, n):
+        """Choose the bulk path when detailed drawing would not fit the frame budget"""
+        if self.render_mode != 'auto':
+            return self.render_mode == 'bulk'
+        if n > DETAIL_MAX_BODIES:
+            return True
+        return self._body_cost_ms is not None and n * self._body_cost_ms > FRAME_BUDGET_MS
+
+    def draw_bodies(self, bodies, ids, pos, mass, color):
+        """Draw the bodies inside the view, switching to bulk splatting for large populations
+
+        `bodies` are the Body views, index-aligned with the arrays. Only the
+        bodies found in the view by the frame's spatial index are drawn (the
+        rest become a few edge indicators), and the detailed/bulk choice is
+        made on their number. In bulk mode their positions are splatted
+        into the pixel buffer at once and only the BULK_DETAIL_BODIES most
+        massive (and selected) of them get circles, trails and labels.
+        """
+        self.view.update(ids, pos, mass)
+        visible = self._cull(pos)
+        self.visible_count = n = len(visible)
+        self._draw_edge_indicators(pos, mass, color, visible)
+        self.bulk = self._use_bulk(n)
+        if not self.bulk:
+            start = time.perf_counter()
+            for i in visible.tolist():
+                self.draw_body(bodies[i])
+            if n:
+                cost = (time.perf_counter() - start) * 1000 / n
+                self._body_cost_ms = cost if self._body_cost_ms is None else 0.8*self._body_cost_ms + 0.2*cost
+            return
+
+        self._splat(pos[visible], color[visible])
+        k = min(BULK_DETAIL_BODIES, n)
+        detailed = set(visible[np.argpartition(-mass[visible], k - 1)[:k]].tolist()) if k else set()
+        if self.selected:
+            detailed.update(visible[np.isin(ids[visible], list(self.selected))].tolist())
+        for i in sorted(detailed):
+            self.draw_body(bodies[i])
+
+    def _splat(self, pos, color):
+        """Write one pixel per on-screen body straight into the screen's pixel buffer
+
+        With DENSITY, pixels are colored by how many bodies land on them
+        (log scale through DENSITY_COLORMAP) instead of by body color.
+        """
+        width, height = self.screen.get_size()
+        screen_pos = np.floor(self.view.to_screen(pos)).astype(np.int64)
+        x, y = screen_pos[:, 0], screen_pos[:, 1]
+        visible = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        x, y = x[visible], y[visible]
+        if not len(x):
+            return
+        pixels = pygame.surfarray.pixels3d(self.screen)
+        if DENSITY:
+            keys, counts = np.unique(x * height + y, return_counts=True)
+            level = np.log1p(counts) / np.log1p(counts.max())
+            pixels[keys // height, keys % height] = DENSITY_COLORMAP[(level * 255).astype(np.int64)]
+        else:
+            pixels[x, y] = color[visible]
+        del pixels  # Unlock the surface
+
     def draw_body(self, body):
-        """Draw a celestial body with its orbit trail and information"""
+        """Draw a celestial body with its orbit trail and information
+
+        Bodies outside the view are skipped; draw_bodies stands them in
+        with edge indicators.
+        """
         self.frame_count += 1
         
-        screen_x = body.x*SCALE + WINDOW_WIDTH/2
-        screen_y = body.y*SCALE + WINDOW_HEIGHT/2    
+        screen_x = body.x*self.view.scale + self.view.offset[0]
+        screen_y = body.y*self.view.scale + self.view.offset[1]
 
         # Check if body is visible on screen
-        if (screen_x < -100 or screen_x > WINDOW_WIDTH + 100 or 
-            screen_y < -100 or screen_y > WINDOW_HEIGHT + 100):
-            # Draw a small indicator for off-screen bodies
-            if screen_x < 0:
-                screen_x = 20
-            elif screen_x > WINDOW_WIDTH:
-                screen_x = WINDOW_WIDTH - 20
-            if screen_y < 0:
-                screen_y = 20
-            elif screen_y > WINDOW_HEIGHT:
-                screen_y = WINDOW_HEIGHT - 20
-            
-            # Draw small indicator
-            pygame.draw.circle(self.screen, body.color, (int(screen_x), int(screen_y)), 5)
-            indicator_text = self.font.render("OFF-SCREEN", 1, WHITE)
-            self.screen.blit(indicator_text, (screen_x + 10, screen_y))
+        if (screen_x < -CULL_MARGIN or screen_x > WINDOW_WIDTH + CULL_MARGIN or
+            screen_y < -CULL_MARGIN or screen_y > WINDOW_HEIGHT + CULL_MARGIN):
             return
 
-        # Draw orbit trail
-        if len(body.orbit) > 2:
-            updated_points = []
-            for point in body.orbit:
-                orbit_x, orbit_y = point
-                orbit_x += WINDOW_WIDTH/2
-                orbit_y += WINDOW_HEIGHT/2
-                # Only add points that are on screen
-                if 0 <= orbit_x <= WINDOW_WIDTH and 0 <= orbit_y <= WINDOW_HEIGHT:
-                    updated_points.append((orbit_x, orbit_y))
-        
-            if len(updated_points) > 1:
-                pygame.draw.lines(self.screen, body.color, False, updated_points, 2)
+        # Draw orbit trail (stored in pixels at zoom 1 from the origin)
+        orbit = body.orbit
+        if len(orbit) > 2:
+            points = orbit * self.view.zoom + self.view.offset
+            # Draw each run of on-screen points on its own, so gaps are not bridged
+            on_screen = np.all((points >= 0) & (points <= SCREEN_SIZE), axis=1)
+            runs = np.split(np.arange(len(points)), np.flatnonzero(np.diff(on_screen)) + 1)
+            for run in runs:
+                if len(run) > 1 and on_screen[run[0]]:
+                    pygame.draw.lines(self.screen, body.color, False, points[run].tolist(), 2)
 
         # Draw the body
         pygame.draw.circle(self.screen, body.color, (int(screen_x), int(screen_y)), body.radius)
 
         # Draw basic information
-        self._draw_body_info(body, screen_x, screen_y)
+        if self._label_ids is None or body.id in self._label_ids:
+            self._draw_body_info(body, screen_x, screen_y)
     
     def _draw_body_info(self, body, x, y):
-        """Draw velocity and position information"""
-        speed = body.get_speed()
-        info_texts = [
-            f"Vx={round(body.x_vel,2)}m/s",
-            f"Vy={round(body.y_vel,2)}m/s", 
-            f"Pos=({round(body.x*SCALE,1)}, {round(body.y*SCALE,1)})"
-        ]
+        """Draw velocity and position information
+
+        The values are re-rendered LABEL_INTERVAL seconds apart (staggered
+        between bodies); in between the body's cached surfaces are reused.
+        """
+        now = time.perf_counter()
+        label = self._labels.get(body.id)
+        if label is None or now >= label[0]:
+            info_texts = [
+                f"Vx={round(body.x_vel,2)}m/s",
+                f"Vy={round(body.y_vel,2)}m/s", 
+                f"Pos=({round(body.x*SCALE,1)}, {round(body.y*SCALE,1)})"
+            ]
+            stagger = 0 if label is not None else LABEL_INTERVAL * (body.id % 8) / 8
+            label = (now + LABEL_INTERVAL + stagger,
+                     [self.font.render(text, 1, WHITE) for text in info_texts])
+            self._labels[body.id] = label
+            if len(self._labels) > self.text.capacity:
+                self._labels.popitem(last=False)
+        self._labels.move_to_end(body.id)
         
-        for i, text in enumerate(info_texts):
-            rendered_text = self.font.render(text, 1, WHITE)
-            self.screen.blit(rendered_text, (x + 20, y + i * 18))
+        self.screen.blits([(surface, (x + 20, y + i * 18)) for i, surface in enumerate(label[1])])
     
-    def draw_simulation_info(self, time_manager, collision_count, states):
-        """Draw basic simulation information"""
-        y_offset = 10
-        
+    def draw_simulation_info(self, time_manager, collision_count, states, speed=None, substeps=0,
+                             profile=None):
+        """Draw basic simulation information (unchanged lines come from the text cache)
+
+        `profile` is a dict of per-frame profiler averages; when given, the
+        time of every phase and the counters are listed below the rest.
+        """
         # Simulation time
-        time_text = f"Time: {time_manager.get_formatted_time()}"
-        time_surface = self.large_font.render(time_text, 1, YELLOW)
-        self.screen.blit(time_surface, (10, y_offset))
-        y_offset += 30
+        lines = [(self.text.render(self.large_font, f"Time: {time_manager.get_formatted_time()}", YELLOW), 30)]
         
         # Time step info
-        timestep_hours = time_manager.time_step_per_frame / 3600
-        timestep_text = f"Time step: {timestep_hours:.1f} hours per frame"
-        timestep_surface = self.font.render(timestep_text, 1, WHITE)
-        self.screen.blit(timestep_surface, (10, y_offset))
-        y_offset += 20
-        
-        # FPS
-        fps_text = f"FPS: {time_manager.fps}"
-        fps_surface = self.font.render(fps_text, 1, WHITE)
-        self.screen.blit(fps_surface, (10, y_offset))
-        y_offset += 20
-        
-        # Collision count
-        collision_text = f"Collisions: {collision_count}"
-        collision_surface = self.font.render(collision_text, 1, WHITE)
-        self.screen.blit(collision_surface, (10, y_offset))
-        y_offset += 20
+        timestep_hours = time_manager.get_time_step() / 3600
+        info_texts = [f"Time step: {timestep_hours:.1f} hours per step"]
+        if speed is not None:
+            info_texts.append(f"Speed: {speed:g}x ({substeps} steps/frame)")
+
+        # Block time step level distribution
+        if time_manager.level_counts:
+            info_texts.append("Step levels: " + " ".join(
+                f"L{level}:{count}" for level, count in enumerate(time_manager.level_counts) if count))
         
-        # Screen center indicator
-        center_text = f"Screen center: ({WINDOW_WIDTH//2}, {WINDOW_HEIGHT//2})"
-        center_surface = self.font.render(center_text, 1, WHITE)
-        self.screen.blit(center_surface, (10, y_offset))
-        y_offset +=20
+        info_texts += [
+            f"FPS: {time_manager.fps}",
+            f"Collisions: {collision_count}",
+            self.view.describe(),
+            f"Now in state: {states}",
+        ]
+        if self.label_mode != 'all':
+            info_texts.append(f"Labels: {self.label_mode}")
+        if self.bulk:
+            info_texts.append(f"Render: bulk ({BULK_DETAIL_BODIES} detailed)")
+        info_texts.append(f"Visible bodies: {self.visible_count}")
+        if profile:
+            info_texts += self._profile_overlay(profile)
+        lines += [(self.text.render(self.font, text, WHITE), 20) for text in info_texts]
+
+        # Blit every line in one call
+        y_offset = 10
+        blits = []
+        for surface, height in lines:
+            blits.append((surface, (10, y_offset)))
+            y_offset += height
+        self.screen.blits(blits)
 
-        # States counter
-        states_text = f"Now in state: {states}"
-        states_surface = self.font.render(states_text, 1, WHITE)
-        self.screen.blit(states_surface, (10, y_offset))
+    def _profile_overlay(self, profile):
+        """Overlay lines for the profiler averages, re-formatted only a few times per second"""
+        now = time.perf_counter()
+        if now >= self._profile_refresh:
+            self._profile_refresh = now + LABEL_INTERVAL
+            phases = [(key[:-3], value) for key, value in profile.items()
+                      if key.endswith('_ms') and key != 'total_ms']
+            self._profile_texts = [f"Profile: {profile.get('total_ms', 0):.2f} ms/frame"]
+            self._profile_texts += [f"  {name}: {ms:.2f} ms" for name, ms in phases]
+            self._profile_texts.append(f"  steps {profile.get('steps', 0):.1f}, "
+                                       f"interactions {profile.get('interactions', 0):,.0f}, "
+                                       f"collisions {profile.get('collisions', 0):.1f}")
+        return self._profile_texts
 
     def rewinding(self):
-        rewind_text = f"REWINDING SIMULATION"
-        rewind_surface = self.font.render(rewind_text, 1, WHITE)
+        rewind_surface = self.text.render(self.font, "REWINDING SIMULATION", WHITE)
         self.screen.blit(rewind_surface, (WINDOW_WIDTH - 200, 20))
     
     def paused(self):
-        pause_text = f"SIMULATION PAUSED"
-        pause_surface = self.font.render(pause_text, 1, WHITE)
+        pause_surface = self.text.render(self.font, "SIMULATION PAUSED", WHITE)
         self.screen.blit(pause_surface, (WINDOW_WIDTH - 200, 20))
         
\ No newline at end of file
@@ -0,0 +1,44 @@
+import collections
+from core.config_load import config
+
+# Load configurations
+display_settings = config.load_display_settings()
+
+TEXT_CACHE_SIZE = display_settings['text_cache_size']
+
+
+class TextCache:
+    """Rendered text surfaces keyed on (font, text, color)
+
+    Rasterizing text is by far the most expensive thing the renderer
+    does, and most strings (HUD labels, "OFF-SCREEN", labels between
+    refreshes) repeat from frame to frame. The least recently used
+    surface is evicted once `capacity` is reached.
+    """
+
+    def __init__(self, capacity=TEXT_CACHE_SIZE):
+        self.capacity = capacity
+        self._surfaces = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._surfaces)
+
+    def render(self, font, text, color):
+        """Return the surface of `text`, rendering it only on a cache miss"""
+        key = (id(font), text, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, 1, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.capacity:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
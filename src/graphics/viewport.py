@@ -0,0 +1,102 @@
+import numpy as np
+from core.config_load import config
+
+# Load configurations
+constants = config.load_constants()['physics']
+display_settings = config.load_display_settings()
+
+AU = constants['AU']
+SCALE = 200/AU  # Pixels per meter at zoom 1
+WINDOW_WIDTH = display_settings['window']['width']
+WINDOW_HEIGHT = display_settings['window']['height']
+MIN_ZOOM = display_settings['view']['min_zoom']
+MAX_ZOOM = display_settings['view']['max_zoom']
+INDEX_CELLS = 16  # Cells of the per-frame spatial index across the viewport width
+
+
+class Viewport:
+    """Maps simulation meters to screen pixels: a center point and a zoom factor
+
+    `center` is the point shown in the middle of the window. `follow`
+    keeps it on a body (its id) or on the center of mass of all bodies
+    ('center_of_mass'); panning by hand stops following.
+    """
+
+    def __init__(self, width=WINDOW_WIDTH, height=WINDOW_HEIGHT):
+        self.size = np.array([width, height], dtype=float)
+        self.center = np.zeros(2)
+        self.zoom = 1.0
+        self.follow = None
+        self.scale = SCALE
+        self.offset = self.size / 2
+        self._refresh()
+
+    def _refresh(self):
+        self.scale = SCALE * self.zoom
+        self.offset = self.size / 2 - self.center * self.scale
+
+    def to_screen(self, pos):
+        """Screen pixels of positions in meters (any array ending in x, y)"""
+        return pos * self.scale + self.offset
+
+    def to_world(self, point):
+        """Position in meters of a screen pixel"""
+        return (np.asarray(point, dtype=float) - self.offset) / self.scale
+
+    def bounds(self, margin=0):
+        """Lower and upper corners, in meters, of the window grown by `margin` pixels"""
+        return self.to_world((-margin, -margin)), self.to_world(self.size + margin)
+
+    @property
+    def index_cell(self):
+        """Cell size (meters) of the per-frame spatial index, so a query touches a few cells"""
+        return self.size[0] / self.scale / INDEX_CELLS
+
+    def zoom_at(self, point, factor):
+        """Zoom by `factor`, keeping the world point under the screen `point` in place"""
+        anchor = self.to_world(point)
+        self.zoom = min(max(self.zoom * factor, MIN_ZOOM), MAX_ZOOM)
+        self.scale = SCALE * self.zoom
+        if self.follow is None:
+            self.center = anchor - (np.asarray(point, dtype=float) - self.size / 2) / self.scale
+        self._refresh()
+
+    def pan(self, pixels):
+        """Move the view by a screen offset (the scene follows the mouse)"""
+        self.follow = None
+        self.center = self.center - np.asarray(pixels, dtype=float) / self.scale
+        self._refresh()
+
+    def follow_body(self, body_id):
+        self.follow = body_id
+
+    def toggle_center_of_mass(self):
+        self.follow = None if self.follow == 'center_of_mass' else 'center_of_mass'
+
+    def reset(self):
+        self.center = np.zeros(2)
+        self.zoom = 1.0
+        self.follow = None
+        self._refresh()
+
+    def update(self, ids, pos, mass):
+        """Move the center onto the followed target, once per frame"""
+        if self.follow == 'center_of_mass' and len(mass):
+            self.center = (mass[:, np.newaxis] * pos).sum(axis=0) / mass.sum()
+        elif self.follow is not None and self.follow != 'center_of_mass':
+            row = np.flatnonzero(ids == self.follow)
+            if len(row):
+                self.center = pos[row[0]].copy()
+            else:
+                self.follow = None  # The body is gone (absorbed or merged)
+        self._refresh()
+
+    def describe(self):
+        """One HUD line about the view"""
+        if self.follow == 'center_of_mass':
+            target = 'center of mass'
+        elif self.follow is not None:
+            target = f'body {self.follow}'
+        else:
+            target = 'free'
+        return f"View: {self.zoom:.3g}x, {target}"
@@ -1,33 +1,203 @@
+import argparse
+import numpy as np
 import pygame
-import collections
+from core.checkpoint import Timeline, find_checkpoint, load_checkpoint
 from core.config_load import config
-from core.objects import Body, delete_body, create_bodies_list
-from core.physics import new_bodies_queue
+from core.event_log import EVENT_FILE, event_log
+from core.history import HistoryRing
+from core.profiler import CPROFILE_FILE, profiler
+from core.simulation import Simulation
+from core.stepper import FixedStepper, PhysicsThread
+from core.stream import HOST, PORT, StreamClient, StreamServer
 from core.time_manager import TimeManager
+from core.trails import OrbitTrails
+from core.trajectory import Trajectory, TrajectoryWriter
 from graphics.renderer import Renderer
 
-def main():
-    """Main simulation loop with fixed time step"""
-    # Initialize Pygame
+def setup_display():
+    """Open the window and create the renderer"""
     pygame.init()
-    
-    # Load configurations
-    colors = config.load_colors()
     display_settings = config.load_display_settings()
-    simulation_config = config.load_constants()['simulation']
 
     # Setup display
     WINDOW_WIDTH = display_settings['window']['width']
     WINDOW_HEIGHT = display_settings['window']['height']
     screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
     pygame.display.set_caption(display_settings['window']['title'])
-    
+
     # Setup font and renderer
     font = pygame.font.SysFont(display_settings['font']['name'], display_settings['font']['size'])
-    renderer = Renderer(screen, font)
+    return screen, Renderer(screen, font)
+
+def replay(path):
+    """Play a recorded trajectory file back without simulating"""
+    screen, renderer = setup_display()
+    DARK_BLUE = tuple(config.load_colors()['dark_blue'])
+    target_fps = config.load_constants()['simulation']['target_fps']
+    clock = pygame.time.Clock()
+
+    trajectory = Trajectory(path)
+    time_manager = TimeManager()  # Only drives the HUD
+    print(f'Replaying {len(trajectory)} frames from {path}')
+
+    trails = OrbitTrails()  # Rebuilt while playing forward
+    trail_ids = np.zeros(0, dtype=np.int64)  # Body ids of the trail rows
+    position = 0
+    paused = False
+    running = len(trajectory) > 0
+    while running:
+        clock.tick(target_fps)
+        screen.fill(DARK_BLUE)
+
+        # Handle events
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if renderer.handle_view_event(event):
+                continue
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_HOME:
+                    position = 0
+                    trails.clear()
+                elif event.key == pygame.K_END:
+                    position = len(trajectory) - 1
+                    trails.clear()
+                elif event.key == pygame.K_l:
+                    renderer.cycle_label_mode()
+                elif event.key == pygame.K_r:
+                    renderer.cycle_render_mode()
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                frame = trajectory.frame(position)
+                renderer.toggle_selection(event.pos, frame.ids, frame.pos, frame.radius)
+
+        keys = pygame.key.get_pressed()
+        rewinding = keys[pygame.K_LEFT] and paused
+        if rewinding:
+            position = max(position - 1, 0)
+        elif keys[pygame.K_RIGHT] and paused:
+            position = min(position + 1, len(trajectory) - 1)
+
+        # Draw the frame straight from the mapped file
+        frame = trajectory.frame(position)
+        time_manager.restore(frame.simulation_time, frame.frame_count)
+        time_manager.current_time_step = frame.time_step
+        if not np.array_equal(trail_ids, frame.ids):
+            trails.remap(trail_ids, frame.ids)
+            trail_ids = frame.ids.copy()
+        if not paused:
+            trails.sample(frame.pos)
+        frame.trails = trails
+        renderer.choose_labels(frame.ids, frame.mass)
+        renderer.draw_bodies(frame.bodies, frame.ids, frame.pos, frame.mass, frame.color)
+
+        renderer.draw_simulation_info(time_manager, 0, f'{position + 1}/{len(trajectory)}')
+        if rewinding:
+            renderer.rewinding()
+        elif paused:
+            renderer.paused()
+
+        pygame.display.update()
+        if not paused and position < len(trajectory) - 1:
+            position += 1
+
+    trajectory.close()
+    pygame.quit()
+
+def watch(address):
+    """Draw the frames streamed by a simulation started with --serve"""
+    host, _, port = address.rpartition(':')
+    client = StreamClient(host or HOST, int(port))
+    screen, renderer = setup_display()
+    DARK_BLUE = tuple(config.load_colors()['dark_blue'])
+    target_fps = config.load_constants()['simulation']['target_fps']
+    clock = pygame.time.Clock()
+    time_manager = TimeManager()  # Only drives the HUD
+    print(f'Watching {host or HOST}:{port}')
+
+    trails = OrbitTrails()  # Built from the frames shown
+    trail_ids = np.zeros(0, dtype=np.int64)
+    shown = None
+    running = True
+    while running and client.connected:
+        clock.tick(target_fps)
+        screen.fill(DARK_BLUE)
+        frame = client.latest()
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if renderer.handle_view_event(event):
+                continue
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_l:
+                    renderer.cycle_label_mode()
+                elif event.key == pygame.K_r:
+                    renderer.cycle_render_mode()
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and frame is not None:
+                renderer.toggle_selection(event.pos, frame.ids, frame.pos, frame.radius)
+
+        if frame is not None:
+            time_manager.restore(frame.simulation_time, frame.frame_count)
+            time_manager.current_time_step = frame.time_step
+            if not np.array_equal(trail_ids, frame.ids):
+                trails.remap(trail_ids, frame.ids)
+                trail_ids = frame.ids.copy()
+            if frame is not shown:
+                trails.sample(frame.pos)
+                shown = frame
+            frame.trails = trails
+            renderer.choose_labels(frame.ids, frame.mass)
+            renderer.draw_bodies(frame.bodies, frame.ids, frame.pos, frame.mass, frame.color)
+            renderer.draw_simulation_info(time_manager, frame.collision_count,
+                                          f'{client.decoder.frames} frames received')
+        pygame.display.update()
+
+    if client.error is not None:
+        print(f'Stream ended: {client.error}')
+    client.close()
+    pygame.quit()
+
+def main(argv=None):
+    """Main simulation loop with fixed time step"""
+    parser = argparse.ArgumentParser(description="Gravitational force simulation")
+    parser.add_argument('--scenario', default=None,
+                        help="Bodies file (JSON or compiled .npz), either a name inside config/ or a path (default: bodies.json)")
+    parser.add_argument('--record', metavar='FILE', help="Record every frame to a trajectory file")
+    parser.add_argument('--replay', metavar='FILE', help="Play back a recorded trajectory file")
+    parser.add_argument('--serve', metavar='PORT', type=int, nargs='?', const=PORT,
+                        help=f"Stream every frame to viewers on {HOST} (default port {PORT})")
+    parser.add_argument('--watch', metavar='HOST:PORT', nargs='?', const=f'{HOST}:{PORT}',
+                        help="Show the frames streamed by a simulation started with --serve")
+    parser.add_argument('--checkpoint-dir', metavar='DIR',
+                        help="Checkpoint every checkpoint_interval frames; rewind then reaches the start of the run")
+    parser.add_argument('--resume', metavar='PATH',
+                        help="Start from a checkpoint file, or from the latest one in a directory")
+    parser.add_argument('--seek', metavar='DAYS', type=float,
+                        help="Start at this simulation time, fast-forwarding from the nearest checkpoint")
+    parser.add_argument('--event-log', metavar='FILE', default=EVENT_FILE,
+                        help="Write collision, merger and body events to a binary event file")
+    parser.add_argument('--profile', action='store_true',
+                        help="Show per-phase frame timings on the HUD (toggle with P)")
+    parser.add_argument('--profile-out', metavar='FILE',
+                        help="Stream per-frame phase timings and counters to a CSV file (JSON if FILE ends in .json)")
+    parser.add_argument('--cprofile', metavar='FRAMES', type=int,
+                        help=f"Run cProfile over the first FRAMES frames and save the stats to {CPROFILE_FILE}")
+    args = parser.parse_args(argv)
+    if args.seek is not None and not args.checkpoint_dir:
+        parser.error("--seek needs --checkpoint-dir")
+    if args.replay:
+        return replay(args.replay)
+    if args.watch:
+        return watch(args.watch)
+
+    # Initialize Pygame, the display and the renderer
+    screen, renderer = setup_display()
     
-    # Initialize time manager
-    time_manager = TimeManager()
+    # Load configurations
+    colors = config.load_colors()
+    simulation_config = config.load_constants()['simulation']
     
     # Colors
     DARK_BLUE = tuple(colors['dark_blue'])
@@ -35,87 +205,149 @@ def main():
     # Initialize simulation
     target_fps = simulation_config['target_fps']
     clock = pygame.time.Clock()
-    collision_count = 0
     
-    # Create initial celestial bodies (same as original but with time step)
-    bodies = create_bodies_list()
+    # Create initial celestial bodies and the time manager
+    if args.event_log:
+        event_log.open(args.event_log)
+    simulation = Simulation(args.scenario, trails=True)
+    system = simulation.system
+    time_manager = simulation.time_manager
+    if args.resume:
+        path = find_checkpoint(args.resume)
+        if path is None:
+            parser.error(f"No checkpoints in {args.resume}")
+        load_checkpoint(simulation, path)
+    timeline = Timeline(args.checkpoint_dir) if args.checkpoint_dir else None
+    if args.seek is not None and not timeline.seek_time(simulation, args.seek * 86400):
+        parser.error(f"No checkpoint before day {args.seek} in {args.checkpoint_dir}")
     
     # Calculate total system mass
-    total_mass = sum(body.mass for body in bodies)
+    total_mass = system.total_mass()
     print(f'System has total mass of {total_mass}')
-    print(f'Time step: {time_manager.time_step_per_frame/3600:.1f} hours per frame')
-    print(f'Target FPS: {target_fps}')
+    print(f'Time step: {time_manager.time_step_per_frame/3600:.1f} hours per step')
+    print(f'Target FPS: {target_fps}, {simulation_config["steps_per_second"]} steps per second')
+
+    # Optional trajectory recording, starting with the initial state
+    recorder = None
+    if args.record:
+        recorder = TrajectoryWriter(args.record, system, time_manager.time_step_per_frame)
+        recorder.capture(system, time_manager)
     
+    # Physics advances in fixed steps, decoupled from the display frames
+    history = HistoryRing()
+
+    def before_step(simulation):
+        with profiler.phase('history'):
+            history.capture(system, time_manager)
+        if timeline is not None:
+            timeline.update(simulation)
+
+    def after_step(simulation):
+        if recorder is not None:
+            recorder.capture(system, time_manager)
+
+    Stepper = PhysicsThread if simulation_config['physics_thread'] else FixedStepper
+    stepper = Stepper(simulation, before_step=before_step, after_step=after_step)
+
+    # Optional instrumentation
+    if args.profile:
+        profiler.enable()
+    if args.profile_out:
+        profiler.open(args.profile_out)
+    if args.cprofile:
+        profiler.run_cprofile(args.cprofile)
+    server = None
+    if args.serve is not None:
+        server = StreamServer(port=args.serve)
+        print(f'Streaming on {server.host}:{server.port}')
+
     # Main simulation loop
-    history = collections.deque(maxlen=5000)
     paused = False
     running = True
-    states = 0
     while running:
         clock.tick(target_fps)  # Fixed FPS
         screen.fill(DARK_BLUE)
 
         # Handle events
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_SPACE:
-                    paused = not paused
+        with profiler.phase('events'):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                if renderer.handle_view_event(event):
+                    continue
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_SPACE:
+                        paused = not paused
+                    elif event.key == pygame.K_l:
+                        renderer.cycle_label_mode()
+                    elif event.key == pygame.K_r:
+                        renderer.cycle_render_mode()
+                    elif event.key == pygame.K_p:
+                        profiler.toggle()
+                    elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                        stepper.faster()
+                    elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                        stepper.slower()
+                if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    with stepper.lock:
+                        snapshot = stepper.snapshot()
+                        renderer.toggle_selection(event.pos, snapshot.ids, snapshot.pos, snapshot.radius)
 
         keys = pygame.key.get_pressed()
         rewinding = keys[pygame.K_LEFT] and paused
 
-        if not paused and not rewinding:
-            # Update time (one step per frame)
-            time_manager.update()
-            
-            # Get the fixed time step
-            dt = time_manager.get_time_step()
-
-            # Add new bodies from physics interactions
-            if len(new_bodies_queue) >= 1:
-                bodies.extend(new_bodies_queue)
-                new_bodies_queue.clear()
-            
-            #store states
-            current_state = [(b.x, b.y, b.color, b.mass, b.radius, b.x_vel, b.y_vel) for b in bodies]
-            history.append(current_state)
-            states+=1
-        
-        if rewinding and history:
-            last_state = history.pop()
-            states-=1
-            for i, b in enumerate(bodies):
-                b.x, b.y, b.color, b.mass, b.radius, b.x_vel, b.y_vel = last_state[i]
-                b.orbit.pop()
-            time_manager.rewind()
-
-        # Update and draw bodies
-        for body in bodies[:]:  # Use slice to avoid modification during iteration
-            if not paused and not rewinding:
-                if not body.exists:
-                    delete_body(body, bodies)
-                else:
-                    body.update_position(bodies, dt)
-            
-            renderer.draw_body(body)
-
-        # Draw simulation info
-        renderer.draw_simulation_info(time_manager, collision_count, states)
+        # Run the physics steps due this frame
+        stepper.paused = paused
+        stepper.advance()
+
+        if rewinding:
+            with stepper.lock, profiler.phase('history'):
+                if not history.rewind(simulation) and timeline is not None:
+                    # History exhausted: rebuild it from the previous checkpoint
+                    if time_manager.frame_count > 0:
+                        timeline.seek_frame(simulation, time_manager.frame_count - 1, history)
+                stepper.sync()
+
+        if server is not None:
+            with stepper.lock:
+                server.publish(simulation)
+
+        # Draw bodies, between the last two steps. The snapshot, its trails and
+        # the labels are read under one hold of the lock, so no step lands in between
+        with stepper.lock:
+            snapshot = stepper.snapshot()
+            renderer.choose_labels(snapshot.ids, snapshot.mass)
+            with profiler.phase('draw_bodies'):
+                renderer.draw_bodies(snapshot.bodies, snapshot.ids, snapshot.pos, snapshot.mass, snapshot.color)
+
+            # Draw simulation info
+            with profiler.phase('hud'):
+                renderer.draw_simulation_info(time_manager, simulation.collision_count, len(history),
+                                              stepper.speed, stepper.substeps,
+                                              profiler.average if profiler.enabled else None)
         if rewinding:
             renderer.rewinding()
         elif paused:
             renderer.paused()
 
         pygame.display.update()
+        profiler.end_frame()
 
     # Cleanup
+    if isinstance(stepper, PhysicsThread):
+        stepper.close()
+    if recorder is not None:
+        recorder.close()
+        print(f'Recorded {len(recorder)} frames to {args.record}')
+    if server is not None:
+        server.close()
+    profiler.close()
+    event_log.close()
     pygame.quit()
     
     # Print final masses
     print(f'\nSimulation ended after {time_manager.get_formatted_time()}')
-    for i, body in enumerate(bodies, 1):
+    for i, body in enumerate(system.bodies, 1):
         if body.exists:
             print(f'Body {i} has mass of {body.mass}')
 
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The simulation is imported as `core` / `graphics` from src/, like main.py does
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,24 @@
+import copy
+
+import pytest
+from core.config_load import REQUIRED, config, validate
+
+
+def test_shipped_configs_define_every_required_key():
+    config.reload()
+    config.load_constants()
+    config.load_display_settings()
+
+
+def test_unknown_choice_is_rejected():
+    constants = copy.deepcopy(config.load_constants())
+    constants['simulation']['force_engine'] = 'barnes-hut'
+    with pytest.raises(ValueError, match='simulation.force_engine'):
+        validate(constants, REQUIRED['constants.json'], 'constants.json')
+
+
+def test_missing_top_level_key_is_named():
+    display = copy.deepcopy(config.load_display_settings())
+    del display['text_cache_size']
+    with pytest.raises(ValueError, match='text_cache_size'):
+        validate(display, REQUIRED['display.json'], 'display.json')
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from benchmarks.scenarios import generate_scenario
+from core.history import HistoryRing
+from core.objects import BodySystem
+from core.scenario import compile_bodies
+from core.simulation import Simulation
+
+
+def crowded_simulation(mode, integrator):
+    """200 bodies drawn large enough to collide often"""
+    columns = compile_bodies(generate_scenario(200, seed=3))
+    system = BodySystem(capacity=200, integrator=integrator)
+    system.extend(columns['pos'], columns['vel'], columns['mass'], columns['radius'] * 12, columns['color'])
+    simulation = Simulation(system=system)
+    simulation.time_manager.mode = mode
+    return simulation
+
+
+@pytest.mark.parametrize('integrator', ['euler', 'velocity_verlet'])
+@pytest.mark.parametrize('mode', ['fixed', 'adaptive', 'block'])
+def test_keyframe_rewind_restores_every_frame(mode, integrator):
+    simulation = crowded_simulation(mode, integrator)
+    history = HistoryRing(keyframe_interval=3)
+    states = []
+    for _ in range(40):
+        system = simulation.system
+        states.append((system.ids.copy(), system.pos.copy(), system.vel.copy(), system.mass.copy(),
+                       simulation.time_manager.simulation_time))
+        history.capture(system, simulation.time_manager)
+        simulation.step()
+    assert simulation.collision_count > 0
+
+    rewound = 0
+    while history.rewind(simulation):
+        ids, pos, vel, mass, simulation_time = states[simulation.time_manager.frame_count]
+        system = simulation.system
+        np.testing.assert_array_equal(system.ids, ids)
+        np.testing.assert_array_equal(system.pos, pos)
+        np.testing.assert_array_equal(system.vel, vel)
+        np.testing.assert_array_equal(system.mass, mass)
+        assert simulation.time_manager.simulation_time == simulation_time
+        rewound += 1
+    assert rewound == 40
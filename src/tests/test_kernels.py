@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from core import kernels
+
+TOLERANCE = 1e-9  # Largest relative acceleration error per body
+BACKENDS = ['numpy', 'numba']
+
+
+def backend(name):
+    """The backend registered as `name`, skipping the test when it cannot load here"""
+    if name == 'numba':
+        pytest.importorskip('numba')
+    loaded = kernels.load_backend(name)
+    assert loaded.name == name
+    return loaded
+
+
+def pair_set(pairs):
+    return set(zip(*(a.tolist() for a in pairs)))
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+@pytest.mark.parametrize('n_bodies', [3, 10, 300, kernels.TILE + 77])
+def test_accelerations_match_reference(name, n_bodies):
+    backend(name)
+    [(_, error, same_pairs, _)] = kernels.check_agreement(n_bodies, names=[name])
+    assert error <= TOLERANCE
+    assert same_pairs
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+def test_coincident_bodies_exert_no_force(name):
+    pos = np.array([[1e11, 0.0], [1e11, 0.0], [-1e11, 0.0]])
+    mass = np.array([1e24, 1e24, 1e30])
+    acc = backend(name).accelerations(pos, mass)
+    assert np.isfinite(acc).all()
+    np.testing.assert_allclose(acc[0], acc[1])
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+def test_overlapping_pairs_match_reference(name):
+    rng = np.random.default_rng(1)
+    pos = rng.uniform(-1e11, 1e11, (400, 2))
+    reach = rng.uniform(1e8, 5e9, 400)
+    reach[::50] *= 40  # A few bodies far above the median take the direct path
+    expected = pair_set(kernels.python_overlapping_pairs(pos, reach))
+    first, second = backend(name).overlapping_pairs(pos, reach)
+    assert (first < second).all()
+    assert pair_set((first, second)) == expected
+    assert len(expected) > 0
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+def test_overlapping_pairs_touching_and_apart(name):
+    pos = np.array([[0.0, 0.0], [2.0, 0.0], [10.0, 0.0]])
+    reach = np.array([1.0, 1.0, 1.0])
+    assert pair_set(backend(name).overlapping_pairs(pos, reach)) == {(0, 1)}
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        kernels.load_backend('cuda')
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from benchmarks.scenarios import generate_scenario
+from core.objects import BodySystem
+from core.particle_mesh import CUTOFF_CELLS, mesh_accelerations, mesh_cell, mesh_pair_acceleration
+from core.physics import direct_accelerations, pair_acceleration
+from core.scenario import compile_bodies
+
+DAY = 86400
+
+
+def colliding_system(force_engine):
+    """500 orbiting bodies; bodies 1 and 2 are heavy, 1e9 m apart and marked as colliding"""
+    columns = compile_bodies(generate_scenario(500, seed=1))
+    system = BodySystem(capacity=500, force_engine=force_engine)
+    system.extend(columns['pos'], columns['vel'], columns['mass'], columns['radius'], columns['color'])
+    system.mass[[1, 2]] = 1e27
+    system.pos[2] = system.pos[1] + [1e9, 0.0]
+    system.excluded_pairs = [(1, 2)]
+    return system
+
+
+def test_colliding_pair_gets_direct_velocity_change():
+    direct = colliding_system('direct')
+    mesh = colliding_system('particle_mesh')
+    expected = direct.accelerations(direct.pos)[[1, 2]] * DAY
+    actual = mesh.accelerations(mesh.pos)[[1, 2]] * DAY
+    # What is left is the mesh error on the pull of the other bodies, not the pair force
+    error = np.linalg.norm(actual - expected, axis=1) / np.linalg.norm(expected, axis=1)
+    assert error.max() < 0.05
+
+
+@pytest.mark.parametrize('short_range', [False, True])
+def test_pair_term_removes_the_pair(short_range):
+    system = colliding_system('direct')
+    pos, mass = system.pos, system.mass
+    expected = direct_accelerations(pos, mass)[1] - pair_acceleration(pos, mass, 1, 2)
+    actual = (mesh_accelerations(pos, mass, short_range=short_range)[1]
+              - mesh_pair_acceleration(pos, mass, 1, 2, short_range=short_range))
+    assert np.linalg.norm(actual - expected) < 0.05 * np.linalg.norm(expected)
+
+
+def force_ratio(separation_cells, short_range, trials=10):
+    """Mean mesh / direct force between two bodies `separation_cells` apart, over random placements"""
+    rng = np.random.default_rng(0)
+    ratios = []
+    for _ in range(trials):
+        center = rng.uniform(-3e11, 3e11, 2)
+        angle = rng.uniform(0, 2 * np.pi)
+        # Two massless anchors fix the mesh, so the cell size does not depend on the pair
+        pos = np.array([[-1e12, -1e12], [1e12, 1e12], center, center])
+        _, cell = mesh_cell(pos)
+        pos[3] = center + separation_cells * cell * np.array([np.cos(angle), np.sin(angle)])
+        mass = np.array([0.0, 0.0, 1e24, 1e24])
+        actual = mesh_accelerations(pos, mass, short_range=short_range)[2]
+        expected = direct_accelerations(pos, mass)[2]
+        ratios.append(actual @ expected / (expected @ expected))
+    return np.mean(ratios)
+
+
+@pytest.mark.parametrize('short_range', [False, True])
+def test_force_is_continuous_across_the_cutoff(short_range):
+    inside = force_ratio(CUTOFF_CELLS - 0.1, short_range)
+    outside = force_ratio(CUTOFF_CELLS + 0.1, short_range)
+    assert abs(inside - outside) < 0.01
+    assert abs(outside - 1) < 0.03
+
+
+@pytest.mark.parametrize('separation_cells', [0.5, 2, 4, 12, 30])
+def test_short_range_force_is_close_to_exact(separation_cells):
+    assert abs(force_ratio(separation_cells, short_range=True) - 1) < 0.05
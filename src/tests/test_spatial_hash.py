@@ -0,0 +1,40 @@
+import numpy as np
+from core.spatial_hash import SpatialHash, expand_ranges, overlapping_pairs, pairs_within
+
+
+def test_expand_ranges():
+    np.testing.assert_array_equal(expand_ranges(np.array([5, 0, 9]), np.array([2, 0, 3])), [5, 6, 9, 10, 11])
+
+
+def test_zero_reach_only_pairs_coincident_points():
+    pos = np.array([[0.0, 0.0], [1e11, 0.0], [1e11, 0.0], [3e11, 1.0]])
+    first, second = overlapping_pairs(pos, np.zeros(4))
+    assert list(zip(first.tolist(), second.tolist())) == [(1, 2)]
+
+
+def test_tiny_cell_size_is_raised_to_fit_the_extent():
+    pos = np.array([[-3e11, 0.0], [3e11, 2e11], [0.0, 0.0]])
+    grid = SpatialHash(pos, 1e-300)
+    assert grid.cell_size >= 6e11 / 2**30
+    assert (grid.keys >= 0).all()
+    np.testing.assert_array_equal(grid.query_rect((-1.0, -1.0), (1.0, 1.0)), [2])
+
+
+def test_query_rect_matches_brute_force():
+    rng = np.random.default_rng(2)
+    pos = rng.uniform(-1e11, 1e11, (2000, 2))
+    grid = SpatialHash(pos, 7e9)
+    for _ in range(50):
+        low = rng.uniform(-1.2e11, 1e11, 2)
+        high = low + rng.uniform(0, 8e10, 2)
+        inside = np.flatnonzero(((pos >= low) & (pos <= high)).all(axis=1))
+        np.testing.assert_array_equal(grid.query_rect(low, high), inside)
+
+
+def test_pairs_within_matches_brute_force():
+    rng = np.random.default_rng(3)
+    pos = rng.uniform(0, 1e3, (300, 2))
+    first, second = pairs_within(pos, 40.0)
+    distance = np.linalg.norm(pos[:, np.newaxis] - pos[np.newaxis], axis=2)
+    expected = {(i, j) for i, j in zip(*np.nonzero(distance < 40.0)) if i < j}
+    assert set(zip(first.tolist(), second.tolist())) == expected
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from core.integrators import INTEGRATORS
+from core.objects import BodySystem
+from core.physics import G
+from core.simulation import Simulation
+from core.time_manager import TimeManager
+
+SUN_MASS = 1.989e30
+AU = 1.496e11
+
+
+def close_pair(integrator):
+    """A small body on a circular orbit 0.05 AU from a sun (a period of about four days)"""
+    distance = 0.05 * AU
+    speed = np.sqrt(G * SUN_MASS / distance)
+    system = BodySystem(capacity=2, integrator=integrator, trails=False)
+    system.add(0.0, 0.0, (255, 255, 0), SUN_MASS, 2, 0.0, 0.0)  # Radii in pixels
+    system.add(distance, 0.0, (0, 0, 255), 1e20, 1, 0.0, speed)
+    return system
+
+
+def run(integrator, mode, frames=20):
+    time_manager = TimeManager()
+    time_manager.mode = mode
+    simulation = Simulation(system=close_pair(integrator), time_manager=time_manager)
+    steps, levels = [], []
+    for _ in range(frames):
+        simulation.step()
+        steps.append(time_manager.current_time_step)
+        levels.append(int(time_manager.levels.max()) if time_manager.levels is not None else 0)
+    return np.array(steps), np.array(levels)
+
+
+@pytest.mark.parametrize('integrator', sorted(INTEGRATORS))
+def test_adaptive_step_shrinks_for_close_pair(integrator):
+    steps, _ = run(integrator, 'adaptive')
+    # eta * |a| / |da/dt| = 0.05 * period / 2 pi, about 2800 s, on every frame
+    assert steps.max() < 5000
+    assert steps.min() > 1000
+
+
+@pytest.mark.parametrize('integrator', sorted(INTEGRATORS))
+def test_block_levels_refine_for_close_pair(integrator):
+    _, levels = run(integrator, 'block')
+    # 86400 s / 2**5 = 2700 s
+    assert (levels >= 5).all()
+
+
+def test_controller_state_round_trip():
+    time_manager = TimeManager()
+    time_manager.mode = 'adaptive'
+    simulation = Simulation(system=close_pair('leapfrog'), time_manager=time_manager)
+    for _ in range(3):
+        simulation.step()
+    state = time_manager.controller_state()
+    copy = Simulation(system=close_pair('leapfrog'), time_manager=TimeManager())
+    copy.time_manager.mode = 'adaptive'
+    copy.system.restore(simulation.system.ids, simulation.system.pos, simulation.system.vel,
+                        simulation.system.mass, simulation.system.radius, simulation.system.color,
+                        simulation.system.steps_collision)
+    copy.time_manager.restore(time_manager.simulation_time, time_manager.frame_count)
+    copy.time_manager.restore_controller(state)
+    for _ in range(2):
+        simulation.step()
+        copy.step()
+    assert copy.time_manager.simulation_time == simulation.time_manager.simulation_time
+    np.testing.assert_array_equal(copy.system.pos, simulation.system.pos)
+
+
+@pytest.mark.parametrize('mode', ['fixed', 'adaptive', 'block'])
+def test_one_force_evaluation_per_frame(monkeypatch, mode):
+    evaluations = []
+    original = BodySystem._accelerations
+
+    def counted(system, pos, targets):
+        evaluations.append(targets)
+        return original(system, pos, targets)
+
+    monkeypatch.setattr(BodySystem, '_accelerations', counted)
+    time_manager = TimeManager()
+    time_manager.mode = mode
+    time_manager.max_level = 0  # Block mode: every body on the frame step
+    simulation = Simulation(system=close_pair('velocity_verlet'), time_manager=time_manager)
+    simulation.step()  # The first frame probes the jerk
+    evaluations.clear()
+    for _ in range(10):
+        simulation.step()
+    assert len(evaluations) == 10